@@ -1,15 +1,40 @@
+import argparse
+import atexit
+import csv
+import gzip
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sqlite3
 import sys
-from datetime import datetime
-
-import pyodbc
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import islice
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    import pyodbc
+except ImportError:  # fara driver ODBC ramane disponibil doar backend-ul SQLite
+    pyodbc = None
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QTabWidget, QTableWidget,
-    QTableWidgetItem, QMessageBox, QHeaderView, QComboBox, QDateEdit,
-    QDoubleSpinBox, QSpinBox, QTextEdit
+    QLabel, QLineEdit, QPushButton, QTabWidget, QTableView,
+    QMessageBox, QHeaderView, QComboBox, QDateEdit,
+    QDoubleSpinBox, QSpinBox, QTextEdit, QCheckBox, QProgressBar, QCompleter,
+    QFileDialog, QShortcut
+)
+from PyQt5.QtCore import (
+    Qt, QDate, QAbstractTableModel, QModelIndex, QObject, QRunnable,
+    QThreadPool, QStringListModel, pyqtSignal
 )
-from PyQt5.QtCore import Qt, QDate
-from PyQt5.QtGui import QFont, QColor
+from PyQt5.QtGui import QFont, QColor, QKeySequence
 
 # ===== CONEXIUNE SQL SERVER =========================================
 CONN_STR = (
@@ -19,18 +44,3623 @@ CONN_STR = (
     "Trusted_Connection=yes;"
 )
 
+# ===== BACKEND DE STOCARE ===========================================
+# Tot accesul la date trece prin POOL, ale carui conexiuni le creeaza
+# BACKEND-ul activ: SQL Server prin ODBC (productie) sau SQLite intr-un
+# fisier local (lucru offline, teste, benchmark-uri pe orice masina).
+# Se alege cu --baza sau URSU_BAZA: "mssql" (implicit, CONN_STR),
+# "odbc:<sir de conectare>" sau "sqlite:<cale fisier>".
+
+# SQLSTATE-uri care inseamna ca legatura cu serverul s-a pierdut
+_SQLSTATE_CONEXIUNE_PIERDUTA = ("08S01", "08001", "08003", "08004", "08007", "HYT01")
+
+
+def _conexiune_pierduta(exc):
+    """Verifica daca o eroare pyodbc provine dintr-o conexiune rupta."""
+    return bool(exc.args) and str(exc.args[0]) in _SQLSTATE_CONEXIUNE_PIERDUTA
+
+
+def _loturi_script(script):
+    """Loturile unui script T-SQL, despartite de liniile GO."""
+    return [lot.strip() for lot in re.split(r"^\s*GO\s*$", script, flags=re.M | re.I) if lot.strip()]
+
+
+class BackendSqlServer:
+    nume = "sqlserver"
+    scrieri_paralele = True   # blocaje pe rand: conexiuni diferite pot scrie simultan
+
+    def __init__(self, conn_str=CONN_STR):
+        self.conn_str = conn_str
+
+    @property
+    def url(self):
+        """Forma pentru backend_din_url (ex. pentru procesele de lucru)."""
+        return "mssql" if self.conn_str == CONN_STR else "odbc:" + self.conn_str
+
+    @property
+    def Error(self):
+        return pyodbc.Error if pyodbc is not None else ()
+
+    def conecteaza(self):
+        if pyodbc is None:
+            raise RuntimeError("Backend-ul SQL Server necesită pachetul pyodbc (pip install pyodbc).")
+        return pyodbc.connect(self.conn_str)
+
+    @staticmethod
+    def conexiune_pierduta(exc):
+        return _conexiune_pierduta(exc)
+
+    @staticmethod
+    def eroare_de_date(exc):
+        """Eroarea tine de randul scris (FK, lungime, tip), nu de legatura cu serverul."""
+        return pyodbc is not None and isinstance(exc, (pyodbc.IntegrityError, pyodbc.DataError))
+
+    @staticmethod
+    def pregateste_executemany(cur):
+        cur.fast_executemany = True   # parametrii trimisi ca vector, nu rand cu rand
+
+    @staticmethod
+    def numar_randuri_aprox(tabel):
+        """Numarul de randuri din metadatele tabelului (fara COUNT)."""
+        rows = exec_query(
+            "SELECT SUM(rows) FROM sys.partitions "
+            "WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1)",
+            ("dbo." + tabel,),
+            fetch=True
+        ) or []
+        return int(rows[0][0] or 0) if rows else 0
+
+    def initializeaza(self, script):
+        conn = self.conecteaza()
+        try:
+            conn.autocommit = True
+            cur = conn.cursor()
+            for lot in _loturi_script(script):
+                cur.execute(lot)
+        finally:
+            conn.close()
+
+
+# --- SQLite ---------------------------------------------------------
+SQLITE_PRAGMA = (
+    "PRAGMA journal_mode = WAL",        # cititorii nu blocheaza scriitorul
+    "PRAGMA synchronous = NORMAL",      # sigur cu WAL, fara fsync la fiecare commit
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA cache_size = -65536",       # 64 MB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",     # 256 MB
+)
+SQLITE_TIMEOUT = 30.0                   # s de asteptare cand alt scriitor tine baza
+SQLITE_ACUM = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+_SQLITE_TOP = re.compile(r"\bSELECT\s+TOP\s*\(\s*(\?|\d+)\s*\)", re.I)
+_SQLITE_INLOCUIRI = (
+    (re.compile(r"\bWITH\s*\(\s*(?:UPDLOCK|HOLDLOCK|ROWLOCK|NOLOCK)(?:\s*,\s*\w+)*\s*\)", re.I), ""),
+    (re.compile(r"\bISNULL\s*\(", re.I), "IFNULL("),
+    (re.compile(r"\b(?:SYSDATETIME|GETDATE)\s*\(\s*\)", re.I), SQLITE_ACUM),
+)
+
+
+def _sfarsit_select(sql, start):
+    """Pozitia unde se termina SELECT-ul inceput la `start` (paranteza care il inchide sau final)."""
+    adancime, in_sir = 0, False
+    for i in range(start, len(sql)):
+        c = sql[i]
+        if c == "'":
+            in_sir = not in_sir
+        elif in_sir:
+            continue
+        elif c == "(":
+            adancime += 1
+        elif c == ")":
+            if adancime == 0:
+                return i
+            adancime -= 1
+    return len(sql)
+
+
+def traduce_sqlite(sql):
+    """
+    Interogarea T-SQL a aplicatiei in dialectul SQLite + ordinea noua a
+    parametrilor (None daca nu se schimba): TOP (n) devine LIMIT n la finalul
+    SELECT-ului respectiv, deci parametrul lui se muta dupa ceilalti.
+    """
+    ordine = None
+    while True:
+        m = _SQLITE_TOP.search(sql)
+        if m is None:
+            break
+        arg = m.group(1)
+        inainte = sql[:m.start()]
+        k = inainte.count("?")
+        sql = inainte + "SELECT" + sql[m.end():]
+        sfarsit = _sfarsit_select(sql, m.start() + len("SELECT"))
+        if arg == "?":
+            if ordine is None:
+                ordine = list(range(sql.count("?") + 1))
+            j = sql.count("?", 0, sfarsit)   # cati parametri raman inaintea lui LIMIT
+            ordine.insert(j, ordine.pop(k))
+        sql = sql[:sfarsit].rstrip() + f" LIMIT {arg}" + (" " + sql[sfarsit:] if sfarsit < len(sql) else "")
+    for tipar, inlocuire in _SQLITE_INLOCUIRI:
+        sql = tipar.sub(inlocuire, sql)
+    return sql, ordine
+
+
+class _CursorSqlite:
+    """Cursor sqlite3 care traduce interogarile (traducerile se memoreaza)."""
+
+    _traduceri = {}
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    @classmethod
+    def _traduce(cls, sql):
+        rezultat = cls._traduceri.get(sql)
+        if rezultat is None:
+            rezultat = cls._traduceri[sql] = traduce_sqlite(sql)
+        return rezultat
+
+    def execute(self, sql, params=()):
+        sql, ordine = self._traduce(sql)
+        if ordine is not None:
+            params = [params[i] for i in ordine]
+        self._cur.execute(sql, tuple(params))
+        return self
+
+    def executemany(self, sql, seq_params):
+        sql, ordine = self._traduce(sql)
+        if ordine is not None:
+            seq_params = ([p[i] for i in ordine] for p in seq_params)
+        self._cur.executemany(sql, (tuple(p) for p in seq_params))
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def fetchmany(self, n):
+        return self._cur.fetchmany(n)
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def close(self):
+        self._cur.close()
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def description(self):
+        return self._cur.description
+
+
+class _ConexiuneSqlite:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _CursorSqlite(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def _an_sqlite(valoare):
+    return None if valoare is None else int(str(valoare)[:4])
+
+
+def _luna_sqlite(valoare):
+    return None if valoare is None else int(str(valoare)[5:7])
+
+
+class BackendSqlite:
+    nume = "sqlite"
+    # un singur scriitor pe fisier: o conexiune separata nu poate confirma
+    # ceva cat timp conexiunea firului are o tranzactie de scriere deschisa
+    scrieri_paralele = False
+    Error = sqlite3.Error
+
+    _tipuri_inregistrate = False
+
+    def __init__(self, cale):
+        self.cale = cale
+        BackendSqlite._inregistreaza_tipuri()
+
+    @property
+    def url(self):
+        return "sqlite:" + os.path.abspath(self.cale)
+
+    @classmethod
+    def _inregistreaza_tipuri(cls):
+        if cls._tipuri_inregistrate:
+            return
+        sqlite3.register_adapter(Decimal, str)
+        sqlite3.register_adapter(date, date.isoformat)
+        sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=" ", timespec="milliseconds"))
+        sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()[:10]))
+        sqlite3.register_converter("DATETIME2", lambda b: datetime.fromisoformat(b.decode()))
+        sqlite3.register_converter("DECIMAL", lambda b: Decimal(b.decode()))
+        cls._tipuri_inregistrate = True
+
+    def _conecteaza_brut(self):
+        director = os.path.dirname(os.path.abspath(self.cale))
+        os.makedirs(director, exist_ok=True)
+        conn = sqlite3.connect(
+            self.cale, timeout=SQLITE_TIMEOUT,
+            detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False
+        )
+        for pragma in SQLITE_PRAGMA:
+            conn.execute(pragma)
+        conn.create_function("YEAR", 1, _an_sqlite, deterministic=True)
+        conn.create_function("MONTH", 1, _luna_sqlite, deterministic=True)
+        return conn
+
+    def conecteaza(self):
+        return _ConexiuneSqlite(self._conecteaza_brut())
+
+    @staticmethod
+    def conexiune_pierduta(exc):
+        return False   # fisier local: nu exista legatura care sa cada
+
+    @staticmethod
+    def eroare_de_date(exc):
+        return isinstance(exc, (sqlite3.IntegrityError, sqlite3.DataError))
+
+    @staticmethod
+    def pregateste_executemany(cur):
+        pass           # sqlite3 executa deja executemany intr-un singur apel
+
+    @staticmethod
+    def numar_randuri_aprox(tabel):
+        # rowid-ul maxim: o cautare in B-tree, exact cat timp nu s-au sters randuri
+        rows = exec_query(f"SELECT MAX(rowid) FROM {tabel}", fetch=True) or []
+        return int(rows[0][0] or 0) if rows else 0
+
+    def initializeaza(self, script):
+        conn = self._conecteaza_brut()
+        try:
+            conn.executescript(schema_sqlite(script))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# --- traducerea scriptului BazaDeDate pentru SQLite -----------------
+class _TabelSqlite:
+    def __init__(self, nume, corp, daca_nu_exista):
+        self.nume = nume
+        self.corp = corp.rstrip()
+        self.daca_nu_exista = daca_nu_exista
+
+    def __str__(self):
+        conditie = "IF NOT EXISTS " if self.daca_nu_exista else ""
+        return f"CREATE TABLE {conditie}{self.nume} ({self.corp}\n)"
+
+
+def _fara_comentarii(sql):
+    rezultat, in_sir, i = [], False, 0
+    while i < len(sql):
+        c = sql[i]
+        if c == "'":
+            in_sir = not in_sir
+        elif not in_sir and sql.startswith("--", i):
+            i = sql.find("\n", i)
+            if i < 0:
+                break
+            continue
+        rezultat.append(c)
+        i += 1
+    return "".join(rezultat)
+
+
+def _instructiuni_sql(lot):
+    """Instructiunile unui lot, despartite de ';' din afara literalilor."""
+    bucati, inceput, in_sir = [], 0, False
+    for i, c in enumerate(lot):
+        if c == "'":
+            in_sir = not in_sir
+        elif c == ";" and not in_sir:
+            bucati.append(lot[inceput:i])
+            inceput = i + 1
+    bucati.append(lot[inceput:])
+    return [b.strip() for b in bucati if b.strip()]
+
+
+def _coloana_sqlite(definitie):
+    return re.sub(r"\bSYSDATETIME\s*\(\s*\)", f"({SQLITE_ACUM})", definitie, flags=re.I)
+
+
+_SCHEMA_TIPARE = [
+    ("ignora", re.compile(r"^(?:USE\s|IF\s+DB_ID\s*\()", re.I)),
+    ("drop", re.compile(
+        r"^IF\s+OBJECT_ID\s*\(\s*'(?:dbo\.)?\w+'\s*,\s*'[UV]'\s*\)\s+IS\s+NOT\s+NULL\s+"
+        r"DROP\s+(TABLE|VIEW)\s+(\w+)$", re.I | re.S)),
+    ("tabel", re.compile(
+        r"^(IF\s+OBJECT_ID\s*\([^)]*\)\s+IS\s+NULL\s+)?CREATE\s+TABLE\s+(\w+)\s*\((.*)\)$", re.I | re.S)),
+    ("index", re.compile(
+        r"^IF\s+NOT\s+EXISTS\s*\(\s*SELECT\s+1\s+FROM\s+sys\.indexes\s+WHERE\s+name\s*=\s*'\w+'\s*\)\s+"
+        r"CREATE\s+(UNIQUE\s+)?INDEX\s+(.*)$", re.I | re.S)),
+    ("drop_index", re.compile(
+        r"^IF\s+EXISTS\s*\(\s*SELECT\s+1\s+FROM\s+sys\.indexes\s+WHERE\s+name\s*=\s*'\w+'\s*\)\s+"
+        r"DROP\s+INDEX\s+(\w+)\s+ON\s+\w+$", re.I | re.S)),
+    ("coloana", re.compile(
+        r"^IF\s+COL_LENGTH\s*\([^)]*\)\s+IS\s+NULL\s+ALTER\s+TABLE\s+(\w+)\s+ADD\s+(.*)$", re.I | re.S)),
+    ("latime", re.compile(
+        r"^IF\s+COL_LENGTH\s*\([^)]*\)\s*<\s*\d+\s+ALTER\s+TABLE\s+\w+\s+ALTER\s+COLUMN\s", re.I)),
+    ("vedere", re.compile(r"^CREATE\s+OR\s+ALTER\s+VIEW\s+(\w+)\s+AS\s+(.*)$", re.I | re.S)),
+    ("insert", re.compile(r"^INSERT\s+INTO\s", re.I)),
+    ("actualizare", re.compile(r"^UPDATE\s+\w+\s+SET\s", re.I)),
+    ("umple", re.compile(
+        r"^IF\s+NOT\s+EXISTS\s*\(\s*SELECT\s+1\s+FROM\s+\w+\s*\)\s+(INSERT\s+INTO\s.*)$", re.I | re.S)),
+]
+
+
+def schema_sqlite(script):
+    """
+    Scriptul T-SQL BazaDeDate tradus pentru SQLite. Sunt acceptate doar
+    formele folosite de script (DROP/CREATE cu garzi OBJECT_ID, indexuri
+    create sau sterse cu garda sys.indexes, coloane noi cu garda COL_LENGTH, CREATE OR ALTER VIEW,
+    INSERT, simplu sau cu garda "tabela goala", UPDATE); orice altceva e o eroare, ca migrarile noi sa nu fie sarite.
+    Coloanele doar largite (ALTER COLUMN cu garda COL_LENGTH < n) se sar:
+    SQLite nu impune lungimea tipurilor text.
+
+    SQLite nu poate adauga prin ALTER o coloana cu valoare implicita
+    nedeterminista (SYSDATETIME()), asa ca ALTER TABLE ... ADD se muta in
+    CREATE TABLE-ul tabelei: scriptul recreeaza oricum toate tabelele.
+    """
+    instructiuni, tabele = [], {}
+    for lot in _loturi_script(_fara_comentarii(script)):
+        for instr in _instructiuni_sql(lot):
+            for tip, tipar in _SCHEMA_TIPARE:
+                m = tipar.match(instr)
+                if m:
+                    break
+            else:
+                raise ValueError(f"Instrucțiune nesuportată pentru SQLite:\n{instr[:200]}")
+
+            if tip == "drop":
+                instructiuni.append(f"DROP {m.group(1).upper()} IF EXISTS {m.group(2)}")
+            elif tip == "tabel":
+                tabel = _TabelSqlite(m.group(2), _coloana_sqlite(m.group(3)), bool(m.group(1)))
+                tabele[tabel.nume.lower()] = tabel
+                instructiuni.append(tabel)
+            elif tip == "index":
+                definitie = re.sub(r"\s+INCLUDE\s*\([^)]*\)", "", m.group(2), flags=re.I)
+                instructiuni.append(f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS {definitie}")
+            elif tip == "drop_index":
+                instructiuni.append(f"DROP INDEX IF EXISTS {m.group(1)}")
+            elif tip == "coloana":
+                tabel = tabele.get(m.group(1).lower())
+                if tabel is None:
+                    raise ValueError(f"ALTER TABLE pe o tabelă necreată de script: {m.group(1)}")
+                tabel.corp += ",\n    " + _coloana_sqlite(m.group(2))
+            elif tip == "latime":
+                pass
+            elif tip == "vedere":
+                instructiuni.append(f"DROP VIEW IF EXISTS {m.group(1)}")
+                instructiuni.append(f"CREATE VIEW {m.group(1)} AS {m.group(2)}")
+            elif tip in ("insert", "actualizare"):
+                instructiuni.append(instr)
+            elif tip == "umple":
+                instructiuni.append(m.group(1))
+    return ";\n".join(str(i) for i in instructiuni) + ";\n"
+
+
+def backend_din_url(url):
+    """'mssql' / 'odbc:<sir conectare>' / 'sqlite:<cale>' -> backend."""
+    if not url or url == "mssql":
+        return BackendSqlServer()
+    if url.startswith("odbc:"):
+        return BackendSqlServer(url[len("odbc:"):])
+    if url.startswith("sqlite:"):
+        return BackendSqlite(url[len("sqlite:"):])
+    raise ValueError(f"Bază de date necunoscută: {url!r} (mssql, odbc:..., sqlite:cale)")
+
+
+SCRIPT_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "BazaDeDate")
+
+BACKEND = backend_din_url(os.environ.get("URSU_BAZA"))
+
+
+def seteaza_backend(backend):
+    """Schimba backend-ul activ; conexiunile libere ale celui vechi se inchid."""
+    global BACKEND
+    POOL.close_all()
+    BACKEND = backend
+
+
+# ===== INSTRUMENTARE INTEROGARI =====================================
+# Statistici pe "amprenta" fiecarei instructiuni (textul SQL cu literalii
+# inlocuiti cu ?): apeluri, erori, histograma duratelor, randuri, timpul de
+# preluare a conexiunii. Interogarile peste prag ajung in jurnalul de
+# interogari lente, cu parametrii redusi la tip (si lungime). Dezactivata,
+# costa o singura verificare de atribut pe apel.
+INSTRUMENTARE_LIMITE = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)  # s; + o treapta "peste"
+INSTRUMENTARE_MAX_AMPRENTE = 5000        # texte SQL distincte memorate pentru normalizare
+PRAG_INTEROGARE_LENTA = 0.5              # s
+FISIER_INTEROGARI_LENTE = "interogari_lente.jsonl"
+
+_SQL_COMENTARII = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_SQL_LITERALI = re.compile(r"N?'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_LISTE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SQL_SPATII = re.compile(r"\s+")
+
+
+def amprenta_sql(sql):
+    """Textul normalizat al instructiunii: fara comentarii, literali si spatii in plus."""
+    text = _SQL_COMENTARII.sub(" ", sql)
+    text = _SQL_LITERALI.sub("?", text)
+    text = _SQL_LISTE.sub("(?, ...)", text)
+    return _SQL_SPATII.sub(" ", text).strip()
+
+
+def _parametru_redactat(valoare):
+    if valoare is None:
+        return None
+    nume = type(valoare).__name__
+    return f"{nume}:{len(valoare)}" if isinstance(valoare, (str, bytes)) else nume
+
+
+class Instrumentare:
+    """Contoarele interogarilor, comune tuturor firelor."""
+
+    def __init__(self, activa=False, prag_lent=PRAG_INTEROGARE_LENTA, fisier_lente=FISIER_INTEROGARI_LENTE):
+        self.activa = activa
+        self.prag_lent = prag_lent
+        self.fisier_lente = fisier_lente
+        self._lock = threading.Lock()
+        self._amprente = {}      # text SQL -> amprenta
+        self._statistici = {}    # amprenta -> contoare
+        self._de_la = datetime.now()
+
+    def porneste(self):
+        self.activa = True
+
+    def opreste(self):
+        self.activa = False
+
+    def reseteaza(self):
+        with self._lock:
+            self._statistici = {}
+            self._de_la = datetime.now()
+
+    def _amprenta(self, sql):
+        amprenta = self._amprente.get(sql)
+        if amprenta is None:
+            if len(self._amprente) >= INSTRUMENTARE_MAX_AMPRENTE:
+                self._amprente.clear()
+            amprenta = self._amprente[sql] = amprenta_sql(sql)
+        return amprenta
+
+    def inregistreaza(self, sql, durata, randuri=0, asteptare=0.0, params=None, eroare=False):
+        amprenta = self._amprenta(sql)
+        treapta = 0
+        while treapta < len(INSTRUMENTARE_LIMITE) and durata > INSTRUMENTARE_LIMITE[treapta]:
+            treapta += 1
+        with self._lock:
+            st = self._statistici.get(amprenta)
+            if st is None:
+                st = self._statistici[amprenta] = {
+                    "apeluri": 0, "erori": 0, "timp_total": 0.0, "timp_max": 0.0,
+                    "histograma": [0] * (len(INSTRUMENTARE_LIMITE) + 1),
+                    "randuri": 0, "asteptare_total": 0.0, "asteptare_max": 0.0,
+                }
+            st["apeluri"] += 1
+            st["erori"] += eroare
+            st["timp_total"] += durata
+            st["timp_max"] = max(st["timp_max"], durata)
+            st["histograma"][treapta] += 1
+            st["randuri"] += max(randuri, 0)
+            st["asteptare_total"] += asteptare
+            st["asteptare_max"] = max(st["asteptare_max"], asteptare)
+        if durata >= self.prag_lent:
+            self._scrie_lenta(amprenta, durata, randuri, asteptare, params, eroare)
+
+    def _scrie_lenta(self, amprenta, durata, randuri, asteptare, params, eroare):
+        if params and isinstance(params[0], (list, tuple)):   # exec_many: primul set + numarul
+            parametri = {"seturi": len(params), "primul": [_parametru_redactat(p) for p in params[0]]}
+        else:
+            parametri = [_parametru_redactat(p) for p in params or ()]
+        intrare = {
+            "moment": datetime.now().isoformat(timespec="milliseconds"),
+            "durata_ms": round(durata * 1000, 1),
+            "asteptare_conexiune_ms": round(asteptare * 1000, 1),
+            "randuri": randuri,
+            "eroare": eroare,
+            "fir": threading.current_thread().name,
+            "sql": amprenta,
+            "parametri": parametri,
+        }
+        try:
+            with self._lock, open(self.fisier_lente, "a", encoding="utf-8") as f:
+                f.write(json.dumps(intrare, ensure_ascii=False) + "\n")
+        except OSError:
+            pass   # jurnalul de diagnostic nu opreste interogarea
+
+    @staticmethod
+    def _percentila(st, q):
+        """Limita superioara a treptei histogramei in care cade percentila q."""
+        prag, cumulat = q * st["apeluri"], 0
+        for limita, n in zip(INSTRUMENTARE_LIMITE, st["histograma"]):
+            cumulat += n
+            if cumulat >= prag:
+                return limita
+        return st["timp_max"]
+
+    def instantaneu(self):
+        """Statisticile curente, interogarile ordonate dupa timpul total."""
+        with self._lock:
+            statistici = {a: dict(st, histograma=list(st["histograma"])) for a, st in self._statistici.items()}
+            de_la = self._de_la
+        interogari = []
+        for amprenta, st in statistici.items():
+            interogari.append(dict(
+                st, sql=amprenta,
+                timp_mediu=st["timp_total"] / st["apeluri"],
+                p50=self._percentila(st, 0.5),
+                p95=self._percentila(st, 0.95),
+            ))
+        interogari.sort(key=lambda i: i["timp_total"], reverse=True)
+        return {
+            "activa": self.activa,
+            "de_la": de_la.isoformat(timespec="seconds"),
+            "pana_la": datetime.now().isoformat(timespec="seconds"),
+            "backend": BACKEND.nume,
+            "prag_lent_ms": round(self.prag_lent * 1000, 1),
+            "limite_histograma_s": list(INSTRUMENTARE_LIMITE),
+            "pool": POOL.stats(),
+            "interogari": interogari,
+        }
+
+    def salveaza(self, cale):
+        with open(cale, "w", encoding="utf-8") as f:
+            json.dump(self.instantaneu(), f, indent=2, ensure_ascii=False)
+
+
+INSTRUMENTARE = Instrumentare(
+    activa=os.environ.get("URSU_INSTRUMENTARE") == "1",
+    prag_lent=float(os.environ.get("URSU_PRAG_LENT_MS", PRAG_INTEROGARE_LENTA * 1000)) / 1000,
+)
+
+
+# ===== POOL DE CONEXIUNI ============================================
+POOL_MAX_CONEXIUNI = 8        # cate conexiuni fizice tinem deschise maxim
+POOL_TIMEOUT_ASTEPTARE = 30.0 # secunde de asteptare dupa o conexiune libera
+POOL_VERIFICARE_DUPA = 60.0   # conexiunile inactive mai mult de atat se verifica la preluare
+
+class ConnectionPool:
+    """
+    Pool limitat de conexiuni persistente.
+
+    - cel mult `max_size` conexiuni fizice deschise simultan;
+    - fiecare fir de executie detine conexiunea preluata pana o elibereaza,
+      iar preluarile imbricate din acelasi fir primesc aceeasi conexiune;
+    - conexiunile inactive de mult timp sunt verificate la preluare si
+      redeschise automat daca serverul le-a inchis.
+    """
+
+    def __init__(self, factory, max_size=POOL_MAX_CONEXIUNI,
+                 timeout=POOL_TIMEOUT_ASTEPTARE, verificare_dupa=POOL_VERIFICARE_DUPA):
+        self._factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.verificare_dupa = verificare_dupa
+
+        self._cond = threading.Condition()
+        self._libere = []       # [(conexiune, momentul eliberarii)]
+        self._deschise = 0      # conexiuni fizice existente (libere + ocupate)
+        self._local = threading.local()
+
+        self._stats = {
+            "preluari": 0,
+            "asteptari": 0,
+            "timp_asteptare": 0.0,
+            "timp_asteptare_max": 0.0,
+            "conexiuni_noi": 0,
+            "reconectari": 0,
+            "verificari_esuate": 0,
+        }
+
+    # --- preluare / eliberare ---------------------------------------
+    def acquire(self):
+        """Preia o conexiune pentru firul curent (reentrant)."""
+        local = self._local
+        if getattr(local, "conn", None) is not None:
+            local.depth += 1
+            return local.conn
+
+        conn = self._preia_fizic()
+        local.conn = conn
+        local.depth = 1
+        local.tx_depth = 0
+        return conn
+
+    def release(self, conn, broken=False):
+        """Elibereaza conexiunea firului curent; `broken` o inchide definitiv."""
+        local = self._local
+        if getattr(local, "conn", None) is not conn:
+            raise RuntimeError("Conexiunea nu apartine firului curent.")
+
+        if broken:
+            # o conexiune rupta nu mai e reutilizata nici de apelurile imbricate
+            local.conn = None
+            local.depth = 0
+            local.tx_depth = 0
+            self._inchide_fizic(conn)
+            return
+
+        local.depth -= 1
+        if local.depth > 0:
+            return
+
+        local.conn = None
+        self._returneaza(conn)
+
+    @contextmanager
+    def connection(self, dedicata=False):
+        """
+        Conexiunea firului curent; cu `dedicata=True` o conexiune separata,
+        nelegata de fir (ex. pentru a confirma ceva independent de
+        tranzactia deschisa pe conexiunea firului).
+        """
+        if dedicata:
+            conn = self._preia_fizic()
+            broken = False
+            try:
+                yield conn
+            except BACKEND.Error as e:
+                broken = BACKEND.conexiune_pierduta(e)
+                raise
+            finally:
+                if broken:
+                    self._inchide_fizic(conn)
+                else:
+                    self._returneaza(conn)
+            return
+
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except BACKEND.Error as e:
+            broken = BACKEND.conexiune_pierduta(e)
+            raise
+        finally:
+            if self._local.conn is conn:
+                self.release(conn, broken=broken)
+
+    # --- intern ------------------------------------------------------
+    def _preia_fizic(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        a_asteptat = False
+
+        with self._cond:
+            while True:
+                if self._libere:
+                    conn, eliberat_la = self._libere.pop()
+                    break
+                if self._deschise < self.max_size:
+                    self._deschise += 1
+                    conn, eliberat_la = None, None
+                    break
+                ramas = deadline - time.monotonic()
+                if ramas <= 0:
+                    raise TimeoutError(
+                        f"Nicio conexiune libera in pool dupa {self.timeout:.0f} s "
+                        f"({self.max_size} ocupate)."
+                    )
+                a_asteptat = True
+                self._cond.wait(ramas)
+
+            asteptare = time.monotonic() - start
+            self._stats["preluari"] += 1
+            if a_asteptat:
+                self._stats["asteptari"] += 1
+            self._stats["timp_asteptare"] += asteptare
+            self._stats["timp_asteptare_max"] = max(self._stats["timp_asteptare_max"], asteptare)
+
+        if conn is None:
+            return self._conexiune_noua()
+
+        if time.monotonic() - eliberat_la > self.verificare_dupa and not self._sanatoasa(conn):
+            with self._cond:
+                self._stats["verificari_esuate"] += 1
+                self._stats["reconectari"] += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+            # locul din pool ramane rezervat pentru conexiunea noua
+            return self._conexiune_noua()
+        return conn
+
+    def _returneaza(self, conn):
+        try:
+            conn.rollback()  # nu lasam tranzactii deschise in pool
+        except Exception:
+            self._inchide_fizic(conn)
+            return
+        with self._cond:
+            self._libere.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _conexiune_noua(self):
+        try:
+            conn = self._factory()
+        except Exception:
+            with self._cond:
+                self._deschise -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["conexiuni_noi"] += 1
+        return conn
+
+    def _inchide_fizic(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._deschise -= 1
+            self._stats["reconectari"] += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _sanatoasa(conn):
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    # --- administrare ------------------------------------------------
+    def stats(self):
+        """Statistici pentru dimensionarea pool-ului."""
+        with self._cond:
+            s = dict(self._stats)
+            s["deschise"] = self._deschise
+            s["libere"] = len(self._libere)
+            s["ocupate"] = self._deschise - len(self._libere)
+            s["max_size"] = self.max_size
+        s["timp_asteptare_mediu"] = (
+            s["timp_asteptare"] / s["preluari"] if s["preluari"] else 0.0
+        )
+        return s
+
+    def close_all(self):
+        """Inchide conexiunile libere (la iesirea din aplicatie)."""
+        with self._cond:
+            libere, self._libere = self._libere, []
+            self._deschise -= len(libere)
+        for conn, _ in libere:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+POOL = ConnectionPool(lambda: BACKEND.conecteaza())
+
+
 def get_connection():
-    return pyodbc.connect(CONN_STR)
+    """Conexiune din pool; trebuie eliberata cu release_connection()."""
+    return POOL.acquire()
+
+
+def release_connection(conn, broken=False):
+    POOL.release(conn, broken=broken)
+
+
+@contextmanager
+def tranzactie():
+    """
+    Grupeaza mai multe apeluri exec_query/exec_many intr-o singura
+    tranzactie pe conexiunea firului curent (commit o data, la final).
+    """
+    with POOL.connection() as conn:
+        local = POOL._local
+        local.tx_depth += 1
+        exterioara = local.tx_depth == 1
+        if exterioara:
+            local.la_anulare = []
+        try:
+            yield conn
+            if exterioara:
+                conn.commit()
+        except Exception:
+            if exterioara:
+                if local.conn is conn:
+                    conn.rollback()
+                for fn in local.la_anulare:
+                    fn()
+            raise
+        finally:
+            local.tx_depth = max(0, local.tx_depth - 1)
+            if exterioara:
+                local.la_anulare = []
+
+
+def _in_tranzactie():
+    return getattr(POOL._local, "tx_depth", 0) > 0
+
+
+def la_anulare(fn):
+    """Inregistreaza `fn` sa ruleze daca tranzactia curenta se anuleaza."""
+    POOL._local.la_anulare.append(fn)
+
 
 def exec_query(query, params=(), fetch=False):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(query, params)
-    rows = cur.fetchall() if fetch else None
-    conn.commit()
-    cur.close()
-    conn.close()
-    return rows
+    # o singura reincercare daca legatura a cazut inainte de commit
+    # (fara commit, serverul anuleaza oricum instructiunea)
+    masurat = INSTRUMENTARE.activa
+    for incercare in (1, 2):
+        if masurat:
+            t_cerere = time.perf_counter()
+        conn = POOL.acquire()
+        if masurat:
+            t_start = time.perf_counter()
+            randuri = 0
+        commit_trimis = False
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute(query, params)
+                rows = cur.fetchall() if fetch else None
+                if masurat:
+                    randuri = len(rows) if fetch else cur.rowcount
+            finally:
+                cur.close()
+            commit_trimis = True
+            if not _in_tranzactie():
+                conn.commit()
+        except BACKEND.Error as e:
+            if masurat:
+                INSTRUMENTARE.inregistreaza(query, time.perf_counter() - t_start, randuri,
+                                            t_start - t_cerere, params, eroare=True)
+            pierduta = BACKEND.conexiune_pierduta(e)
+            imbricat = POOL._local.depth > 1 or _in_tranzactie()
+            POOL.release(conn, broken=pierduta)
+            if pierduta and incercare == 1 and not imbricat and not commit_trimis:
+                continue
+            raise
+        except Exception:
+            POOL.release(conn)
+            raise
+        POOL.release(conn)
+        if masurat:
+            INSTRUMENTARE.inregistreaza(query, time.perf_counter() - t_start, randuri,
+                                        t_start - t_cerere, params)
+        return rows
+
+
+def exec_many(query, seq_params):
+    """
+    Acelasi INSERT/UPDATE pentru mai multe seturi de parametri, trimis
+    ca vector de parametri (fast_executemany) si confirmat o singura data.
+    """
+    seq_params = list(seq_params)
+    if not seq_params:
+        return 0
+    masurat = INSTRUMENTARE.activa
+    if masurat:
+        t_cerere = time.perf_counter()
+    with POOL.connection() as conn:
+        if masurat:
+            t_start = time.perf_counter()
+        cur = conn.cursor()
+        try:
+            BACKEND.pregateste_executemany(cur)
+            cur.executemany(query, seq_params)
+        except BACKEND.Error:
+            if masurat:
+                INSTRUMENTARE.inregistreaza(query, time.perf_counter() - t_start, 0,
+                                            t_start - t_cerere, seq_params, eroare=True)
+            raise
+        finally:
+            cur.close()
+        if not _in_tranzactie():
+            conn.commit()
+    if masurat:
+        INSTRUMENTARE.inregistreaza(query, time.perf_counter() - t_start, len(seq_params),
+                                    t_start - t_cerere, seq_params)
+    return len(seq_params)
+
+
+def iter_query(query, params=(), lot=5000):
+    """
+    Rezultatul unui SELECT mare, in loturi de `lot` randuri (fetchmany), pe o
+    conexiune dedicata: nu tine tot rezultatul in memorie si nu ocupa
+    conexiunea firului curent cat timp apelantul proceseaza loturile.
+    """
+    masurat = INSTRUMENTARE.activa
+    if masurat:
+        t_cerere = time.perf_counter()
+    with POOL.connection(dedicata=True) as conn:
+        if masurat:
+            # doar timpul petrecut in execute/fetchmany, nu si cel al apelantului
+            asteptare = time.perf_counter() - t_cerere
+            durata, total = 0.0, 0
+        eroare = False
+        cur = conn.cursor()
+        try:
+            t = time.perf_counter() if masurat else 0.0
+            cur.execute(query, params)
+            while True:
+                randuri = cur.fetchmany(lot)
+                if masurat:
+                    durata += time.perf_counter() - t
+                    total += len(randuri)
+                if not randuri:
+                    break
+                yield randuri
+                if masurat:
+                    t = time.perf_counter()
+        except BACKEND.Error:
+            eroare = True
+            raise
+        finally:
+            cur.close()
+            if masurat:
+                INSTRUMENTARE.inregistreaza(query, durata, total, asteptare, params, eroare=eroare)
+
+
+# ===== GENERATOR ID-URI =============================================
+ID_BLOC_INITIAL = 1000     # cate ID-uri se rezerva la o singura citire din SecventeID
+ID_BLOC_MAXIM = 100_000    # limita pentru blocurile marite adaptiv
+ID_CIFRE = 11              # PREFIX (2) + 11 cifre = CHAR(13)
+
+# tabelul/coloana fiecarui prefix; la prima folosire secventa porneste
+# dupa cel mai mare ID existent cu acelasi prefix
+ID_PREFIXE = {
+    "TR": ("Tranzactii", "ID_Transactie"),
+    "RG": ("ReguliRepartizare", "ID_Regula"),
+    "RP": ("Repartizari", "ID_Repartizare"),
+    "BG": ("Bugete", "ID_Buget"),
+    "EX": ("Exporturi", "ID_Export"),
+    "RA": ("Rapoarte", "ID_Raport"),
+    "LG": ("LogAudit", "ID_Log"),
+    "CS": ("CalculSalarii", "ID_Calcul"),
+    "PG": ("Programari", "ID_Programare"),
+}
+
+
+class IdGenerator:
+    """
+    ID-uri unice CHAR(13) de forma PREFIX + 11 cifre.
+
+    Fiecare proces inchiriaza din SecventeID blocuri de numere consecutive
+    (un singur UPDATE atomic pe bloc) si le imparte apoi din memorie, deci
+    mai multe procese nu se pot suprapune, iar un ID nu costa un drum la
+    server. Blocul se dubleaza cand se consuma repede. Numerele ramase
+    nefolosite la inchiderea procesului se pierd (gauri in secventa).
+    """
+
+    def __init__(self, bloc=ID_BLOC_INITIAL, bloc_maxim=ID_BLOC_MAXIM):
+        self.bloc_initial = bloc
+        self.bloc_maxim = bloc_maxim
+        self._lock = threading.Lock()
+        self._stare = {}   # prefix -> [urmatorul, limita (exclusiv), bloc, ultima inchiriere]
+
+    def next(self, prefix):
+        return self.block(prefix, 1)[0]
+
+    def block(self, prefix, n):
+        """n ID-uri noi pentru `prefix`, cu cel mult o inchiriere din baza."""
+        if prefix not in ID_PREFIXE:
+            raise ValueError(f"Prefix ID necunoscut: {prefix}")
+        with self._lock:
+            st = self._stare.get(prefix)
+            if st is None or st[1] - st[0] < n:
+                st = self._reinnoieste(prefix, st, n)
+            start = st[0]
+            st[0] += n
+        return [f"{prefix}{nr:0{ID_CIFRE}d}" for nr in range(start, start + n)]
+
+    def _reinnoieste(self, prefix, st, n):
+        acum = time.monotonic()
+        bloc = self.bloc_initial
+        if st is not None:
+            bloc = st[2]
+            if acum - st[3] < 1.0:
+                bloc = min(bloc * 2, self.bloc_maxim)
+        cerut = max(n, bloc)
+        start = self._inchiriaza(prefix, cerut)
+        st = [start, start + cerut, bloc, acum]
+        self._stare[prefix] = st
+        return st
+
+    @classmethod
+    def _inchiriaza(cls, prefix, n):
+        """Rezerva n numere pe o conexiune separata si confirma imediat."""
+        if not BACKEND.scrieri_paralele and _in_tranzactie():
+            # SQLite: conexiunea firului poate tine deja blocajul de scriere,
+            # iar o conexiune separata l-ar astepta la nesfarsit. Rezervam in
+            # tranzactia curenta; daca ea se anuleaza, limita blocului se
+            # reconfirma, ca numerele impartite deja din memorie sa nu revina.
+            with POOL.connection() as conn:
+                start = cls._inchiriaza_pe(conn, prefix, n, confirma=False)
+            la_anulare(lambda: cls._reconfirma(prefix, start + n))
+            return start
+        with POOL.connection(dedicata=True) as conn:
+            return cls._inchiriaza_pe(conn, prefix, n, confirma=True)
+
+    @staticmethod
+    def _inchiriaza_pe(conn, prefix, n, confirma):
+        cur = conn.cursor()
+        try:
+            for _ in range(3):
+                cur.execute(
+                    "UPDATE SecventeID SET Urmatorul = Urmatorul + ? WHERE Prefix = ?",
+                    (n, prefix)
+                )
+                if cur.rowcount:
+                    cur.execute("SELECT Urmatorul FROM SecventeID WHERE Prefix = ?", (prefix,))
+                    urmatorul = int(cur.fetchall()[0][0])
+                    if confirma:
+                        conn.commit()
+                    return urmatorul - n
+
+                # prima folosire a prefixului: pornim dupa ID-urile existente
+                tabel, coloana = ID_PREFIXE[prefix]
+                cur.execute(
+                    f"SELECT MAX({coloana}) FROM {tabel} WHERE {coloana} LIKE ?",
+                    (prefix + "%",)
+                )
+                ultim = cur.fetchall()[0][0]
+                cifre = ultim.strip()[len(prefix):] if ultim else ""
+                start = int(cifre) + 1 if cifre.isdigit() else 1
+                try:
+                    cur.execute(
+                        "INSERT INTO SecventeID (Prefix, Urmatorul) VALUES (?,?)",
+                        (prefix, start + n)
+                    )
+                    if confirma:
+                        conn.commit()
+                    return start
+                except BACKEND.Error:
+                    if not confirma:
+                        raise
+                    # alt proces a creat secventa intre timp; reluam UPDATE-ul
+                    conn.rollback()
+            raise RuntimeError(f"Nu s-a putut rezerva un bloc de ID-uri pentru {prefix}.")
+        finally:
+            cur.close()
+
+    @staticmethod
+    def _reconfirma(prefix, limita):
+        """Dupa o anulare: SecventeID trebuie sa ramana cel putin la `limita`."""
+        with POOL.connection(dedicata=True) as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    "UPDATE SecventeID SET Urmatorul = ? WHERE Prefix = ? AND Urmatorul < ?",
+                    (limita, prefix, limita)
+                )
+                cur.execute("SELECT COUNT(*) FROM SecventeID WHERE Prefix = ?", (prefix,))
+                if not cur.fetchall()[0][0]:
+                    cur.execute(
+                        "INSERT INTO SecventeID (Prefix, Urmatorul) VALUES (?,?)",
+                        (prefix, limita)
+                    )
+                conn.commit()
+            finally:
+                cur.close()
+
+
+ID_GEN = IdGenerator()
+
+
+# ===== PARAMETRI SISTEM =============================================
+def citeste_parametru(cheie, implicit=None):
+    rows = exec_query(
+        "SELECT Valoare FROM ParametriSistem WHERE Cheie = ?",
+        (cheie,),
+        fetch=True
+    ) or []
+    return rows[0][0] if rows else implicit
+
+
+def scrie_parametru(cheie, valoare):
+    with tranzactie():
+        exec_query("DELETE FROM ParametriSistem WHERE Cheie = ?", (cheie,))
+        exec_query(
+            "INSERT INTO ParametriSistem (Cheie, Valoare) VALUES (?,?)",
+            (cheie, valoare)
+        )
+
+
+# ===== CACHE DATE DE REFERINTA ======================================
+# Centrele, regulile si utilizatorii se schimba rar: se tin in memorie cel
+# mult CACHE_TTL secunde, iar aplicatia invalideaza tabela pe care o scrie.
+CACHE_TTL = 300  # s
+
+# nume -> (SELECT cu 7 coloane: nume, ID, apoi valorile; cate valori folosim)
+# aceeasi forma pentru toate, ca incarcarea initiala sa fie un singur UNION ALL;
+# pe SQL Server fiecare pozitie trebuie sa aiba acelasi tip in toate SELECT-urile
+# (altfel UNION converteste textul la DECIMAL), deci procentul vine ca text
+# si se citeste inapoi ca Decimal in _seteaza
+REFERINTE = {
+    "centre": (
+        "SELECT 'centre', ID_CentruResponsabil, Nume_Centru, Tip_Centru, NULL, NULL, "
+        "CAST(NULL AS DATETIME2) "
+        "FROM CentreResponsabilitate", 3
+    ),
+    "reguli": (
+        "SELECT 'reguli', ID_Regula, Descriere_Regula, Tip_Criteriu, Valoare_Criteriu, "
+        "CAST(Procent_Repartizare AS NVARCHAR(20)), Data_Modificare FROM ReguliRepartizare", 6
+    ),
+    "utilizatori": (
+        "SELECT 'utilizatori', ID_Utilizator, Login, Tip_Cont, Nume, Prenume, "
+        "CAST(NULL AS DATETIME2) "
+        "FROM Utilizatori", 5
+    ),
+}
+
+
+class CacheReferinte:
+    """
+    Dictionare ID -> rand pentru tabelele din REFERINTE (ID-urile fara
+    spatiile de la CHAR). Randurile pastreaza forma din SELECT, fara coloana nume.
+    """
+
+    def __init__(self, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._date = {}   # nume -> (expira_la, {id: rand}, versiune)
+
+    def incarca_tot(self):
+        """Incarcarea la pornire: toate tabelele intr-o singura interogare."""
+        rows = exec_query(" UNION ALL ".join(sql for sql, _ in REFERINTE.values()), fetch=True) or []
+        pe_tabel = {nume: [] for nume in REFERINTE}
+        for r in rows:
+            pe_tabel[r[0]].append(r)
+        with self._lock:
+            for nume, randuri in pe_tabel.items():
+                self._seteaza(nume, randuri)
+
+    def tabel(self, nume):
+        with self._lock:
+            intrare = self._date.get(nume)
+            if intrare is None or intrare[0] < time.monotonic():
+                rows = exec_query(REFERINTE[nume][0], fetch=True) or []
+                intrare = self._seteaza(nume, rows)
+            return intrare[1]
+
+    def randuri(self, nume):
+        """Randurile tabelei, ordonate dupa ID."""
+        date_tabel = self.tabel(nume)
+        return [date_tabel[k] for k in sorted(date_tabel)]
+
+    def get(self, nume, cheie, implicit=None):
+        if cheie is None:
+            return implicit
+        return self.tabel(nume).get(str(cheie).strip(), implicit)
+
+    def invalideaza(self, *nume):
+        with self._lock:
+            for n in nume or list(self._date):
+                self._date.pop(n, None)
+
+    def reguli(self):
+        """
+        Regulile de repartizare (ID, descriere, tip, valoare, procent, Data_Modificare).
+        Motorul de repartizare le foloseste intr-o tranzactie, deci aici se
+        verifica (COUNT, MAX(Data_Modificare)) in baza: si modificarile facute
+        de alte instante ale aplicatiei invalideaza cache-ul imediat.
+        """
+        rows = exec_query(
+            "SELECT COUNT(*), MAX(Data_Modificare) FROM ReguliRepartizare", fetch=True
+        ) or [(0, None)]
+        versiune = (int(rows[0][0]), _ca_datetime(rows[0][1]))
+        with self._lock:
+            intrare = self._date.get("reguli")
+            if intrare is not None and intrare[2] != versiune:
+                self._date.pop("reguli")
+        return self.randuri("reguli")
+
+    def _seteaza(self, nume, rows):
+        n = REFERINTE[nume][1]
+        randuri = {str(r[1]).strip(): tuple(r[1:1 + n]) for r in rows}
+        versiune = None
+        if nume == "reguli":
+            randuri = {k: r[:4] + (Decimal(str(r[4])), _ca_datetime(r[5])) for k, r in randuri.items()}
+            versiune = (len(randuri), max((r[5] for r in randuri.values()), default=None))
+        intrare = (time.monotonic() + self.ttl, randuri, versiune)
+        self._date[nume] = intrare
+        return intrare
+
+
+def _ca_datetime(valoare):
+    return datetime.fromisoformat(valoare) if isinstance(valoare, str) else valoare
+
+
+CACHE_REF = CacheReferinte()
+
+
+# ===== JURNAL AUDIT =================================================
+# Actiunile utilizatorilor intra intr-o coada in memorie; un fir separat le
+# scrie in LogAudit pe loturi. Cat timp baza nu raspunde, loturile se adauga
+# intr-un fisier local (o intrare JSON pe linie), reluat la prima scriere reusita.
+# Intrarile pe care baza le refuza ele insele (ex. utilizator sters) se muta in
+# fisierul de carantina, ca sa nu tina pe loc tot restul jurnalului.
+AUDIT_LOT = 200                            # intrari pe un INSERT
+AUDIT_INTERVAL = 1.0                       # s; cat asteapta un lot sa se umple
+AUDIT_PAUZA_DUPA_EROARE = 5.0              # s in care loturile merg direct in fisier
+AUDIT_FISIER_REZERVA = "audit_nescris.jsonl"
+AUDIT_FISIER_CARANTINA = "audit_respins.jsonl"
+
+INSERT_AUDIT = """
+    INSERT INTO LogAudit
+    (ID_Log, ID_Utilizator, Tip_Actiune, Data_Ora, Descriere)
+    VALUES (?,?,?,?,?)
+"""
+
+
+class JurnalAudit:
+    """
+    Scriere asincrona in LogAudit: scrie() doar pune intrarea in coada.
+    ID-urile se aloca la scrierea lotului, deci intrarile nu se mai suprapun
+    si nici nu se pierd daca baza e temporar indisponibila.
+    """
+
+    def __init__(self, fisier_rezerva=AUDIT_FISIER_REZERVA, lot=AUDIT_LOT, interval=AUDIT_INTERVAL,
+                 fisier_carantina=AUDIT_FISIER_CARANTINA):
+        self.fisier_rezerva = fisier_rezerva
+        self.fisier_carantina = fisier_carantina
+        self.lot = lot
+        self.interval = interval
+        self._coada = queue.Queue()
+        self._oprit = threading.Event()
+        self._lock = threading.Lock()          # pornirea firului si fisierul de rezerva
+        self._fir = None
+        self._indisponibil_pana = 0.0
+
+    def scrie(self, id_utilizator, tip_actiune, descriere):
+        intrare = (id_utilizator, tip_actiune[:20], datetime.now(), (descriere or "")[:150])
+        if self._oprit.is_set():
+            self._salveaza_rezerva([intrare])  # dupa inchide() nu mai exista fir de scriere
+            return
+        self._coada.put(intrare)
+        if self._fir is None:
+            self._porneste()
+
+    def _porneste(self):
+        with self._lock:
+            if self._fir is None and not self._oprit.is_set():
+                self._fir = threading.Thread(target=self._bucla, name="jurnal-audit", daemon=True)
+                self._fir.start()
+
+    def goleste(self, timeout=10.0):
+        """Asteapta pana cand tot ce era in coada a fost scris (in baza sau in fisier)."""
+        limita = time.monotonic() + timeout
+        while self._coada.unfinished_tasks and time.monotonic() < limita:
+            time.sleep(0.02)
+        return not self._coada.unfinished_tasks
+
+    def inchide(self, timeout=10.0):
+        """La iesire: scrie ce a ramas; daca firul nu termina la timp, restul merge in fisier."""
+        self._oprit.set()
+        fir = self._fir
+        if fir is not None:
+            fir.join(timeout)
+        ramase = self._extrage_tot()
+        if ramase:
+            self._salveaza_rezerva(ramase)
+
+    # --- firul de scriere -------------------------------------------------
+    def _bucla(self):
+        while True:
+            lot = self._extrage()
+            if lot:
+                self._scrie_lot(lot)
+                for _ in lot:
+                    self._coada.task_done()
+            elif self._oprit.is_set():
+                break
+            elif self._disponibil():
+                self._reia_rezerva_sigur()
+
+    def _extrage(self):
+        try:
+            lot = [self._coada.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+        limita = time.monotonic() + self.interval
+        while len(lot) < self.lot:
+            rest = 0 if self._oprit.is_set() else limita - time.monotonic()
+            try:
+                lot.append(self._coada.get(timeout=rest) if rest > 0 else self._coada.get_nowait())
+            except queue.Empty:
+                break
+        return lot
+
+    def _extrage_tot(self):
+        intrari = []
+        while True:
+            try:
+                intrari.append(self._coada.get_nowait())
+            except queue.Empty:
+                return intrari
+            self._coada.task_done()
+
+    def _disponibil(self):
+        return time.monotonic() >= self._indisponibil_pana
+
+    def _scrie_lot(self, lot):
+        if self._disponibil():
+            try:
+                self._reia_rezerva()
+                self._insereaza(lot)
+                return
+            except Exception:
+                self._indisponibil_pana = time.monotonic() + AUDIT_PAUZA_DUPA_EROARE
+        self._salveaza_rezerva(lot)
+
+    @staticmethod
+    def _insereaza(intrari):
+        with tranzactie():  # totul sau nimic, ca reluarea sa nu dubleze intrari
+            for i in range(0, len(intrari), AUDIT_LOT):
+                parte = intrari[i:i + AUDIT_LOT]
+                ids = ID_GEN.block("LG", len(parte))
+                exec_many(INSERT_AUDIT, [(id_log,) + tuple(e) for id_log, e in zip(ids, parte)])
+
+    # --- fisierul de rezerva ----------------------------------------------
+    def _salveaza_rezerva(self, intrari):
+        with self._lock:
+            with open(self.fisier_rezerva, "a", encoding="utf-8") as f:
+                for id_u, tip, data_ora, desc in intrari:
+                    f.write(json.dumps([id_u, tip, data_ora.isoformat(), desc], ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _reia_rezerva(self):
+        """
+        Scrie in baza intrarile din fisierul de rezerva, pe loturi. Un lot
+        respins pentru datele lui se reia intrare cu intrare, iar intrarile
+        refuzate (si liniile ilizibile) merg in fisierul de carantina. La
+        orice alta eroare ce n-a ajuns in baza ramane in fisierul de rezerva
+        si eroarea se propaga. Intoarce cate intrari s-au scris.
+        """
+        with self._lock:
+            if not os.path.exists(self.fisier_rezerva):
+                return 0
+            with open(self.fisier_rezerva, encoding="utf-8") as f:
+                linii = [linie.rstrip("\n") for linie in f if linie.strip()]
+
+            intrari, respinse = [], []
+            for linie in linii:
+                try:
+                    id_u, tip, data_ora, desc = json.loads(linie)
+                    intrari.append((linie, (id_u, tip, datetime.fromisoformat(data_ora), desc)))
+                except (ValueError, TypeError) as e:
+                    respinse.append((linie, e))
+
+            facute = scrise = 0
+            try:
+                while facute < len(intrari):
+                    parte = intrari[facute:facute + self.lot]
+                    try:
+                        self._insereaza([e for _, e in parte])
+                        facute += len(parte)
+                        scrise += len(parte)
+                        continue
+                    except Exception as e:
+                        if not BACKEND.eroare_de_date(e):
+                            raise
+                    for linie, intrare in parte:
+                        try:
+                            self._insereaza([intrare])
+                            scrise += 1
+                        except Exception as e:
+                            if not BACKEND.eroare_de_date(e):
+                                raise
+                            respinse.append((linie, e))
+                        facute += 1
+            finally:
+                self._pune_in_carantina(respinse)
+                ramase = [linie for linie, _ in intrari[facute:]]
+                if ramase:
+                    temporar = self.fisier_rezerva + ".tmp"
+                    with open(temporar, "w", encoding="utf-8") as f:
+                        f.writelines(linie + "\n" for linie in ramase)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(temporar, self.fisier_rezerva)
+                else:
+                    os.remove(self.fisier_rezerva)
+            return scrise
+
+    def _pune_in_carantina(self, respinse):
+        if not respinse:
+            return
+        with open(self.fisier_carantina, "a", encoding="utf-8") as f:
+            for linie, eroare in respinse:
+                f.write(json.dumps({"intrare": linie, "eroare": str(eroare)}, ensure_ascii=False) + "\n")
+
+    def _reia_rezerva_sigur(self):
+        try:
+            self._reia_rezerva()
+        except Exception:
+            self._indisponibil_pana = time.monotonic() + AUDIT_PAUZA_DUPA_EROARE
+
+
+AUDIT = JurnalAudit()
+
+
+# ===== VERSIUNI DATE SI PERIOADE INCHISE ============================
+# VersiuniDate tine un contor pe (domeniu, an, luna), crescut in aceeasi
+# tranzactie SQL cu scrierea datelor din domeniu. Suma contoarelor unei
+# perioade se schimba la orice scriere in ea, si din alte instante ale
+# aplicatiei: cache-ul de rapoarte o foloseste ca versiune a rezultatului.
+# Luna = 0: contorul intregului an (Bugete); An = 0: al intregului domeniu
+# (Repartizari, reconstructii), inclus in orice perioada.
+ASIGURA_VERSIUNE = """
+    INSERT INTO VersiuniDate (Domeniu, An, Luna, Versiune)
+    SELECT ?, ?, ?, 0
+    WHERE NOT EXISTS (
+        SELECT 1 FROM VersiuniDate WITH (UPDLOCK, HOLDLOCK)
+        WHERE Domeniu = ? AND An = ? AND Luna = ?
+    )
+"""
+
+CRESTE_VERSIUNE = """
+    UPDATE VersiuniDate SET Versiune = Versiune + 1
+    WHERE Domeniu = ? AND An = ? AND Luna = ?
+"""
+
+# perioadele de dinainte de aceasta data (exclusiv) sunt inchise: nu se mai
+# asteapta scrieri in ele, asa ca rapoartele lor se servesc din cache fara
+# sa se verifice versiunea la fiecare cerere. Scrierile nu se blocheaza si
+# cresc versiunea ca oricare alta.
+PARAM_INCHIDERE = "perioade.inchise_pana_la"
+
+
+def creste_versiuni(domeniu, chei):
+    """Creste contorul (domeniu, an, luna) pentru fiecare (an, luna) din `chei`."""
+    chei = sorted({(domeniu,) + tuple(k) for k in chei})
+    if not chei:
+        return
+    with tranzactie():
+        exec_many(ASIGURA_VERSIUNE, [k + k for k in chei])
+        exec_many(CRESTE_VERSIUNE, chei)
+
+
+def versiune_date(domenii, interval=None):
+    """Suma contoarelor `domenii` pe intervalul [inceput, sfarsit) (None = tot)."""
+    cond = f"Domeniu IN ({', '.join('?' * len(domenii))})"
+    params = tuple(domenii)
+    if interval is not None:
+        inceput, sfarsit = interval
+        ultima = _luna_plus(sfarsit.year, sfarsit.month, -1)
+        cond += (" AND (An = 0 OR (Luna = 0 AND An >= ? AND An <= ?)"
+                 " OR (Luna > 0 AND An * 100 + Luna >= ? AND An * 100 + Luna <= ?))")
+        params += (inceput.year, ultima.year,
+                   inceput.year * 100 + inceput.month, ultima.year * 100 + ultima.month)
+    rows = exec_query(f"SELECT SUM(Versiune) FROM VersiuniDate WHERE {cond}", params, fetch=True) or []
+    return int(rows[0][0] or 0) if rows else 0
+
+
+def data_inchidere():
+    """Prima zi care nu e inchisa (None daca nicio perioada nu e inchisa)."""
+    valoare = citeste_parametru(PARAM_INCHIDERE)
+    return date.fromisoformat(valoare) if valoare else None
+
+
+def inchide_perioade(pana_la):
+    """Inchide tot ce e inainte de `pana_la`; data de inchidere doar avanseaza."""
+    with tranzactie():
+        actuala = data_inchidere()
+        if actuala is not None and pana_la < actuala:
+            raise ValueError(f"Perioadele sunt deja închise până la {actuala.isoformat()}.")
+        scrie_parametru(PARAM_INCHIDERE, pana_la.isoformat())
+
+
+# ===== TRANZACTII SI TOTALURI PE PERIOADA ===========================
+# TotaluriPerioada tine SUM(Suma) si COUNT(*) pe (an, luna, centru, tip);
+# se actualizeaza in aceeasi tranzactie cu INSERT-ul in Tranzactii, deci
+# orice tranzactie noua trebuie sa treaca prin insereaza_tranzactii().
+# Centru = '' pentru tranzactiile fara centru.
+INSERT_TRANZACTIE = """
+    INSERT INTO Tranzactii
+    (ID_Transactie, Tip_Operatiune, Suma, Data_Operatiune,
+     Descriere, ID_CentruResponsabil)
+    VALUES (?,?,?,?,?,?)
+"""
+
+# randul lipsa se creeaza cu zero sub blocaj, apoi se aduna delta
+ASIGURA_TOTAL = """
+    INSERT INTO TotaluriPerioada (An, Luna, Centru, Tip_Operatiune, Total, Numar)
+    SELECT ?, ?, ?, ?, 0, 0
+    WHERE NOT EXISTS (
+        SELECT 1 FROM TotaluriPerioada WITH (UPDLOCK, HOLDLOCK)
+        WHERE An = ? AND Luna = ? AND Centru = ? AND Tip_Operatiune = ?
+    )
+"""
+
+ADUNA_TOTAL = """
+    UPDATE TotaluriPerioada
+    SET Total = Total + ?, Numar = Numar + ?
+    WHERE An = ? AND Luna = ? AND Centru = ? AND Tip_Operatiune = ?
+"""
+
+TOTALURI_DIN_TRANZACTII = """
+    SELECT YEAR(Data_Operatiune), MONTH(Data_Operatiune),
+           ISNULL(ID_CentruResponsabil, ''), Tip_Operatiune, SUM(Suma), COUNT(*)
+    FROM Tranzactii
+    GROUP BY YEAR(Data_Operatiune), MONTH(Data_Operatiune),
+             ISNULL(ID_CentruResponsabil, ''), Tip_Operatiune
+"""
+
+
+# Executia bugetelor: Suma_EfectivaCheltuita e suma cheltuielilor centrului
+# in anul bugetului, tinuta la zi tot de insereaza_tranzactii; statusul se
+# recalculeaza in acelasi UPDATE, deci citirea unui buget e un singur rand.
+def _status_executie(efectiv):
+    """Expresia SQL a statusului unui buget cu efectivul dat (expresie SQL)."""
+    return (f"CASE WHEN {efectiv} > Suma_Alocata THEN 'Depasit' "
+            f"WHEN {efectiv} < Suma_Alocata * 0.5 THEN 'Subutilizat' ELSE 'In limita' END")
+
+
+ADUNA_EXECUTIE = f"""
+    UPDATE Bugete
+    SET Suma_EfectivaCheltuita = Suma_EfectivaCheltuita + ?,
+        Status_Executie = {_status_executie("(Suma_EfectivaCheltuita + ?)")}
+    WHERE ID_CentruResponsabil = ? AND An_Buget = ?
+"""
+
+CHELTUIELI_DIN_TOTALURI = """
+    SELECT Centru, An, SUM(Total)
+    FROM TotaluriPerioada
+    WHERE Tip_Operatiune = 'Cheltuiala' AND Centru <> ''
+    GROUP BY Centru, An
+"""
+
+
+def _an_luna(data_op):
+    if isinstance(data_op, str):
+        return int(data_op[:4]), int(data_op[5:7])
+    return data_op.year, data_op.month
+
+
+def insereaza_tranzactii(randuri):
+    """
+    Insereaza tranzactii (tip, suma, data, descriere, centru) si actualizeaza
+    TotaluriPerioada, executia bugetelor si VersiuniDate in aceeasi tranzactie SQL.
+    Intoarce ID-urile alocate.
+    """
+    randuri = list(randuri)
+    if not randuri:
+        return []
+    ids = ID_GEN.block("TR", len(randuri))
+
+    delte = {}
+    for tip, suma, data_op, _desc, centru in randuri:
+        an, luna = _an_luna(data_op)
+        cheie = (an, luna, (centru or "").strip(), tip)
+        total, numar = delte.get(cheie, (0, 0))
+        delte[cheie] = (total + suma, numar + 1)
+    cheltuieli = {}
+    for (an, _luna, centru, tip), (total, _n) in delte.items():
+        if tip == "Cheltuiala" and centru:
+            cheltuieli[(centru, an)] = cheltuieli.get((centru, an), 0) + total
+
+    with tranzactie():
+        exec_many(INSERT_TRANZACTIE, [(i,) + tuple(r) for i, r in zip(ids, randuri)])
+        exec_many(ASIGURA_TOTAL, [k + k for k in sorted(delte)])
+        exec_many(ADUNA_TOTAL, [(t, n) + k for k, (t, n) in sorted(delte.items())])
+        exec_many(ADUNA_EXECUTIE, [
+            (t, t, t, centru, str(an)) for (centru, an), t in sorted(cheltuieli.items())
+        ])
+        creste_versiuni("Tranzactii", {k[:2] for k in delte})
+    return ids
+
+
+def _totaluri_calculate():
+    rows = exec_query(TOTALURI_DIN_TRANZACTII, fetch=True) or []
+    # Decimal(str()): SUM pe SQLite intoarce float
+    return {(int(r[0]), int(r[1]), r[2].strip(), r[3]): (Decimal(str(r[4])), int(r[5])) for r in rows}
+
+
+def reconstruieste_totaluri():
+    """Recalculeaza TotaluriPerioada din Tranzactii (dupa migrare sau la neconcordante)."""
+    totaluri = _totaluri_calculate()
+    with tranzactie():
+        exec_query("DELETE FROM TotaluriPerioada")
+        exec_many(
+            "INSERT INTO TotaluriPerioada (An, Luna, Centru, Tip_Operatiune, Total, Numar) "
+            "VALUES (?,?,?,?,?,?)",
+            [k + v for k, v in sorted(totaluri.items())]
+        )
+        creste_versiuni("Tranzactii", [(0, 0)])
+        recalculeaza_executie_bugete()
+    CACHE_RAPOARTE.invalideaza()
+    return len(totaluri)
+
+
+def recalculeaza_executie_bugete():
+    """Efectivul si statusul tuturor bugetelor, din TotaluriPerioada."""
+    cheltuieli = exec_query(CHELTUIELI_DIN_TOTALURI, fetch=True) or []
+    with tranzactie():
+        exec_query("UPDATE Bugete SET Suma_EfectivaCheltuita = 0")
+        exec_many(ADUNA_EXECUTIE, [(t, t, t, c.strip(), str(an)) for c, an, t in cheltuieli])
+        exec_query(f"UPDATE Bugete SET Status_Executie = {_status_executie('Suma_EfectivaCheltuita')}")
+        creste_versiuni("Bugete", [(0, 0)])
+
+
+def adauga_buget(centru, an, suma_alocata):
+    """
+    Buget nou pentru (centru, an): efectivul porneste de la cheltuielile deja
+    inregistrate in an, apoi il tine la zi insereaza_tranzactii. Intoarce ID-ul.
+    """
+    if not (len(an) == 4 and an.isdigit()):
+        raise ValueError("Anul trebuie să aibă forma AAAA.")
+    id_b = ID_GEN.next("BG")
+    with tranzactie():
+        exec_query(
+            """
+            INSERT INTO Bugete
+            (ID_Buget, ID_CentruResponsabil, An_Buget, Suma_Alocata, Suma_EfectivaCheltuita)
+            SELECT ?, ?, ?, ?, ISNULL(SUM(Total), 0)
+            FROM TotaluriPerioada
+            WHERE An = ? AND Centru = ? AND Tip_Operatiune = 'Cheltuiala'
+            """,
+            (id_b, centru, an, suma_alocata, int(an), centru)
+        )
+        exec_query(
+            f"UPDATE Bugete SET Status_Executie = {_status_executie('Suma_EfectivaCheltuita')} "
+            "WHERE ID_Buget = ?",
+            (id_b,)
+        )
+        creste_versiuni("Bugete", [(int(an), 0)])
+    return id_b
+
+
+def verifica_totaluri():
+    """Diferentele (cheie, stocat, calculat) dintre TotaluriPerioada si Tranzactii."""
+    calculate = _totaluri_calculate()
+    rows = exec_query(
+        "SELECT An, Luna, Centru, Tip_Operatiune, Total, Numar FROM TotaluriPerioada",
+        fetch=True
+    ) or []
+    stocate = {(int(r[0]), int(r[1]), r[2].strip(), r[3]): (Decimal(str(r[4])), int(r[5])) for r in rows}
+    diferente = []
+    for cheie in sorted(set(calculate) | set(stocate)):
+        stocat = stocate.get(cheie, (0, 0))
+        calculat = calculate.get(cheie, (0, 0))
+        if stocat[1] != calculat[1] or round(stocat[0] - calculat[0], 2) != 0:
+            diferente.append((cheie, stocat, calculat))
+    return diferente
+
+
+# ===== MOTOR REPARTIZARE ============================================
+REPARTIZARE_LOT = 5000    # tranzactii citite si scrise pe lot
+CENTRU_IMPLICIT = "CR001" # centrul folosit cand tranzactia nu are centru
+
+# marcajele (ParametriSistem) pana la care s-a facut repartizarea
+PARAM_MARCAJ_TRANZACTII = "repartizare.marcaj_tranzactii"
+PARAM_MARCAJ_REGULI = "repartizare.marcaj_reguli"
+# Data_Inregistrare se ia la INSERT, nu la commit: o tranzactie inca
+# necomisa cand se citeste MAX(...) poate aparea mai tarziu cu o data sub
+# marcaj. Rularile urmatoare reiau deci si fereastra asta din urma
+# marcajului; ce e deja scris se sare (perechi existente / NOT EXISTS).
+MARCAJ_SUPRAPUNERE = timedelta(minutes=10)
+
+INSERT_REPARTIZARE = """
+    INSERT INTO Repartizari
+    (ID_Repartizare, ID_Transactie, ID_CentruResponsabil,
+     Procent_Repartizare, Coeficient, ID_Regula, Suma_Repartizata, Data_Operatiune)
+    VALUES (?,?,?,?,?,?,?,?)
+"""
+
+
+# ----- criterii de repartizare ---------------------------------------
+# Tip_Criteriu / Valoare_Criteriu:
+#   Tip_Operatiune  Venit                  egalitate
+#   Centru          CR002                  egalitate (fara spatiile din CHAR)
+#   Suma            1000..5000             interval inchis; capetele pot lipsi
+#                                          ("10000..", "..500"), "1500" = exact
+#   Data            2025-01-01..2025-03-31 interval inchis de zile; capetele pot
+#                                          fi si perioade ("2025-03", "2025Q1")
+#   Descriere       transport              cuvant continut in descriere
+#   Regex           ^factura\s+\d+         expresie regulata cautata in descriere
+#   Compus          Tip_Operatiune=Cheltuiala & Suma=1000.. & Descriere=motorina
+#                                          toate conditiile (SI)
+# Descrierea se compara fara diacritice si fara majuscule. Criteriile invalide
+# nu se potrivesc cu nicio tranzactie (ca tipurile necunoscute de pana acum).
+CRITERII_REPARTIZARE = ("Tip_Operatiune", "Centru", "Suma", "Data", "Descriere", "Regex", "Compus")
+_CRITERII = {c.lower(): c for c in CRITERII_REPARTIZARE}
+
+# coloanele citite pentru repartizare, in ordinea din tuplurile tranzactiilor
+COLOANE_REPARTIZARE = (
+    "ID_Transactie, Tip_Operatiune, ID_CentruResponsabil, Suma, Data_Operatiune, Descriere"
+)
+
+_INFINIT = float("inf")
+
+
+def _zi_ordinal(valoare):
+    if isinstance(valoare, str):
+        valoare = date.fromisoformat(valoare[:10])
+    return valoare.toordinal()
+
+
+def text_criteriu(text):
+    """Forma in care se compara descrierile: fara diacritice, litere mici."""
+    return _fara_diacritice(text or "").lower()
+
+
+def _suma_criteriu(text):
+    try:
+        return Decimal(text.replace(",", ".").replace(" ", ""))
+    except ArithmeticError:
+        raise ValueError(f"Sumă invalidă în criteriu: „{text}”.")
+
+
+def _zile_criteriu(text):
+    """Zilele (prima, ultima) ale unei date AAAA-LL-ZZ sau ale unei perioade."""
+    if len(text) == 10:
+        try:
+            zi = date.fromisoformat(text).toordinal()
+        except ValueError:
+            raise ValueError(f"Dată invalidă în criteriu: „{text}”.")
+        return zi, zi
+    inceput, sfarsit = interval_perioada(text) or (None, None)
+    if inceput is None:
+        raise ValueError("Criteriul Data are nevoie de o dată sau de o perioadă.")
+    return inceput.toordinal(), sfarsit.toordinal() - 1
+
+
+def _interval_criteriu(text, capete):
+    """'a..b' / 'a..' / '..b' / 'a' -> (min, max); `capete(x)` da (prima, ultima) valoare a lui x."""
+    if ".." in text:
+        a, b = (p.strip() for p in text.split("..", 1))
+        if not a and not b:
+            raise ValueError("Intervalul are nevoie de cel puțin un capăt.")
+        lo = capete(a)[0] if a else -_INFINIT
+        hi = capete(b)[1] if b else _INFINIT
+    else:
+        lo, hi = capete(text)
+    if lo > hi:
+        raise ValueError(f"Interval gol: „{text}”.")
+    return lo, hi
+
+
+def parseaza_criteriu(tip_c, val_c):
+    """
+    Conditiile (camp, valoare) ale unui criteriu de regula, toate obligatorii.
+    Arunca ValueError pentru criterii necunoscute sau valori invalide.
+    """
+    tip = _CRITERII.get((tip_c or "").strip().lower())
+    if tip is None:
+        raise ValueError(f"Tip de criteriu necunoscut: „{tip_c}” ({', '.join(CRITERII_REPARTIZARE)}).")
+    val = (val_c or "").strip()
+    if tip in ("Tip_Operatiune", "Centru"):
+        return [(tip, val or None)]
+    if not val:
+        raise ValueError(f"Criteriul {tip} are nevoie de o valoare.")
+    if tip == "Suma":
+        lo, hi = _interval_criteriu(val, lambda s: (_suma_criteriu(s),) * 2)
+        return [(tip, (Decimal(lo), Decimal(hi)))]
+    if tip == "Data":
+        return [(tip, _interval_criteriu(val, _zile_criteriu))]
+    if tip == "Descriere":
+        return [(tip, text_criteriu(val))]
+    if tip == "Regex":
+        try:
+            return [(tip, re.compile(_fara_diacritice(val), re.I))]
+        except re.error as e:
+            raise ValueError(f"Expresie regulată invalidă „{val}”: {e}")
+    conditii = []
+    for parte in val.split("&"):
+        camp, egal, valoare = parte.partition("=")
+        if not egal or _CRITERII.get(camp.strip().lower()) in (None, "Compus"):
+            raise ValueError(f"Condiție invalidă în criteriul compus: „{parte.strip()}” (Camp=valoare).")
+        conditii += parseaza_criteriu(camp, valoare)
+    return conditii
+
+
+def conditie_indeplinita(conditie, tr):
+    """O conditie (din parseaza_criteriu) evaluata direct pe o tranzactie (COLOANE_REPARTIZARE)."""
+    camp, val = conditie
+    if camp == "Tip_Operatiune":
+        return tr[1] == val
+    if camp == "Centru":
+        return tr[2] is not None and tr[2].strip() == val
+    if camp == "Suma":
+        return tr[3] is not None and val[0] <= tr[3] <= val[1]
+    if camp == "Data":
+        return tr[4] is not None and val[0] <= _zi_ordinal(tr[4]) <= val[1]
+    if camp == "Descriere":
+        return val in text_criteriu(tr[5])
+    return val.search(text_criteriu(tr[5])) is not None
+
+
+def conditie_sql_criteriu(conditii):
+    """
+    WHERE-ul (si parametrii) care cuprinde cel putin tranzactiile vizate de
+    conditii. Descrierea nu se filtreaza in SQL (colatia serverului nu
+    ignora diacriticele la fel); restul il verifica motorul de reguli.
+    """
+    parti, params = [], []
+    for camp, val in conditii:
+        if camp == "Tip_Operatiune":
+            parti.append("Tip_Operatiune = ?")
+            params.append(val)
+        elif camp == "Centru":
+            parti.append("ID_CentruResponsabil = ?")
+            params.append(val)
+        elif camp in ("Suma", "Data"):
+            coloana = "Suma" if camp == "Suma" else "Data_Operatiune"
+            lo, hi = val
+            if lo != -_INFINIT:
+                parti.append(f"{coloana} >= ?")
+                params.append(lo if camp == "Suma" else date.fromordinal(lo))
+            if hi != _INFINIT:
+                if camp == "Suma":
+                    parti.append("Suma <= ?")
+                    params.append(hi)
+                else:
+                    parti.append("Data_Operatiune < ?")
+                    params.append(date.fromordinal(hi + 1))
+    return " AND ".join(parti) or "1=1", tuple(params)
+
+
+class ArboreIntervale:
+    """
+    Arbore de intervale centrat, static: pentru un punct, valorile tuturor
+    intervalelor inchise (inceput, sfarsit, valoare) care il contin, in
+    O(log n + k). Fiecare nod tine intervalele care trec prin centrul lui,
+    sortate dupa inceput si dupa sfarsit.
+    """
+
+    def __init__(self, intervale):
+        self._radacina = self._construieste(list(intervale))
+
+    def _construieste(self, intervale):
+        if not intervale:
+            return None
+        capete = sorted(x for iv in intervale for x in iv[:2])
+        centru = capete[len(capete) // 2]
+        stanga, dreapta, aici = [], [], []
+        for iv in intervale:
+            if iv[1] < centru:
+                stanga.append(iv)
+            elif iv[0] > centru:
+                dreapta.append(iv)
+            else:
+                aici.append(iv)
+        return (centru,
+                sorted(aici, key=lambda iv: iv[0]),
+                sorted(aici, key=lambda iv: iv[1], reverse=True),
+                self._construieste(stanga),
+                self._construieste(dreapta))
+
+    def cauta(self, x):
+        gasite = []
+        nod = self._radacina
+        while nod is not None:
+            centru, dupa_inceput, dupa_sfarsit, stanga, dreapta = nod
+            if x < centru:
+                for lo, _hi, val in dupa_inceput:
+                    if lo > x:
+                        break
+                    gasite.append(val)
+                nod = stanga
+            elif x > centru:
+                for _lo, hi, val in dupa_sfarsit:
+                    if hi < x:
+                        break
+                    gasite.append(val)
+                nod = dreapta
+            else:
+                gasite.extend(val for _lo, _hi, val in dupa_inceput)
+                break
+        return gasite
+
+
+class AutomatCuvinte:
+    """
+    Automat Aho-Corasick peste o lista de cuvinte: indicii tuturor
+    cuvintelor continute intr-un text, dintr-o singura trecere prin text,
+    oricate cuvinte ar fi.
+    """
+
+    def __init__(self, cuvinte):
+        tranzitii, iesiri = [{}], [[]]
+        for i, cuvant in enumerate(cuvinte):
+            stare = 0
+            for c in cuvant:
+                urmatoare = tranzitii[stare].get(c)
+                if urmatoare is None:
+                    urmatoare = len(tranzitii)
+                    tranzitii[stare][c] = urmatoare
+                    tranzitii.append({})
+                    iesiri.append([])
+                stare = urmatoare
+            iesiri[stare].append(i)
+
+        # legaturile de esec, in latime: cel mai lung sufix care e si prefix
+        esec = [0] * len(tranzitii)
+        coada = deque(tranzitii[0].values())
+        while coada:
+            stare = coada.popleft()
+            for c, urmatoare in tranzitii[stare].items():
+                coada.append(urmatoare)
+                f = esec[stare]
+                while f and c not in tranzitii[f]:
+                    f = esec[f]
+                esec[urmatoare] = tranzitii[f].get(c, 0)
+                iesiri[urmatoare] = iesiri[urmatoare] + iesiri[esec[urmatoare]]
+        self._tranzitii, self._esec, self._iesiri = tranzitii, esec, iesiri
+
+    def cauta(self, text):
+        tranzitii, esec, iesiri = self._tranzitii, self._esec, self._iesiri
+        gasite = set()
+        stare = 0
+        for c in text:
+            while stare and c not in tranzitii[stare]:
+                stare = esec[stare]
+            stare = tranzitii[stare].get(c, 0)
+            if iesiri[stare]:
+                gasite.update(iesiri[stare])
+        return gasite
+
+
+class MotorReguli:
+    """
+    Regulile de repartizare compilate o singura data intr-o structura de
+    decizie: egalitatile intr-un dict, intervalele de suma si de data in
+    arbori de intervale, cuvintele cheie intr-un automat Aho-Corasick, iar
+    expresiile regulate in spatele unei singure expresii combinate.
+
+    Fiecare conditie satisfacuta de o tranzactie numara un punct pentru
+    regula ei; regula se aplica cand le are pe toate (criteriile compuse
+    sunt conjunctii). Costul pe tranzactie depinde astfel de conditiile
+    atinse, nu de numarul de reguli.
+
+    `tinte` ({ID_Regula: [(centru, pondere)]}, ca citeste_centre_tinta) sunt
+    centrele catre care regulile isi trimit partea.
+    """
+
+    def __init__(self, reguli, tinte=None):
+        self.reguli = list(reguli)
+        self.tinte = _tinte_motor(tinte)
+        self.planuri = [_plan_regula(reg, self.tinte) for reg in self.reguli]
+        self.invalide = {}                  # ID_Regula -> motivul
+        self._conditii = []                 # numarul de conditii al fiecarei reguli
+        egalitati, sume, zile, cuvinte, regexuri = {}, [], [], {}, []
+        for poz, reg in enumerate(self.reguli):
+            try:
+                conditii = parseaza_criteriu(reg[2], reg[3])
+            except ValueError as e:
+                self.invalide[reg[0]] = str(e)
+                conditii = []
+            self._conditii.append(len(conditii))
+            for camp, val in conditii:
+                if camp in ("Tip_Operatiune", "Centru"):
+                    egalitati.setdefault((camp, val), []).append(poz)
+                elif camp == "Suma":
+                    sume.append((val[0], val[1], poz))
+                elif camp == "Data":
+                    zile.append((val[0], val[1], poz))
+                elif camp == "Descriere":
+                    cuvinte.setdefault(val, []).append(poz)
+                else:
+                    regexuri.append((val, poz))
+
+        self._egalitati = egalitati
+        self._sume = ArboreIntervale(sume) if sume else None
+        self._zile = ArboreIntervale(zile) if zile else None
+        self._automat = AutomatCuvinte(list(cuvinte)) if cuvinte else None
+        self._reguli_cuvant = list(cuvinte.values())
+        self._regexuri = regexuri
+        self._poarta = None
+        if len(regexuri) > 1:
+            try:
+                self._poarta = re.compile("|".join(f"(?:{rx.pattern})" for rx, _ in regexuri), re.I)
+            except re.error:
+                pass   # ex. referinte inapoi numerotate: se evalueaza fiecare
+        self._text = bool(cuvinte or regexuri)
+        self._simple = all(n == 1 for n in self._conditii)
+
+    def potrivite(self, tr):
+        """Regulile aplicabile unei tranzactii (COLOANE_REPARTIZARE), in ordinea din tabel."""
+        return [self.reguli[poz] for poz in self.pozitii(tr)]
+
+    def pozitii(self, tr):
+        """Pozitiile (in `reguli`) regulilor aplicabile unei tranzactii, crescator."""
+        _, tip_op, centru_tr, suma, data_op, descriere = tr
+        atinse = list(self._egalitati.get(("Tip_Operatiune", tip_op), ()))
+        if centru_tr is not None:
+            atinse += self._egalitati.get(("Centru", centru_tr.strip()), ())
+        if self._sume is not None and suma is not None:
+            atinse += self._sume.cauta(suma)
+        if self._zile is not None and data_op is not None:
+            atinse += self._zile.cauta(_zi_ordinal(data_op))
+        if self._text:
+            text = text_criteriu(descriere)
+            if self._automat is not None:
+                for i in self._automat.cauta(text):
+                    atinse += self._reguli_cuvant[i]
+            if self._regexuri and (self._poarta is None or self._poarta.search(text)):
+                atinse += [poz for rx, poz in self._regexuri if rx.search(text)]
+        if not atinse or self._simple:
+            atinse.sort()
+            return atinse
+        puncte = {}
+        for poz in atinse:
+            puncte[poz] = puncte.get(poz, 0) + 1
+        conditii = self._conditii
+        return [poz for poz in sorted(puncte) if puncte[poz] == conditii[poz]]
+
+
+# ----- centre tinta si sume repartizate ------------------------------
+# O regula fara centre tinta trimite partea ei centrului tranzactiei (sau
+# CENTRU_IMPLICIT). Cu centre tinta (ReguliCentreTinta), partea se imparte
+# intre ele proportional cu ponderile. Partea fiecarei reguli se rotunjeste
+# separat la bani, ca reaplicarea unei singure reguli (repartizarea
+# incrementala) sa dea aceleasi sume ca repartizarea completa.
+BAN = Decimal("0.01")
+UNU = Decimal("1.00")     # coeficientul partii trimise unui singur centru
+
+
+def imparte_suma(total, ponderi):
+    """
+    `total` (Decimal rotunjit la bani) impartit proportional cu `ponderi`
+    (intregi, ex. Pondere x 10000), tot in bani, astfel incat partile sa dea
+    exact totalul: fiecare parte primeste partea ei intreaga, iar banii
+    ramasi merg, cate unul, la partile cu cele mai mari resturi (la
+    egalitate, primele din lista). Calculul e in intregi, deci exact.
+    """
+    if len(ponderi) == 1:
+        return [total]
+    bani = int(total * 100)
+    suma_ponderi = sum(ponderi)
+    parti, resturi = [], []
+    for p in ponderi:
+        q, r = divmod(bani * p, suma_ponderi)
+        parti.append(q)
+        resturi.append(r)
+    for i in sorted(range(len(parti)), key=lambda i: -resturi[i])[:bani - sum(parti)]:
+        parti[i] += 1
+    return [Decimal(p).scaleb(-2) for p in parti]
+
+
+def parseaza_centre_tinta(text):
+    """'CR002:60, CR003:40' (sau 'CR002, CR003' = ponderi egale) -> [(centru, pondere)]; '' -> []."""
+    tinte = {}
+    for parte in re.split(r"[,\s]+", (text or "").strip()):
+        if not parte:
+            continue
+        centru, _, pondere = parte.partition(":")
+        try:
+            pondere = Decimal(pondere.replace(",", ".")) if pondere else Decimal(1)
+        except ArithmeticError:
+            raise ValueError(f"Pondere invalidă pentru centrul {centru}: „{pondere}”.")
+        if not centru or not pondere > 0:
+            raise ValueError(f"Centru țintă invalid: „{parte}” (Centru:pondere, pondere > 0).")
+        if centru in tinte:
+            raise ValueError(f"Centrul {centru} apare de două ori.")
+        tinte[centru] = pondere
+    return list(tinte.items())
+
+
+def text_centre_tinta(tinte):
+    return ", ".join(f"{c}:{p.normalize():f}" for c, p in tinte)
+
+
+def citeste_centre_tinta():
+    """{ID_Regula: [(centru, pondere)]} din ReguliCentreTinta, in ordinea centrelor."""
+    tinte = {}
+    for id_reg, centru, pondere in exec_query(
+            "SELECT ID_Regula, ID_CentruResponsabil, Pondere FROM ReguliCentreTinta "
+            "ORDER BY ID_Regula, ID_CentruResponsabil", fetch=True) or []:
+        tinte.setdefault(id_reg.strip(), []).append((centru.strip(), Decimal(str(pondere))))
+    return tinte
+
+
+def seteaza_centre_tinta(id_reg, tinte):
+    """
+    Inlocuieste centrele tinta ale regulii si ii actualizeaza Data_Modificare,
+    ca repartizarea incrementala sa o reaplice.
+    """
+    with tranzactie():
+        exec_query("DELETE FROM ReguliCentreTinta WHERE ID_Regula = ?", (id_reg,))
+        if tinte:
+            exec_many(
+                "INSERT INTO ReguliCentreTinta (ID_Regula, ID_CentruResponsabil, Pondere) VALUES (?,?,?)",
+                [(id_reg, centru, pondere) for centru, pondere in tinte]
+            )
+        exec_query(
+            "UPDATE ReguliRepartizare SET Data_Modificare = SYSDATETIME() WHERE ID_Regula = ?",
+            (id_reg,)
+        )
+    CACHE_REF.invalideaza("reguli")
+
+
+def completeaza_repartizari():
+    """
+    Suma si data pentru repartizarile scrise inainte de migrarea 11
+    (Suma_Repartizata NULL): partea tranzactiei dupa procent si coeficient.
+    Intoarce cate repartizari s-au completat.
+    """
+    with tranzactie():
+        rows = exec_query(
+            "SELECT COUNT(*) FROM Repartizari WHERE Suma_Repartizata IS NULL", fetch=True
+        ) or [(0,)]
+        exec_query(
+            """
+            UPDATE Repartizari SET
+                Data_Operatiune = (SELECT T.Data_Operatiune FROM Tranzactii T
+                                   WHERE T.ID_Transactie = Repartizari.ID_Transactie),
+                Suma_Repartizata = ROUND(
+                    (SELECT T.Suma FROM Tranzactii T
+                     WHERE T.ID_Transactie = Repartizari.ID_Transactie)
+                    * Procent_Repartizare * ISNULL(Coeficient, 1) / 100.0, 2)
+            WHERE Suma_Repartizata IS NULL
+            """
+        )
+        creste_versiuni("Repartizari", [(0, 0)])
+    return int(rows[0][0])
+
+
+def _plan_regula(reg, tinte):
+    """
+    Ce face o regula cu o tranzactie potrivita, calculat o singura data:
+    (ID_Regula, procent, procent / 100, centre tinta [(centru, pondere, coeficient)]
+    sau None pentru centrul tranzactiei, ponderile ca intregi pentru imparte_suma).
+    """
+    id_reg, procent = reg[0], reg[4]
+    tinte_reg = tinte.get(id_reg.strip())
+    ponderi = [int(t[1].scaleb(4)) for t in tinte_reg] if tinte_reg else None
+    return id_reg, procent, Decimal(str(procent)) / 100, tinte_reg, ponderi
+
+
+def _repartizari_tranzactie(tr, planuri, rezultat):
+    """Adauga la `rezultat` randurile Repartizari (fara ID) ale unei tranzactii, pentru planurile regulilor potrivite."""
+    id_tr, _, centru_tr, suma, data_op, _ = tr
+    suma = suma if isinstance(suma, Decimal) else Decimal(str(suma))
+    centru_tr = centru_tr or CENTRU_IMPLICIT
+    for id_reg, procent, cota, tinte_reg, ponderi in planuri:
+        parte = (suma * cota).quantize(BAN, ROUND_HALF_UP)
+        if tinte_reg is None:
+            rezultat.append((id_tr, centru_tr, procent, UNU, id_reg, parte, data_op))
+        else:
+            for (centru, _pondere, coeficient), s in zip(tinte_reg, imparte_suma(parte, ponderi)):
+                rezultat.append((id_tr, centru, procent, coeficient, id_reg, s, data_op))
+
+
+def _tinte_motor(tinte):
+    """Centrele tinta cu coeficientul (ponderea relativa, la 2 zecimale) al fiecaruia."""
+    rezultat = {}
+    for id_reg, lista in (tinte or {}).items():
+        total = sum(p for _, p in lista)
+        rezultat[id_reg] = tuple((c, p, (p / total).quantize(BAN, ROUND_HALF_UP)) for c, p in lista)
+    return rezultat
+
+
+def indexeaza_reguli(reguli, tinte=None):
+    """Motorul compilat pentru o lista de reguli (ID, descriere, tip, valoare, procent)."""
+    return MotorReguli(reguli, tinte)
+
+
+def calculeaza_repartizari(tranzactii, reguli, index=None, tinte=None):
+    """
+    Repartizarile (ID_Transactie, centru, procent, coeficient, ID_Regula,
+    suma repartizata, Data_Operatiune) pentru o lista de tranzactii cu
+    coloanele COLOANE_REPARTIZARE.
+    """
+    if index is None:
+        index = indexeaza_reguli(reguli, tinte)
+    planuri = index.planuri
+    rezultat = []
+    for tr in tranzactii:
+        pozitii = index.pozitii(tr)
+        if pozitii:
+            _repartizari_tranzactie(tr, [planuri[poz] for poz in pozitii], rezultat)
+    return rezultat
+
+
+def repartizare_clasica(tranzactii, reguli, tinte=None):
+    """
+    Algoritmul initial (tranzactii x reguli), pastrat ca referinta pentru
+    verificarea si masurarea motorului indexat.
+    """
+    tinte = _tinte_motor(tinte)
+    criterii = []
+    for reg in reguli:
+        try:
+            criterii.append((_plan_regula(reg, tinte), parseaza_criteriu(reg[2], reg[3])))
+        except ValueError:
+            pass
+    rezultat = []
+    for tr in tranzactii:
+        potrivite = [plan for plan, conditii in criterii
+                     if all(conditie_indeplinita(c, tr) for c in conditii)]
+        _repartizari_tranzactie(tr, potrivite, rezultat)
+    return rezultat
+
+
+def citeste_reguli():
+    return [r[:5] for r in CACHE_REF.reguli()]
+
+
+def _tranzactii_pe_loturi(conditie="1=1", params=(), lot=REPARTIZARE_LOT,
+                          coloane=COLOANE_REPARTIZARE, dupa_id=""):
+    """
+    Parcurge Tranzactii pe loturi (keyset dupa ID, incepand dupa `dupa_id`),
+    filtrate cu `conditie`. Fiecare lot e o interogare scurta, deci se poate
+    scrie pe aceeasi conexiune intre loturi. Prima coloana trebuie sa fie
+    ID_Transactie.
+    """
+    ultim_id = dupa_id
+    while True:
+        tranzactii = exec_query(
+            f"""
+            SELECT TOP (?) {coloane}
+            FROM Tranzactii
+            WHERE ID_Transactie > ? AND ({conditie})
+            ORDER BY ID_Transactie
+            """,
+            (lot, ultim_id) + tuple(params),
+            fetch=True
+        ) or []
+        if not tranzactii:
+            return
+        ultim_id = tranzactii[-1][0]
+        yield tranzactii
+
+
+def _scrie_repartizari(tranzactii, reguli, index, verifica_existente=True):
+    """Calculeaza si insereaza repartizarile unui lot; intoarce cate s-au scris."""
+    noi = calculeaza_repartizari(tranzactii, reguli, index)
+    if verifica_existente and noi:
+        existente = {
+            (r[0], r[1]) for r in exec_query(
+                """
+                SELECT ID_Transactie, ID_Regula FROM Repartizari
+                WHERE ID_Transactie BETWEEN ? AND ? AND ID_Regula IS NOT NULL
+                """,
+                (tranzactii[0][0], tranzactii[-1][0]),
+                fetch=True
+            ) or []
+        }
+        noi = [r for r in noi if (r[0], r[4]) not in existente]
+    if not noi:
+        return 0
+
+    ids = ID_GEN.block("RP", len(noi))
+    exec_many(INSERT_REPARTIZARE, [(id_rep,) + r for id_rep, r in zip(ids, noi)])
+    return len(noi)
+
+
+def _marcaje_curente():
+    """Cea mai noua tranzactie si cea mai noua modificare de regula, chiar acum."""
+    rows = exec_query(
+        """
+        SELECT (SELECT MAX(Data_Inregistrare) FROM Tranzactii),
+               (SELECT MAX(Data_Modificare) FROM ReguliRepartizare)
+        """,
+        fetch=True
+    ) or []
+    if not rows:
+        return None, None
+    return tuple(
+        datetime.fromisoformat(v) if isinstance(v, str) else v for v in rows[0]
+    )
+
+
+def _salveaza_marcaje(marcaj_tr, marcaj_reg):
+    if marcaj_tr is not None:
+        scrie_parametru(PARAM_MARCAJ_TRANZACTII, marcaj_tr.isoformat(sep=" "))
+    if marcaj_reg is not None:
+        scrie_parametru(PARAM_MARCAJ_REGULI, marcaj_reg.isoformat(sep=" "))
+
+
+def repartizeaza_tranzactii(lot=REPARTIZARE_LOT, progres=None):
+    """
+    Ruleaza repartizarea pentru toate tranzactiile, intr-o singura tranzactie SQL.
+
+    Tranzactiile se citesc pe loturi (dupa ID), perechile (tranzactie, regula)
+    deja repartizate se sar, iar restul se scriu cu exec_many.
+    `progres(procent, mesaj)` e apelat dupa fiecare lot; daca arunca o
+    exceptie (ex. anulare), tranzactia SQL se anuleaza.
+    Intoarce numarul de repartizari noi.
+    """
+    cnt = 0
+    procesate = 0
+    with tranzactie():
+        marcaj_tr, marcaj_reg = _marcaje_curente()
+        reguli = citeste_reguli()
+        index = indexeaza_reguli(reguli, citeste_centre_tinta())
+        if reguli:
+            for tranzactii in _tranzactii_pe_loturi(lot=lot):
+                cnt += _scrie_repartizari(tranzactii, reguli, index)
+                procesate += len(tranzactii)
+                if progres:
+                    progres(-1, f"Repartizare: {procesate} tranzacții, {cnt} înregistrări noi")
+        _salveaza_marcaje(marcaj_tr, marcaj_reg)
+        creste_versiuni("Repartizari", [(0, 0)])
+    return cnt
+
+
+def repartizeaza_incremental(lot=REPARTIZARE_LOT, progres=None):
+    """
+    Repartizare doar pentru ce s-a schimbat de la rularea precedenta:
+     - regulile adaugate/modificate (Data_Modificare dupa marcaj) isi sterg
+       repartizarile vechi si se reaplica doar pe tranzactiile pe care le vizeaza;
+     - repartizarile regulilor sterse se elimina;
+     - tranzactiile inregistrate dupa marcaj (minus MARCAJ_SUPRAPUNERE)
+       primesc regulile pe care nu le au deja.
+    Fara marcaj salvat (prima rulare) se face repartizarea completa.
+    Intoarce numarul de repartizari noi.
+    """
+    marcaj_tr = citeste_parametru(PARAM_MARCAJ_TRANZACTII)
+    marcaj_reg = citeste_parametru(PARAM_MARCAJ_REGULI)
+    if marcaj_tr is None:
+        return repartizeaza_tranzactii(lot, progres)
+
+    limita_reg = datetime.fromisoformat(marcaj_reg) if marcaj_reg else None
+
+    cnt = 0
+    with tranzactie():
+        nou_tr, nou_reg = _marcaje_curente()
+
+        reguli = CACHE_REF.reguli()
+        # regulile modificate dupa citirea marcajului raman pentru rularea urmatoare
+        modificate = [
+            tuple(r[:5]) for r in reguli
+            if (limita_reg is None or r[5] > limita_reg) and r[5] <= nou_reg
+        ]
+        reguli = [tuple(r[:5]) for r in reguli]
+        tinte = citeste_centre_tinta()
+        index = indexeaza_reguli(reguli, tinte)
+
+        exec_query(
+            """
+            DELETE FROM Repartizari
+            WHERE ID_Regula IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM ReguliRepartizare R
+                              WHERE R.ID_Regula = Repartizari.ID_Regula)
+            """
+        )
+
+        for reg in modificate:
+            id_reg, _, tip_c, val_c, _ = reg
+            exec_query("DELETE FROM Repartizari WHERE ID_Regula = ?", (id_reg,))
+            if id_reg in index.invalide:
+                continue
+            conditie, params = conditie_sql_criteriu(parseaza_criteriu(tip_c, val_c))
+            index_regula = indexeaza_reguli([reg], tinte)
+            for tranzactii in _tranzactii_pe_loturi(conditie, params, lot):
+                cnt += _scrie_repartizari(tranzactii, [reg], index_regula,
+                                          verifica_existente=False)
+                if progres:
+                    progres(-1, f"Regula {id_reg.strip()}: {cnt} înregistrări noi")
+
+        if reguli and nou_tr is not None:
+            procesate = 0
+            for tranzactii in _tranzactii_pe_loturi(
+                    "Data_Inregistrare > ? AND Data_Inregistrare <= ?",
+                    (datetime.fromisoformat(marcaj_tr) - MARCAJ_SUPRAPUNERE, nou_tr), lot):
+                cnt += _scrie_repartizari(tranzactii, reguli, index)
+                procesate += len(tranzactii)
+                if progres:
+                    progres(-1, f"Repartizare: {procesate} tranzacții noi, {cnt} înregistrări noi")
+
+        _salveaza_marcaje(nou_tr, nou_reg)
+        creste_versiuni("Repartizari", [(0, 0)])
+    return cnt
+
+
+# ===== REPARTIZARE PARALELA =========================================
+# Repartizarea completa impartita pe intervale de ID_Transactie (partitii),
+# rulate intr-un pool de procese, fiecare cu conexiunile lui. Starea fiecarei
+# partitii se tine in PartitiiRepartizare: o rulare intrerupta se reia doar
+# cu partitiile neterminate. Fiecare lot se scrie in tranzactia lui si sare
+# perechile (tranzactie, regula) deja scrise, deci reluarea unei partitii
+# facute pe jumatate nu dubleaza nimic.
+PARTITII_PE_PROCES = 4    # mai multe partitii decat procese: se echilibreaza singure
+PARAM_MARCAJE_RULARE = "repartizare.paralel.marcaje"
+
+_MOTOR_PROCES = None      # (ID_Rulare, reguli, motor), refolosit de partitiile unui proces
+
+
+def partitii_tranzactii(n):
+    """
+    Cel mult `n` intervale (dupa_id, pana_la_id] care acopera Tranzactii, cu
+    cate tranzactii in fiecare. Limitele sunt ultimul ID din fiecare grup
+    NTILE(n) dupa ID_Transactie (o parcurgere a cheii primare), deci nu
+    depind de forma ID-urilor: cele vechi (13 cifre, fara prefix) se
+    impart la fel ca cele date de ID_GEN.
+    """
+    rows = exec_query(
+        """
+        SELECT MAX(ID_Transactie)
+        FROM (SELECT ID_Transactie, NTILE(?) OVER (ORDER BY ID_Transactie) AS Grup
+              FROM Tranzactii) T
+        GROUP BY Grup
+        ORDER BY Grup
+        """,
+        (max(n, 1),),
+        fetch=True
+    ) or []
+    limite = [""] + [r[0].strip() for r in rows]
+    return list(zip(limite, limite[1:]))
+
+
+def _rulare_neterminata():
+    rows = exec_query(
+        "SELECT TOP (1) ID_Rulare FROM PartitiiRepartizare WHERE Stare <> 'Gata' ORDER BY ID_Rulare",
+        fetch=True
+    ) or []
+    return rows[0][0].strip() if rows else None
+
+
+def _porneste_rulare(n_partitii):
+    """O rulare noua: partitiile (in Asteptare) si marcajele de la pornire."""
+    id_rulare = datetime.now().strftime("%Y%m%d%H%M%S")
+    with tranzactie():
+        marcaj_tr, marcaj_reg = _marcaje_curente()
+        exec_query("DELETE FROM PartitiiRepartizare")
+        exec_many(
+            "INSERT INTO PartitiiRepartizare (ID_Rulare, Nr_Partitie, ID_De_La, ID_Pana_La, Stare) "
+            "VALUES (?,?,?,?,'Asteptare')",
+            [(id_rulare, nr, lo, hi) for nr, (lo, hi) in enumerate(partitii_tranzactii(n_partitii), 1)]
+        )
+        scrie_parametru(PARAM_MARCAJE_RULARE, json.dumps([
+            m.isoformat(sep=" ") if m is not None else None for m in (marcaj_tr, marcaj_reg)
+        ]))
+    return id_rulare
+
+
+def _initializeaza_proces(url):
+    seteaza_backend(backend_din_url(url))
+
+
+def _motor_proces(id_rulare):
+    global _MOTOR_PROCES
+    if _MOTOR_PROCES is None or _MOTOR_PROCES[0] != id_rulare:
+        reguli = citeste_reguli()
+        _MOTOR_PROCES = (id_rulare, reguli, indexeaza_reguli(reguli, citeste_centre_tinta()))
+    return _MOTOR_PROCES[1:]
+
+
+def repartizeaza_partitie(id_rulare, nr, dupa_id, pana_la_id, lot=REPARTIZARE_LOT):
+    """
+    Lucrul unui proces: repartizeaza tranzactiile (dupa_id, pana_la_id] si
+    marcheaza partitia. Intoarce (nr, tranzactii procesate, repartizari noi).
+    """
+    cheie = (id_rulare, nr)
+    exec_query(
+        "UPDATE PartitiiRepartizare SET Stare = 'Lucru', Data_Start = SYSDATETIME() "
+        "WHERE ID_Rulare = ? AND Nr_Partitie = ?", cheie
+    )
+    reguli, index = _motor_proces(id_rulare)
+    procesate = cnt = 0
+    if reguli:
+        for tranzactii in _tranzactii_pe_loturi("ID_Transactie <= ?", (pana_la_id,), lot, dupa_id=dupa_id):
+            with tranzactie():
+                cnt += _scrie_repartizari(tranzactii, reguli, index)
+            procesate += len(tranzactii)
+    exec_query(
+        "UPDATE PartitiiRepartizare SET Stare = 'Gata', Tranzactii = ?, Repartizari = ?, "
+        "Data_Sfarsit = SYSDATETIME(), Eroare = NULL WHERE ID_Rulare = ? AND Nr_Partitie = ?",
+        (procesate, cnt) + cheie
+    )
+    return nr, procesate, cnt
+
+
+def repartizeaza_paralel(procese=None, partitii=None, lot=REPARTIZARE_LOT, progres=None):
+    """
+    Repartizarea completa in `procese` procese (implicit cate nuclee are
+    masina), pe `partitii` intervale de ID (implicit PARTITII_PE_PROCES pe
+    proces). Daca exista o rulare neterminata, se reiau doar partitiile ei
+    care nu sunt Gata. La sfarsit se salveaza marcajele de la pornirea
+    rularii, ca repartizarea incrementala sa continue de acolo.
+    Intoarce numarul de repartizari noi.
+    """
+    procese = max(1, procese or os.cpu_count() or 1)
+    id_rulare = _rulare_neterminata() or _porneste_rulare(partitii or procese * PARTITII_PE_PROCES)
+    ramase = exec_query(
+        "SELECT Nr_Partitie, ID_De_La, ID_Pana_La FROM PartitiiRepartizare "
+        "WHERE ID_Rulare = ? AND Stare <> 'Gata' ORDER BY Nr_Partitie",
+        (id_rulare,), fetch=True
+    ) or []
+
+    cnt = procesate = 0
+    esuate = []
+    with ProcessPoolExecutor(
+            max_workers=min(procese, max(len(ramase), 1)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initializeaza_proces, initargs=(BACKEND.url,)) as pool:
+        viitoare = {
+            pool.submit(repartizeaza_partitie, id_rulare, nr, (lo or "").strip(), hi.strip(), lot): nr
+            for nr, lo, hi in ramase
+        }
+        for gata, viitor in enumerate(as_completed(viitoare), 1):
+            nr = viitoare[viitor]
+            try:
+                _, n_tr, n_rep = viitor.result()
+            except Exception as e:
+                esuate.append(nr)
+                exec_query(
+                    "UPDATE PartitiiRepartizare SET Stare = 'Eroare', Eroare = ? "
+                    "WHERE ID_Rulare = ? AND Nr_Partitie = ?",
+                    (str(e)[:400], id_rulare, nr)
+                )
+                continue
+            procesate += n_tr
+            cnt += n_rep
+            if progres:
+                progres(int(gata * 100 / len(ramase)),
+                        f"Partiția {nr}: {gata}/{len(ramase)} gata, {procesate} tranzacții, "
+                        f"{cnt} înregistrări noi")
+
+    # si partitiile esuate au putut scrie loturi
+    creste_versiuni("Repartizari", [(0, 0)])
+    if esuate:
+        raise RuntimeError(
+            f"Repartizarea paralelă {id_rulare}: {len(esuate)} partiții eșuate "
+            f"({', '.join(map(str, sorted(esuate)))}); rulați din nou pentru reluare."
+        )
+    marcaje = json.loads(citeste_parametru(PARAM_MARCAJE_RULARE) or "[null, null]")
+    _salveaza_marcaje(*(datetime.fromisoformat(m) if m else None for m in marcaje))
+    return cnt
+
+
+# ===== SIMULARE REPARTIZARE (WHAT-IF) ===============================
+# Reguli candidate evaluate in memorie, fara nicio scriere in baza: tranzactiile
+# perioadei se incarca o data in coloane NumPy (suma, cod tip, cod centru, zi)
+# plus descrierile, apoi fiecare set de reguli se aplica vectorial. Regulile de
+# egalitate devin tabele de cautare indexate cu codul tranzactiei, deci
+# procentul lor se obtine dintr-o singura indexare, oricate reguli ar fi;
+# celelalte criterii (intervale, descriere, compuse) devin masti booleene.
+SIMULARE_LOT = 50_000
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Simularea necesită pachetul numpy (pip install numpy).")
+    return numpy
+
+
+def repartizare_actuala(inceput, sfarsit):
+    """{centru: (suma repartizata, numar repartizari)} din Repartizari, pentru tranzactiile din interval."""
+    rows = exec_query(
+        """
+        SELECT ID_CentruResponsabil, SUM(Suma_Repartizata), COUNT(*)
+        FROM Repartizari
+        WHERE Data_Operatiune >= ? AND Data_Operatiune < ?
+        GROUP BY ID_CentruResponsabil
+        """,
+        (inceput, sfarsit),
+        fetch=True
+    ) or []
+    return {r[0].strip(): (float(r[1] or 0), int(r[2])) for r in rows}
+
+
+class DateSimulare:
+    """
+    Tranzactiile unei perioade, pe coloane: `sume` (float64), `tipuri` si
+    `centre` (coduri in `coduri_tip` / `coduri_centru`, 0 = fara centru),
+    `zile` (date.toordinal), `texte` (descrierile, ca text_criteriu) si
+    `destinatii` (centrul care primeste repartizarea: al tranzactiei sau
+    CENTRU_IMPLICIT). `actual` e repartizarea existenta in baza pentru
+    aceleasi tranzactii.
+    """
+
+    def __init__(self, perioada, sume, tipuri, centre, zile, texte, coduri_tip, coduri_centru, actual):
+        np = _numpy()
+        self.perioada = perioada
+        self.sume = sume
+        self.tipuri = tipuri
+        self.centre = centre
+        self.zile = zile
+        self.texte = texte
+        self.coduri_tip = coduri_tip
+        self.coduri_centru = coduri_centru
+        self.actual = actual
+        cod_implicit = coduri_centru.setdefault(CENTRU_IMPLICIT, len(coduri_centru))
+        self.destinatii = np.where(centre == 0, cod_implicit, centre).astype(np.int32)
+        self.incarcat = time.monotonic()
+
+    def __len__(self):
+        return len(self.sume)
+
+    @classmethod
+    def incarca(cls, perioada, lot=SIMULARE_LOT, progres=None):
+        np = _numpy()
+        inceput, sfarsit = interval_perioada(perioada)
+        coduri_tip, coduri_centru = {}, {None: 0}
+        bucati, texte = [], []
+        citite = 0
+        for randuri in iter_query(
+                "SELECT Suma, Tip_Operatiune, ID_CentruResponsabil, Data_Operatiune, Descriere "
+                "FROM Tranzactii WHERE Data_Operatiune >= ? AND Data_Operatiune < ?",
+                (inceput, sfarsit), lot=lot):
+            n = len(randuri)
+            bucati.append((
+                np.fromiter((float(r[0]) for r in randuri), np.float64, n),
+                np.fromiter((coduri_tip.setdefault(r[1], len(coduri_tip)) for r in randuri), np.int16, n),
+                np.fromiter((coduri_centru.setdefault(r[2].strip() if r[2] else None, len(coduri_centru))
+                             for r in randuri), np.int32, n),
+                np.fromiter((_zi_ordinal(r[3]) for r in randuri), np.int32, n),
+            ))
+            texte.extend(text_criteriu(r[4]) for r in randuri)
+            citite += n
+            if progres:
+                progres(-1, f"Simulare: {citite} tranzacții încărcate")
+
+        tipuri_np = (np.float64, np.int16, np.int32, np.int32)
+        coloane = [np.concatenate([b[i] for b in bucati]) if bucati else np.zeros(0, t)
+                   for i, t in enumerate(tipuri_np)]
+        return cls(perioada, *coloane, texte, coduri_tip, coduri_centru,
+                   repartizare_actuala(inceput, sfarsit))
+
+
+def reguli_din_text(text):
+    """
+    Reguli candidate scrise ca 'Tip_Criteriu; Valoare; Procent[; Descriere[; Centre tinta]]',
+    cate una pe linie. Intoarce (reguli, centre tinta) ca citeste_reguli / citeste_centre_tinta.
+    """
+    reguli, tinte = [], {}
+    for nr, linie in enumerate(text.splitlines(), 1):
+        linie = linie.strip()
+        if not linie or linie.startswith("#"):
+            continue
+        campuri = [c.strip() for c in linie.split(";")]
+        if len(campuri) < 3:
+            raise ValueError(f"Linia {nr}: se așteaptă „Tip_Criteriu; Valoare; Procent”.")
+        try:
+            procent = Decimal(campuri[2].replace(",", "."))
+        except ArithmeticError:
+            raise ValueError(f"Linia {nr}: procent invalid „{campuri[2]}”.")
+        if not 0 <= procent <= 100:
+            raise ValueError(f"Linia {nr}: procentul trebuie să fie între 0 și 100.")
+        descriere = campuri[3] if len(campuri) > 3 else f"Candidat {nr}"
+        id_reg = f"SIM{nr:010d}"
+        if len(campuri) > 4 and campuri[4]:
+            try:
+                tinte[id_reg] = parseaza_centre_tinta(campuri[4])
+            except ValueError as e:
+                raise ValueError(f"Linia {nr}: {e}")
+        reguli.append((id_reg, descriere, campuri[0], campuri[1] or None, procent))
+    return reguli, tinte
+
+
+def _masca_conditie(date_sim, conditie, masti):
+    """Tranzactiile din `date_sim` care indeplinesc o conditie (vector bool), memorate in `masti`."""
+    masca = masti.get(conditie)
+    if masca is not None:
+        return masca
+    np = _numpy()
+    camp, val = conditie
+    if camp == "Tip_Operatiune":
+        cod = date_sim.coduri_tip.get(val)
+        masca = date_sim.tipuri == cod if cod is not None else np.zeros(len(date_sim), bool)
+    elif camp == "Centru":
+        cod = date_sim.coduri_centru.get(val)
+        masca = date_sim.centre == cod if cod else np.zeros(len(date_sim), bool)
+    elif camp == "Suma":
+        masca = (date_sim.sume >= float(val[0])) & (date_sim.sume <= float(val[1]))
+    elif camp == "Data":
+        masca = (date_sim.zile >= val[0]) & (date_sim.zile <= val[1])
+    elif camp == "Descriere":
+        masca = np.fromiter((val in t for t in date_sim.texte), bool, len(date_sim))
+    else:
+        masca = np.fromiter((val.search(t) is not None for t in date_sim.texte), bool, len(date_sim))
+    masti[conditie] = masca
+    return masca
+
+
+def simuleaza_repartizare(date_sim, reguli, tinte=None):
+    """
+    Aplica `reguli` (ID, descriere, tip criteriu, valoare, procent) pe
+    `date_sim`, cu aceeasi potrivire ca motorul de repartizare, si compara
+    cu repartizarea existenta. Regulile cu centre tinta (`tinte`, ca
+    citeste_centre_tinta) isi impart partea intre ele. Intoarce, pe centru,
+    [(centru, simulat, repartizari simulate, actual, repartizari actuale, diferenta)].
+    """
+    np = _numpy()
+    tinte = tinte or {}
+    redirectionate = []
+    procent_tip = np.zeros(max(len(date_sim.coduri_tip), 1))
+    numar_tip = np.zeros(len(procent_tip))
+    procent_centru = np.zeros(len(date_sim.coduri_centru))
+    numar_centru = np.zeros(len(procent_centru))
+    generale = []
+    # criteriile invalide nu se potrivesc cu nimic, ca in motorul de repartizare
+    for _id, _descriere, tip_c, val_c, procent in reguli:
+        try:
+            conditii = parseaza_criteriu(tip_c, val_c)
+        except ValueError:
+            continue
+        camp, val = conditii[0]
+        if tinte.get(_id.strip()):
+            redirectionate.append((conditii, float(procent), tinte[_id.strip()]))
+        elif len(conditii) > 1 or camp not in ("Tip_Operatiune", "Centru"):
+            generale.append((conditii, float(procent)))
+        elif camp == "Tip_Operatiune":
+            cod = date_sim.coduri_tip.get(val)
+            if cod is not None:
+                procent_tip[cod] += float(procent)
+                numar_tip[cod] += 1
+        else:
+            cod = date_sim.coduri_centru.get(val)
+            if cod:   # codul 0 = tranzactii fara centru, neatinse de regulile Centru
+                procent_centru[cod] += float(procent)
+                numar_centru[cod] += 1
+
+    procent = procent_tip[date_sim.tipuri] + procent_centru[date_sim.centre]
+    numar = numar_tip[date_sim.tipuri] + numar_centru[date_sim.centre]
+    # celelalte criterii: cate o masca pe conditie (refolosita intre reguli)
+    masti = {}
+
+    def masca_reguli(conditii):
+        masca = _masca_conditie(date_sim, conditii[0], masti)
+        for conditie in conditii[1:]:
+            masca = masca & _masca_conditie(date_sim, conditie, masti)
+        return masca
+
+    for conditii, p in generale:
+        masca = masca_reguli(conditii)
+        procent = procent + p * masca
+        numar = numar + masca
+    nr_centre = len(date_sim.coduri_centru)
+    simulat = np.bincount(date_sim.destinatii, weights=date_sim.sume * procent / 100, minlength=nr_centre)
+    repartizari = np.bincount(date_sim.destinatii, weights=numar, minlength=nr_centre)
+
+    # partea regulilor cu centre tinta nu depinde de centrul tranzactiei
+    catre_tinte = {}
+    for conditii, p, tinte_reg in redirectionate:
+        masca = masca_reguli(conditii)
+        parte = float(date_sim.sume[masca].sum()) * p / 100
+        n = int(masca.sum())
+        total = float(sum(pondere for _, pondere in tinte_reg))
+        for centru, pondere in tinte_reg:
+            s, k = catre_tinte.get(centru, (0.0, 0))
+            catre_tinte[centru] = (s + parte * float(pondere) / total, k + n)
+
+    rezultat = []
+    for centru in sorted(set(c for c in date_sim.coduri_centru if c) | set(date_sim.actual) | set(catre_tinte)):
+        cod = date_sim.coduri_centru.get(centru)
+        s, n = catre_tinte.get(centru, (0.0, 0))
+        if cod is not None:
+            s += float(simulat[cod])
+            n += int(repartizari[cod])
+        s = round(s, 2)
+        a, na = date_sim.actual.get(centru, (0.0, 0))
+        if s or n or a or na:
+            rezultat.append((centru, s, n, round(a, 2), na, round(s - a, 2) + 0.0))
+    return rezultat
+
+
+# ===== EXPORT CONTABIL ==============================================
+EXPORT_DIR = "exporturi"  # fisierele generate pentru sistemele contabile
+EXPORT_LOT = 5000
+
+INSERT_EXPORT = """
+    INSERT INTO Exporturi
+    (ID_Export, ID_Transactie, Sistem_Export, Data_Exportata, Suma_Exportata)
+    VALUES (?,?,?,?,?)
+"""
+
+COLOANE_EXPORT = (
+    "ID_Transactie, Data_Operatiune, Tip_Operatiune, Suma, ID_CentruResponsabil, Descriere"
+)
+
+
+def _data_iso(val):
+    return val.isoformat() if hasattr(val, "isoformat") else str(val)
+
+
+def _cale_libera(director, nume, extensie):
+    """Cale director/nume.extensie care nu exista inca (adauga _2, _3... la nevoie)."""
+    os.makedirs(director, exist_ok=True)
+    cale = os.path.join(director, f"{nume}.{extensie}")
+    n = 2
+    while os.path.exists(cale) or os.path.exists(cale + ".partial"):
+        cale = os.path.join(director, f"{nume}_{n}.{extensie}")
+        n += 1
+    return cale
+
+
+class ScriitorCsv:
+    """1C Contabilitate: CSV cu ';', UTF-8 cu BOM (se deschide corect in Excel)."""
+    extensie = "csv"
+
+    def __init__(self, cale, sistem):
+        self._f = open(cale, "w", encoding="utf-8-sig", newline="")
+        self._w = csv.writer(self._f, delimiter=";")
+        self._w.writerow(["ID", "Data", "Tip", "Suma", "Centru", "Descriere"])
+
+    def scrie(self, randuri):
+        self._w.writerows(
+            (id_tr, _data_iso(data), tip, f"{suma:.2f}", centru or "", desc or "")
+            for id_tr, data, tip, suma, centru, desc in randuri
+        )
+
+    def inchide(self):
+        self._f.close()
+
+
+class ScriitorXml:
+    """SAP Financials: XML scris element cu element."""
+    extensie = "xml"
+
+    def __init__(self, cale, sistem):
+        self._f = open(cale, "w", encoding="utf-8")
+        self._f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self._f.write(
+            f"<Export sistem={quoteattr(sistem)} "
+            f"generat={quoteattr(datetime.now().isoformat(timespec='seconds'))}>\n"
+        )
+
+    def scrie(self, randuri):
+        self._f.writelines(
+            f"  <Tranzactie id={quoteattr(id_tr.strip())} data={quoteattr(_data_iso(data))} "
+            f"tip={quoteattr(tip)} suma=\"{suma:.2f}\" centru={quoteattr((centru or '').strip())}>"
+            f"{escape(desc or '')}</Tranzactie>\n"
+            for id_tr, data, tip, suma, centru, desc in randuri
+        )
+
+    def inchide(self):
+        self._f.write("</Export>\n")
+        self._f.close()
+
+
+class ScriitorLatimeFixa:
+    """
+    M-EnergoSoft: o linie per tranzactie, campuri de latime fixa:
+    ID(13) DATA(8, AAAALLZZ) TIP(1, V/C) SUMA(15, cu 2 zecimale) CENTRU(10) DESCRIERE(100)
+    """
+    extensie = "txt"
+
+    def __init__(self, cale, sistem):
+        self._f = open(cale, "w", encoding="utf-8", newline="\r\n")
+
+    def scrie(self, randuri):
+        self._f.writelines(
+            f"{id_tr.strip():<13}{_data_iso(data).replace('-', ''):<8}{tip[:1]:<1}"
+            f"{suma:>15.2f}{(centru or '').strip():<10}{(desc or '')[:100]:<100}\n"
+            for id_tr, data, tip, suma, centru, desc in randuri
+        )
+
+    def inchide(self):
+        self._f.close()
+
+
+FORMATE_EXPORT = {
+    "1C Contabilitate": ("1C", ScriitorCsv),
+    "SAP Financials": ("SAP", ScriitorXml),
+    "M-EnergoSoft": ("MES", ScriitorLatimeFixa),
+}
+
+
+def exporta_tranzactii(sistem, doar_neexportate=True, lot=EXPORT_LOT, progres=None):
+    """
+    Scrie tranzactiile in fisierul sistemului contabil si le inregistreaza
+    in Exporturi, lot cu lot, intr-o singura tranzactie SQL.
+
+    Cu `doar_neexportate`, se citesc doar tranzactiile inregistrate dupa
+    ultimul export catre acelasi sistem (marcaj in ParametriSistem, minus
+    MARCAJ_SUPRAPUNERE), iar NOT EXISTS pe Exporturi elimina suprapunerile.
+    `progres(procent, mesaj)` e apelat dupa fiecare lot (poate anula exportul).
+    Intoarce (numar tranzactii, cale fisier) sau (0, None) daca nu e nimic de exportat.
+    """
+    cod, scriitor_cls = FORMATE_EXPORT[sistem]
+    cheie_marcaj = f"export.marcaj.{cod}"
+
+    cale = _cale_libera(EXPORT_DIR, f"{cod}_{datetime.now():%Y%m%d_%H%M%S}", scriitor_cls.extensie)
+    temporar = cale + ".partial"
+
+    conditie, params = "1=1", ()
+    if doar_neexportate:
+        conditie = """NOT EXISTS (SELECT 1 FROM Exporturi E
+                                 WHERE E.ID_Transactie = Tranzactii.ID_Transactie
+                                   AND E.Sistem_Export = ?)"""
+        params = (sistem,)
+        marcaj = citeste_parametru(cheie_marcaj)
+        if marcaj:
+            conditie += " AND Data_Inregistrare >= ?"
+            params += (datetime.fromisoformat(marcaj) - MARCAJ_SUPRAPUNERE,)
+
+    azi = datetime.now().date()
+    cnt = 0
+    scriitor = scriitor_cls(temporar, sistem)
+    inchis = False
+    try:
+        with tranzactie():
+            marcaj_nou, _ = _marcaje_curente()
+            for randuri in _tranzactii_pe_loturi(conditie, params, lot, COLOANE_EXPORT):
+                scriitor.scrie(randuri)
+                ids = ID_GEN.block("EX", len(randuri))
+                exec_many(
+                    INSERT_EXPORT,
+                    [(id_ex, r[0], sistem, azi, r[3]) for id_ex, r in zip(ids, randuri)]
+                )
+                cnt += len(randuri)
+                if progres:
+                    progres(-1, f"Export {sistem}: {cnt} tranzacții")
+            if marcaj_nou is not None:
+                scrie_parametru(cheie_marcaj, marcaj_nou.isoformat(sep=" "))
+            scriitor.inchide()
+            inchis = True
+            # fisierul primeste numele final doar daca si commit-ul reuseste
+    except Exception:
+        if not inchis:
+            scriitor.inchide()
+        os.remove(temporar)
+        raise
+
+    if not cnt:
+        os.remove(temporar)
+        return 0, None
+    os.replace(temporar, cale)
+    return cnt, cale
+
+
+# ===== IMPORT TRANZACTII ============================================
+# Extrase CSV/XLSX citite in flux, validate rand cu rand; randurile bune se
+# scriu prin insereaza_tranzactii (o tranzactie SQL pe lot), cele gresite
+# ajung intr-un fisier de respingeri cu numarul liniei si eroarea.
+IMPORT_LOT = 5000
+
+# numele acceptate in antet (fara diacritice, litere mici) -> camp
+COLOANE_IMPORT = {
+    "tip": "tip", "tip_operatiune": "tip", "tip operatiune": "tip",
+    "suma": "suma", "amount": "suma",
+    "data": "data", "data_operatiune": "data", "data operatiune": "data", "date": "data",
+    "descriere": "descriere", "description": "descriere", "detalii": "descriere",
+    "centru": "centru", "id_centruresponsabil": "centru", "id centru": "centru",
+}
+TIPURI_OPERATIUNE = {"venit": "Venit", "cheltuiala": "Cheltuiala", "cheltuială": "Cheltuiala"}
+FORMATE_DATA_IMPORT = ("%d.%m.%Y", "%d/%m/%Y", "%Y/%m/%d")
+SUMA_MAXIMA = Decimal("9999999999999.99")   # DECIMAL(15,2)
+
+
+def _fara_diacritice(text):
+    return text.translate(str.maketrans("ăâîșşțţĂÂÎȘŞȚŢ", "aaissttAAISSTT"))
+
+
+def _randuri_csv(cale):
+    with open(cale, encoding="utf-8-sig", newline="") as f:
+        inceput = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(inceput, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _randuri_xlsx(cale):
+    try:
+        import openpyxl
+    except ImportError:
+        raise RuntimeError("Importul din XLSX necesită pachetul openpyxl (pip install openpyxl).")
+    wb = openpyxl.load_workbook(cale, read_only=True, data_only=True)
+    try:
+        for rand in wb.worksheets[0].iter_rows(values_only=True):
+            yield list(rand)
+    finally:
+        wb.close()
+
+
+def _citeste_suma(valoare):
+    if isinstance(valoare, (int, float, Decimal)):
+        suma = Decimal(str(valoare))
+    else:
+        text = str(valoare or "").strip().replace(" ", "").replace("\u00a0", "")
+        if "," in text and "." in text:      # 1.234,56 sau 1,234.56
+            text = text.replace(".", "").replace(",", ".") if text.rfind(",") > text.rfind(".") \
+                else text.replace(",", "")
+        else:
+            text = text.replace(",", ".")
+        suma = Decimal(text)
+    if not suma.is_finite() or suma <= 0 or suma > SUMA_MAXIMA:
+        raise ValueError("suma trebuie să fie > 0 și să încapă în DECIMAL(15,2)")
+    # o suma din extras nu se rotunjeste pe tacute ("1,234" nu devine 1.23)
+    rotunjita = suma.quantize(Decimal("0.01"))
+    if rotunjita != suma:
+        raise ValueError(f"suma are mai mult de două zecimale: {valoare!r}")
+    return rotunjita
+
+
+def _citeste_data(valoare):
+    if isinstance(valoare, datetime):
+        return valoare.date()
+    if isinstance(valoare, date):
+        return valoare
+    text = str(valoare or "").strip()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    for fmt in FORMATE_DATA_IMPORT:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"dată nerecunoscută: {text!r}")
+
+
+def valideaza_rand_import(valori, centre):
+    """(tip, suma, data, descriere, centru) pentru insereaza_tranzactii, sau ValueError."""
+    tip = TIPURI_OPERATIUNE.get(str(valori.get("tip") or "").strip().lower())
+    if tip is None:
+        raise ValueError(f"tip necunoscut: {valori.get('tip')!r} (Venit/Cheltuiala)")
+    try:
+        suma = _citeste_suma(valori.get("suma"))
+    except ArithmeticError:
+        raise ValueError(f"sumă invalidă: {valori.get('suma')!r}")
+    data_op = _citeste_data(valori.get("data"))
+    descriere = str(valori.get("descriere") or "").strip() or None
+    if descriere and len(descriere) > 100:
+        raise ValueError("descrierea depășește 100 de caractere")
+    centru = str(valori.get("centru") or "").strip() or None
+    if centru is not None and centru not in centre:
+        raise ValueError(f"centru inexistent: {centru}")
+    return tip, suma, data_op, descriere, centru
+
+
+def importa_tranzactii(cale, lot=IMPORT_LOT, progres=None):
+    """
+    Importa tranzactiile dintr-un fisier .csv sau .xlsx cu antet (vezi
+    COLOANE_IMPORT). Fiecare lot valid e confirmat separat, deci un import
+    anulat sau intrerupt pastreaza loturile deja scrise.
+    Intoarce (importate, respinse, cale fisier respingeri sau None).
+    """
+    randuri = _randuri_xlsx(cale) if cale.lower().endswith(".xlsx") else _randuri_csv(cale)
+    antet = next(randuri, None)
+    if not antet:
+        raise ValueError("Fișierul este gol.")
+    campuri = [COLOANE_IMPORT.get(_fara_diacritice(str(c or "")).strip().lower()) for c in antet]
+    lipsa = {"tip", "suma", "data"} - set(campuri)
+    if lipsa:
+        raise ValueError(f"Lipsesc coloanele: {', '.join(sorted(lipsa))}")
+
+    centre = set(CACHE_REF.tabel("centre"))
+    director, nume = os.path.split(os.path.abspath(cale))
+    cale_respinse = _cale_libera(director, os.path.splitext(nume)[0] + "_respinse", "csv")
+    f_respinse = None
+    importate = respinse = 0
+    bune = []
+
+    def scrie_lot():
+        nonlocal importate
+        insereaza_tranzactii(bune)
+        importate += len(bune)
+        bune.clear()
+        if progres:
+            progres(-1, f"Import: {importate} tranzacții, {respinse} respinse")
+
+    try:
+        for linie, rand in enumerate(randuri, start=2):
+            if not any(v not in (None, "") for v in rand):
+                continue
+            try:
+                bune.append(valideaza_rand_import(
+                    {c: v for c, v in zip(campuri, rand) if c}, centre
+                ))
+            except ValueError as e:
+                if f_respinse is None:
+                    f_respinse = open(cale_respinse, "w", encoding="utf-8-sig", newline="")
+                    w_respinse = csv.writer(f_respinse, delimiter=";")
+                    w_respinse.writerow(["Linie", "Eroare"] + [str(c or "") for c in antet])
+                w_respinse.writerow([linie, str(e)] + ["" if v is None else v for v in rand])
+                respinse += 1
+            if len(bune) >= lot:
+                scrie_lot()
+        if bune:
+            scrie_lot()
+    finally:
+        if f_respinse is not None:
+            f_respinse.close()
+    return importate, respinse, (cale_respinse if respinse else None)
+
+
+# ===== RAPOARTE =====================================================
+def _luna_plus(an, luna, n):
+    """Prima zi a lunii aflate la n luni dupa (an, luna)."""
+    index = an * 12 + (luna - 1) + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def interval_perioada(perioada):
+    """
+    Perioada unui raport ca interval semideschis [inceput, sfarsit):
+    "2025" -> anul, "2025-03" -> luna, "2025Q1" -> trimestrul; "" -> None (tot).
+    Comparatiile directe pe Data_Operatiune (fara YEAR/MONTH) pot folosi indexul.
+    """
+    p = perioada.strip().upper()
+    if not p:
+        return None
+    if len(p) == 4 and p.isdigit():
+        return date(int(p), 1, 1), date(int(p) + 1, 1, 1)
+    if len(p) == 7 and p[4] == "-" and p[:4].isdigit() and p[5:].isdigit() \
+            and 1 <= int(p[5:]) <= 12:
+        an, luna = int(p[:4]), int(p[5:])
+        return date(an, luna, 1), _luna_plus(an, luna, 1)
+    if len(p) == 6 and p[4] == "Q" and p[:4].isdigit() and p[5] in "1234":
+        an, luna = int(p[:4]), 3 * int(p[5]) - 2
+        return date(an, luna, 1), _luna_plus(an, luna, 3)
+    raise ValueError(f"Perioadă invalidă: {perioada!r} (folosiți AAAA, AAAA-LL sau AAAAQn)")
+
+
+def conditie_perioada(perioada, coloana="Data_Operatiune"):
+    """WHERE-ul (si parametrii) pentru o perioada; sir gol daca perioada lipseste."""
+    interval = interval_perioada(perioada)
+    if interval is None:
+        return "", ()
+    return f"WHERE {coloana} >= ? AND {coloana} < ?", interval
+
+
+def conditie_totaluri(perioada):
+    """Aceeasi perioada ca interval_perioada, exprimata pe (An, Luna) din TotaluriPerioada."""
+    interval = interval_perioada(perioada)
+    if interval is None:
+        return "", ()
+    inceput, sfarsit = interval
+    ultima = _luna_plus(sfarsit.year, sfarsit.month, -1)
+    return "WHERE An = ? AND Luna >= ? AND Luna <= ?", (inceput.year, inceput.month, ultima.month)
+
+
+# ----- surse de rapoarte ------------------------------------------------
+# Fiecare raport e un generator de loturi de randuri (tupluri), citite cu
+# iter_query: nici fisierele, nici previzualizarea nu tin tot raportul in
+# memorie. Randul de total, daca exista, vine la sfarsit, acumulat din flux.
+RAPORT_LOT = 5000
+RAPORT_PAGINA = 100   # randuri pe pagina in previzualizarea din tab
+
+
+def _cu_centru(cond, params, coloana, centru):
+    """Adauga filtrul pe centru la un WHERE (eventual gol) din conditie_*."""
+    if not centru:
+        return cond, params
+    return (f"{cond} AND {coloana} = ?" if cond else f"WHERE {coloana} = ?"), tuple(params) + (centru,)
+
+
+def _raport_venituri(perioada, centru=None, lot=RAPORT_LOT):
+    cond, params = _cu_centru(*conditie_totaluri(perioada), "Centru", centru)
+    yield from iter_query(
+        f"""
+        SELECT Tip_Operatiune, SUM(Total), SUM(Numar)
+        FROM TotaluriPerioada
+        {cond}
+        GROUP BY Tip_Operatiune
+        HAVING SUM(Numar) > 0
+        ORDER BY Tip_Operatiune
+        """,
+        params, lot
+    )
+
+
+def _raport_repartizate(perioada, centru=None, lot=RAPORT_LOT):
+    # suma e scrisa pe repartizare: o singura agregare pe IX_Repartizari_Data_Centru
+    cond, params = _cu_centru(*conditie_perioada(perioada), "ID_CentruResponsabil", centru)
+    total, numar = 0, 0
+    for randuri in iter_query(
+        f"""
+        SELECT ID_CentruResponsabil, SUM(Suma_Repartizata), COUNT(*)
+        FROM Repartizari
+        {cond}
+        GROUP BY ID_CentruResponsabil
+        ORDER BY ID_CentruResponsabil
+        """,
+        params, lot
+    ):
+        total += sum(r[1] or 0 for r in randuri)
+        numar += sum(r[2] for r in randuri)
+        yield randuri
+    if numar:
+        yield [("Total repartizat", total, numar)]
+
+
+def _raport_bugete(perioada, centru=None, lot=RAPORT_LOT):
+    # efectivul si statusul sunt tinute la zi pe buget; perioada alege anii bugetelor
+    interval = interval_perioada(perioada)
+    cond, params = "", ()
+    if interval is not None:
+        inceput, sfarsit = interval
+        cond, params = "WHERE B.An_Buget >= ? AND B.An_Buget <= ?", (
+            str(inceput.year), str(_luna_plus(sfarsit.year, sfarsit.month, -1).year)
+        )
+    cond, params = _cu_centru(cond, params, "B.ID_CentruResponsabil", centru)
+    yield from iter_query(
+        f"""
+        SELECT B.ID_CentruResponsabil, B.An_Buget, B.Suma_Alocata,
+               B.Suma_EfectivaCheltuita, B.Status_Executie
+        FROM Bugete B
+        {cond}
+        ORDER BY B.ID_CentruResponsabil, B.An_Buget
+        """,
+        params, lot
+    )
+
+
+# eticheta din interfata -> (cod in Rapoarte.Tip_Raport, antet, sursa, mesaj fara date)
+TIPURI_RAPORT = {
+    "Venituri/Cheltuieli pe perioadă": (
+        "VenituriCheltuieli", ["Tip operațiune", "Total (MDL)", "Tranzacții"], _raport_venituri,
+        "Nu există tranzacții pentru perioada selectată."
+    ),
+    "Bugete pe centre": (
+        "Bugete", ["Centru", "An", "Alocat (MDL)", "Efectiv (MDL)", "Status"], _raport_bugete,
+        "Nu există bugete introduse."
+    ),
+    "Sume repartizate pe centre": (
+        "Repartizari", ["Centru", "Repartizat (MDL)", "Repartizări"], _raport_repartizate,
+        "Nu există repartizări pentru perioada selectată."
+    ),
+}
+
+
+def tip_raport(tip):
+    """Definitia raportului dupa eticheta (sau un fragment unic din ea, ex. "Bugete")."""
+    if tip in TIPURI_RAPORT:
+        return TIPURI_RAPORT[tip]
+    gasite = [d for eticheta, d in TIPURI_RAPORT.items() if tip in eticheta or tip == d[0]]
+    if len(gasite) != 1:
+        raise ValueError(f"Tip de raport necunoscut: {tip!r}")
+    return gasite[0]
+
+
+# ----- cache de rezultate --------------------------------------------
+# Rezultatele se tin in memorie pe (tip, perioada, centru), cu versiunea
+# datelor din care au fost calculate (versiune_date pe domeniile raportului).
+# Versiunea se citeste inaintea datelor: o scriere intre cele doua lasa in
+# cache o versiune mai veche decat datele, deci cel mult un recalcul in plus.
+# Pentru perioadele inchise versiunea se reverifica cel mult o data la
+# CACHE_TTL secunde; intre verificari rezultatul se serveste fara interogare.
+RAPORT_CACHE_RANDURI = 200_000     # randuri tinute in total, in toate rezultatele
+RAPORT_CACHE_MAX_INTRARE = 20_000  # rezultatele mai mari se citesc mereu din flux
+
+# domeniile din VersiuniDate de care depinde fiecare raport (dupa cod)
+DOMENII_RAPORT = {
+    "VenituriCheltuieli": ("Tranzactii",),
+    "Bugete": ("Tranzactii", "Bugete"),
+    "Repartizari": ("Repartizari",),
+}
+# domeniile pentru care inchiderea perioadelor conteaza (repartizarile se
+# schimba si cand se schimba regulile, deci se verifica la fiecare cerere)
+DOMENII_INCHISE = {"Tranzactii", "Bugete"}
+
+
+class CacheRapoarte:
+    """
+    LRU (tip, perioada, centru) -> (versiune, randuri, verificat_la), limitat
+    la `max_randuri` randuri.
+    """
+
+    def __init__(self, max_randuri=RAPORT_CACHE_RANDURI, max_intrare=RAPORT_CACHE_MAX_INTRARE,
+                 ttl=CACHE_TTL):
+        self.max_randuri = max_randuri
+        self.max_intrare = max_intrare
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._intrari = OrderedDict()
+        self._randuri = 0
+        self._inchidere = (0.0, None)   # (expira_la, data_inchidere())
+
+    def data_inchidere(self):
+        # citita cel mult o data la `ttl` secunde: o valoare veche e doar mai
+        # prudenta (inchiderea doar avanseaza)
+        with self._lock:
+            expira, valoare = self._inchidere
+        if expira < time.monotonic():
+            valoare = data_inchidere()
+            with self._lock:
+                self._inchidere = (time.monotonic() + self.ttl, valoare)
+        return valoare
+
+    def get(self, cheie, versiune):
+        """Randurile tinute pentru `cheie`, daca au fost calculate pe `versiune`."""
+        with self._lock:
+            intrare = self._intrari.get(cheie)
+            if intrare is None or intrare[0] != versiune:
+                return None
+            self._intrari[cheie] = (versiune, intrare[1], time.monotonic())
+            self._intrari.move_to_end(cheie)
+            return intrare[1]
+
+    def recent(self, cheie):
+        """Randurile tinute pentru `cheie`, daca versiunea lor a fost verificata in ultimele `ttl` s."""
+        with self._lock:
+            intrare = self._intrari.get(cheie)
+            if intrare is None or intrare[2] + self.ttl < time.monotonic():
+                return None
+            self._intrari.move_to_end(cheie)
+            return intrare[1]
+
+    def pune(self, cheie, versiune, randuri):
+        if len(randuri) > self.max_intrare:
+            return
+        with self._lock:
+            vechi = self._intrari.pop(cheie, None)
+            if vechi is not None:
+                self._randuri -= len(vechi[1])
+            self._intrari[cheie] = (versiune, randuri, time.monotonic())
+            self._randuri += len(randuri)
+            while self._randuri > self.max_randuri:
+                _, (_, scos, _) = self._intrari.popitem(last=False)
+                self._randuri -= len(scos)
+
+    def invalideaza(self):
+        with self._lock:
+            self._intrari.clear()
+            self._randuri = 0
+            self._inchidere = (0.0, None)
+
+
+CACHE_RAPOARTE = CacheRapoarte()
+
+
+def _interval_raport(cod, perioada):
+    interval = interval_perioada(perioada)
+    if interval is not None and cod == "Bugete":
+        # bugetele sunt pe ani intregi
+        ultima = _luna_plus(interval[1].year, interval[1].month, -1)
+        interval = date(interval[0].year, 1, 1), date(ultima.year + 1, 1, 1)
+    return interval
+
+
+def perioada_inchisa(cod, perioada):
+    """Daca raportul depinde doar de domenii inchise pe toata perioada lui."""
+    interval = _interval_raport(cod, perioada)
+    if interval is None or not DOMENII_INCHISE.issuperset(DOMENII_RAPORT[cod]):
+        return False
+    inchidere = CACHE_RAPOARTE.data_inchidere()
+    return inchidere is not None and interval[1] <= inchidere
+
+
+def versiune_raport(cod, perioada):
+    """Versiunea datelor raportului pe perioada (suma contoarelor din VersiuniDate)."""
+    return versiune_date(DOMENII_RAPORT[cod], _interval_raport(cod, perioada))
+
+
+def loturi_raport(tip, perioada, centru=None, lot=RAPORT_LOT):
+    """Loturile de randuri ale raportului, din cache sau din baza (si puse in cache)."""
+    cod, _, sursa, _ = tip_raport(tip)
+    perioada = perioada.strip().upper()
+    cheie = (cod, perioada, centru or None)
+    randuri = CACHE_RAPOARTE.recent(cheie) if perioada_inchisa(cod, perioada) else None
+    if randuri is None:
+        versiune = versiune_raport(cod, perioada)
+        randuri = CACHE_RAPOARTE.get(cheie, versiune)
+    if randuri is not None:
+        for i in range(0, len(randuri), lot):
+            yield randuri[i:i + lot]
+        return
+
+    colectate = []
+    for randuri in sursa(perioada, centru, lot):
+        if colectate is not None:
+            colectate.extend(randuri)
+            if len(colectate) > CACHE_RAPOARTE.max_intrare:
+                colectate = None
+        yield randuri
+    if colectate is not None:
+        CACHE_RAPOARTE.pune(cheie, versiune, colectate)
+
+
+def randuri_raport(tip, perioada, centru=None, lot=RAPORT_LOT):
+    """Randurile raportului, unul cate unul (generator; inchideti-l daca nu-l epuizati)."""
+    for randuri in loturi_raport(tip, perioada, centru, lot):
+        yield from randuri
+
+
+def calculeaza_raport(tip, perioada, centru=None):
+    """Tot raportul ca lista de randuri (doar pentru rapoarte mici, ex. masuratori)."""
+    return list(randuri_raport(tip, perioada, centru))
+
+
+def pagina_raport(tip, perioada, centru=None, pagina=1, n=RAPORT_PAGINA):
+    """
+    Pagina `pagina` (de la 1) a raportului + daca mai exista una dupa ea.
+    Randurile dinainte se sar din flux, fara sa fie pastrate.
+    """
+    randuri = randuri_raport(tip, perioada, centru, lot=max(n + 1, 500))
+    try:
+        rezultat = list(islice(randuri, (pagina - 1) * n, pagina * n + 1))
+    finally:
+        randuri.close()
+    return rezultat[:n], len(rezultat) > n
+
+
+# ----- scriere in fisiere -----------------------------------------------
+# Ca la exportul contabil: un scriitor pe format, cu scrie(randuri) pe lot
+# si inchide(). XLSX si PDF folosesc pachete optionale (openpyxl, reportlab),
+# importate doar cand se cere formatul.
+RAPOARTE_DIR = "rapoarte"
+
+
+def _valoare_raport(val):
+    """Valoarea unei celule ca text: sume cu 2 zecimale, CHAR fara spatiile de umplere."""
+    if val is None:
+        return ""
+    if isinstance(val, (Decimal, float)):
+        return f"{val:.2f}"
+    if hasattr(val, "isoformat"):
+        return val.isoformat()
+    return str(val).strip()
+
+
+class ScriitorRaportCsv:
+    extensie = "csv"
+
+    def __init__(self, cale, titlu, antet):
+        self._f = open(cale, "w", encoding="utf-8-sig", newline="")
+        self._w = csv.writer(self._f, delimiter=";")
+        self._w.writerow(antet)
+
+    def scrie(self, randuri):
+        self._w.writerows([_valoare_raport(v) for v in r] for r in randuri)
+
+    def inchide(self):
+        self._f.close()
+
+
+class ScriitorRaportXlsx:
+    """Registru openpyxl in modul write_only: randurile merg direct in fisierul temporar al foii."""
+    extensie = "xlsx"
+
+    def __init__(self, cale, titlu, antet):
+        try:
+            import openpyxl
+        except ImportError:
+            raise RuntimeError("Rapoartele XLSX necesită pachetul openpyxl (pip install openpyxl).")
+        self._cale = cale
+        self._wb = openpyxl.Workbook(write_only=True)
+        self._ws = self._wb.create_sheet(titlu[:31])
+        self._ws.append(antet)
+
+    def scrie(self, randuri):
+        for r in randuri:
+            self._ws.append([
+                v if isinstance(v, (int, float, Decimal)) else _valoare_raport(v) for v in r
+            ])
+
+    def inchide(self):
+        self._wb.save(self._cale)
+
+
+class ScriitorRaportPdf:
+    """
+    PDF A4 desenat rand cu rand pe canvas-ul reportlab (fara tabele platypus,
+    care isi tin toate celulele in memorie); antetul se repeta pe fiecare pagina.
+    """
+    extensie = "pdf"
+    MARGINE = 40
+    INALTIME_RAND = 14
+
+    def __init__(self, cale, titlu, antet):
+        try:
+            from reportlab.lib.pagesizes import A4
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+            from reportlab.pdfgen import canvas
+        except ImportError:
+            raise RuntimeError("Rapoartele PDF necesită pachetul reportlab (pip install reportlab).")
+        self._font = "Helvetica"
+        # fonturile standard PDF nu au ă/ș/ț; se foloseste un TTF al sistemului daca exista
+        for cale_font in ("C:/Windows/Fonts/arial.ttf",
+                          "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"):
+            if os.path.exists(cale_font):
+                pdfmetrics.registerFont(TTFont("RaportFont", cale_font))
+                self._font = "RaportFont"
+                break
+        self._c = canvas.Canvas(cale, pagesize=A4, pageCompression=1)
+        self._latime, self._inaltime = A4
+        self._titlu = titlu
+        self._antet = antet
+        self._pas = (self._latime - 2 * self.MARGINE) / len(antet)
+        self._pagina = 0
+        self._pagina_noua()
+
+    def _pagina_noua(self):
+        if self._pagina:
+            self._c.showPage()
+        self._pagina += 1
+        self._y = self._inaltime - self.MARGINE
+        self._c.setFont(self._font, 12)
+        self._c.drawString(self.MARGINE, self._y, self._titlu)
+        self._c.setFont(self._font, 8)
+        self._c.drawRightString(self._latime - self.MARGINE, self._y, f"Pagina {self._pagina}")
+        self._y -= 2 * self.INALTIME_RAND
+        self._rand(self._antet)
+        self._c.line(self.MARGINE, self._y + 4, self._latime - self.MARGINE, self._y + 4)
+        self._y -= 4
+
+    def _rand(self, valori):
+        self._c.setFont(self._font, 9)
+        for i, v in enumerate(valori):
+            x = self.MARGINE + i * self._pas
+            if isinstance(v, (int, float, Decimal)):
+                self._c.drawRightString(x + self._pas - 6, self._y, _valoare_raport(v))
+            else:
+                self._c.drawString(x, self._y, _valoare_raport(v)[:40])
+        self._y -= self.INALTIME_RAND
+
+    def scrie(self, randuri):
+        for r in randuri:
+            if self._y < self.MARGINE:
+                self._pagina_noua()
+            self._rand(r)
+
+    def inchide(self):
+        self._c.save()
+
+
+FORMATE_RAPORT = {
+    "CSV": ScriitorRaportCsv,
+    "XLSX": ScriitorRaportXlsx,
+    "PDF": ScriitorRaportPdf,
+}
+
+
+def genereaza_fisier_raport(tip, perioada, format_fisier="CSV", centru=None,
+                            id_utilizator=None, progres=None):
+    """
+    Scrie raportul in RAPOARTE_DIR, lot cu lot, si il inregistreaza in
+    Rapoarte. Fisierul apare sub numele final doar daca scrierea reuseste.
+    Intoarce (numar randuri, cale fisier).
+    """
+    cod, antet, _, _ = tip_raport(tip)
+    clasa = FORMATE_RAPORT[format_fisier]
+    perioada = perioada.strip().upper()
+    interval_perioada(perioada)  # perioada invalida: eroare inainte de a crea fisierul
+    titlu = f"{cod} {perioada or 'toate perioadele'}" + (f" {centru}" if centru else "")
+    cale = _cale_libera(
+        RAPOARTE_DIR,
+        f"{cod}_{perioada or 'toate'}{'_' + centru if centru else ''}_{datetime.now():%Y%m%d_%H%M%S}",
+        clasa.extensie
+    )
+    temporar = cale + ".partial"
+    cnt = 0
+    try:
+        scriitor = clasa(temporar, titlu, antet)
+        try:
+            for randuri in loturi_raport(tip, perioada, centru):
+                scriitor.scrie(randuri)
+                cnt += len(randuri)
+                if progres:
+                    progres(-1, f"Raport {cod}: {cnt} rânduri")
+        finally:
+            scriitor.inchide()
+    except Exception:
+        if os.path.exists(temporar):
+            os.remove(temporar)
+        raise
+    os.replace(temporar, cale)
+
+    exec_query(
+        """
+        INSERT INTO Rapoarte
+        (ID_Raport, Perioada, Tip_Raport, ID_CentruResponsabil, Descriere,
+         Format, Cale_Fisier, Numar_Randuri, ID_Utilizator, Data_Generarii)
+        VALUES (?,?,?,?,?,?,?,?,?,SYSDATETIME())
+        """,
+        (ID_GEN.next("RA"), perioada or "Toate", cod, centru, titlu[:100],
+         format_fisier, os.path.abspath(cale)[:260], cnt, id_utilizator)
+    )
+    return cnt, cale
+
 
 # ===== STIL GENERAL =================================================
 STYLE = """
@@ -85,27 +3715,589 @@ QSpinBox, QDateEdit {
     font-size: 13px;
 }
 
-QTableWidget {
-    background-color: #ffffff;
-    alternate-background-color: #f7f7f7;
-    selection-background-color: #e63946;
-    color: black;
-}
+QTableView {
+    background-color: #ffffff;
+    alternate-background-color: #f7f7f7;
+    selection-background-color: #e63946;
+    color: black;
+}
+
+QHeaderView::section {
+    background-color: #b71c1c;
+    color: white;
+    padding: 8px;
+    font-weight: bold;
+    font-size: 12px;
+    border: none;
+}
+
+QLabel {
+    color: #f5f5f5;
+    font-size: 13px;
+}
+
+QCheckBox {
+    color: #f5f5f5;
+    font-size: 13px;
+}
+"""
+
+# ===== SARCINI IN FUNDAL =============================================
+SARCINI_MAX_FIRE = 4  # sub POOL_MAX_CONEXIUNI, ca firul grafic sa gaseasca o conexiune libera
+
+
+class SarcinaAnulata(Exception):
+    """Aruncata in firul sarcinii cand utilizatorul a cerut anularea."""
+
+
+class _RulareSarcina(QRunnable):
+    def __init__(self, manager, cheie, fn, anulare):
+        super().__init__()
+        self.manager = manager
+        self.cheie = cheie
+        self.fn = fn
+        self.anulare = anulare
+
+    def progres(self, procent, mesaj=""):
+        if self.anulare.is_set():
+            raise SarcinaAnulata()
+        self.manager._progres.emit(self.cheie, procent, mesaj)
+
+    def run(self):
+        try:
+            rezultat = self.fn(self.progres)
+        except SarcinaAnulata:
+            self.manager._terminat.emit(self.cheie, False, None, "anulat")
+        except Exception as e:
+            self.manager._terminat.emit(self.cheie, False, None, str(e))
+        else:
+            self.manager._terminat.emit(self.cheie, True, rezultat, "")
+
+
+class ManagerSarcini(QObject):
+    """
+    Ruleaza operatiile lungi pe un QThreadPool, in afara firului grafic.
+
+    - fiecare sarcina are o cheie; o sarcina cu aceeasi cheie nu se
+      porneste de doua ori cat timp prima ruleaza;
+    - functia primeste `progres(procent, mesaj)` (procent -1 = nedeterminat),
+      care arunca SarcinaAnulata dupa o cerere de anulare;
+    - rezultatul/eroarea ajung in callback-uri apelate pe firul grafic;
+    - fiecare fir isi ia conexiunea proprie din POOL.
+    """
+    progres = pyqtSignal(str, int, str)   # cheie, procent, mesaj
+    active_schimbate = pyqtSignal(int)    # numarul de sarcini in curs
+
+    # semnale interne, emise din firele pool-ului
+    _progres = pyqtSignal(str, int, str)
+    _terminat = pyqtSignal(str, bool, object, str)
+
+    def __init__(self, max_fire=SARCINI_MAX_FIRE, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_fire)
+        self._active = {}   # cheie -> (anulare, la_rezultat, la_eroare, descriere)
+        self._progres.connect(self._la_progres)
+        self._terminat.connect(self._la_terminat)
+
+    def porneste(self, cheie, fn, la_rezultat=None, la_eroare=None, descriere=""):
+        """Porneste `fn(progres)` in fundal; False daca o sarcina `cheie` ruleaza deja."""
+        if cheie in self._active:
+            return False
+        anulare = threading.Event()
+        self._active[cheie] = (anulare, la_rezultat, la_eroare, descriere or cheie)
+        self._pool.start(_RulareSarcina(self, cheie, fn, anulare))
+        self.active_schimbate.emit(len(self._active))
+        self.progres.emit(cheie, -1, descriere or cheie)
+        return True
+
+    def ruleaza(self, cheie):
+        return cheie in self._active
+
+    def descriere(self, cheie):
+        return self._active[cheie][3] if cheie in self._active else ""
+
+    def anuleaza(self, cheie=None):
+        """Cere anularea unei sarcini (sau a tuturor); se opreste la urmatorul progres()."""
+        for k, (anulare, *_rest) in self._active.items():
+            if cheie is None or k == cheie:
+                anulare.set()
+
+    def asteapta(self, ms=-1):
+        return self._pool.waitForDone(ms)
+
+    def _la_progres(self, cheie, procent, mesaj):
+        if cheie in self._active:
+            self.progres.emit(cheie, procent, mesaj)
+
+    def _la_terminat(self, cheie, ok, rezultat, eroare):
+        _, la_rezultat, la_eroare, _ = self._active.pop(cheie, (None, None, None, None))
+        self.active_schimbate.emit(len(self._active))
+        if ok:
+            if la_rezultat is not None:
+                la_rezultat(rezultat)
+        elif eroare != "anulat" and la_eroare is not None:
+            la_eroare(eroare)
+
+
+# ===== TABELE VIRTUALIZATE ==========================================
+MARIME_PAGINA = 500   # randuri aduse din baza la fiecare derulare spre final
+
+
+class SursaKeyset:
+    """
+    SELECT paginat dupa cheie (keyset): fiecare pagina continua dupa
+    ultimul rand citit, deci costul unei pagini nu depinde de cate
+    pagini s-au citit inainte. Coloanele cheie trebuie sa fie NOT NULL,
+    sa apara in `coloane` si sa identifice unic randul.
+    """
+
+    def __init__(self, tabel, coloane, chei, desc=False, conditie="1=1", params=()):
+        self.tabel = tabel
+        self.coloane = list(coloane)
+        self.chei = list(chei)
+        self.desc = desc
+        self.conditie = conditie
+        self.params = tuple(params)
+        self._poz_chei = [self.coloane.index(k) for k in self.chei]
+
+    def cheie(self, rand):
+        return tuple(rand[i] for i in self._poz_chei)
+
+    def _dupa(self, cheie):
+        """(k1 < ?) OR (k1 = ? AND k2 < ?) ... pentru cheia compusa."""
+        op = "<" if self.desc else ">"
+        termeni, params = [], []
+        for i, k in enumerate(self.chei):
+            egale = [f"{c} = ?" for c in self.chei[:i]]
+            termeni.append("(" + " AND ".join(egale + [f"{k} {op} ?"]) + ")")
+            params.extend(cheie[:i + 1])
+        return "(" + " OR ".join(termeni) + ")", params
+
+    def pagina(self, dupa, n):
+        conditie, params = self.conditie, list(self.params)
+        if dupa is not None:
+            pred, p = self._dupa(dupa)
+            conditie = f"({conditie}) AND {pred}"
+            params.extend(p)
+        ordine = ", ".join(f"{k} DESC" if self.desc else k for k in self.chei)
+        return exec_query(
+            f"SELECT TOP (?) {', '.join(self.coloane)} FROM {self.tabel} "
+            f"WHERE {conditie} ORDER BY {ordine}",
+            [n] + params,
+            fetch=True
+        ) or []
+
+
+class ModelTabel(QAbstractTableModel):
+    """
+    Model pentru QTableView care aduce randurile pe pagini, la cerere
+    (canFetchMore/fetchMore), si le tine pe coloane, nu cate un obiect
+    pe celula. View-ul deseneaza doar randurile vizibile.
+    """
+    eroare = pyqtSignal(str)
+
+    def __init__(self, antet, culoare=None, pagina=MARIME_PAGINA, parent=None, sarcini=None):
+        super().__init__(parent)
+        self.antet = list(antet)
+        self.culoare = culoare    # functie (coloana, valoare) -> QColor sau None
+        self.marime_pagina = pagina
+        self.sarcini = sarcini    # ManagerSarcini; fara el paginile se aduc sincron
+        self._sursa = None
+        self._coloane = [[] for _ in self.antet]
+        self._n = 0
+        self._ultima_cheie = None
+        self._epuizat = True
+        self._in_curs = False
+        self._generatie = 0
+        self._cheie_sarcina = f"incarca:{id(self)}"
+        self.decalaj = 0          # numarul primului rand afisat, pentru paginare
+
+    def seteaza_sursa(self, sursa):
+        """
+        Goleste modelul si incarca prima pagina din `sursa`.
+        Fara ManagerSarcini erorile se propaga; cu el pagina vine in fundal
+        si erorile ajung prin semnalul `eroare`.
+        """
+        self.beginResetModel()
+        self._sursa = sursa
+        self._coloane = [[] for _ in self.antet]
+        self._n = 0
+        self._ultima_cheie = None
+        self._epuizat = sursa is None
+        self._generatie += 1
+        self.endResetModel()
+        if self.sarcini is None:
+            if sursa is not None:
+                self._adauga(sursa.pagina(None, self.marime_pagina))
+        else:
+            self._cere_pagina()
+
+    def seteaza_randuri(self, randuri, decalaj=0, antet=None):
+        """
+        Afiseaza exact `randuri` (o pagina deja citita), fara incarcare la
+        derulare; cu `antet`, schimba si coloanele.
+        """
+        self.beginResetModel()
+        if antet is not None:
+            self.antet = list(antet)
+        self._sursa = None
+        self._epuizat = True
+        self._generatie += 1
+        self.decalaj = decalaj
+        self._coloane = [[r[c] for r in randuri] for c in range(len(self.antet))]
+        self._n = len(randuri)
+        self.endResetModel()
+
+    def _cere_pagina(self):
+        if self._epuizat or self._in_curs:
+            return  # o pagina ceruta pentru o sursa veche se reia la sosire
+        self._in_curs = True
+        sursa, dupa, n, gen = self._sursa, self._ultima_cheie, self.marime_pagina, self._generatie
+
+        def gata(randuri):
+            self._in_curs = False
+            if gen != self._generatie:
+                self._cere_pagina()
+                return
+            self._adauga(randuri)
+
+        def esuat(mesaj):
+            self._in_curs = False
+            if gen != self._generatie:
+                self._cere_pagina()
+                return
+            self._epuizat = True
+            self.eroare.emit(mesaj)
 
-QHeaderView::section {
-    background-color: #b71c1c;
-    color: white;
-    padding: 8px;
-    font-weight: bold;
-    font-size: 12px;
-    border: none;
-}
+        self.sarcini.porneste(
+            self._cheie_sarcina, lambda progres: sursa.pagina(dupa, n),
+            gata, esuat, "Încărcare date"
+        )
+
+    def _adauga(self, randuri):
+        if len(randuri) < self.marime_pagina:
+            self._epuizat = True
+        if not randuri:
+            return
+        self._ultima_cheie = self._sursa.cheie(randuri[-1])
+        self.beginInsertRows(QModelIndex(), self._n, self._n + len(randuri) - 1)
+        for c, col in enumerate(self._coloane):
+            col.extend(r[c] for r in randuri)
+        self._n += len(randuri)
+        self.endInsertRows()
+
+    def valoare(self, rand, coloana):
+        return self._coloane[coloana][rand]
+
+    # --- interfata QAbstractTableModel --------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._n
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.antet)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        val = self._coloane[index.column()][index.row()]
+        if role == Qt.DisplayRole:
+            return "" if val is None else str(val)
+        if role == Qt.BackgroundRole and self.culoare is not None:
+            return self.culoare(index.column(), val)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.antet[section]
+        return str(self.decalaj + section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._epuizat and not self._in_curs
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._epuizat:
+            return
+        if self.sarcini is not None:
+            self._cere_pagina()
+            return
+        try:
+            self._adauga(self._sursa.pagina(self._ultima_cheie, self.marime_pagina))
+        except Exception as e:
+            self._epuizat = True
+            self.eroare.emit(str(e))
+
+
+def culoare_status_buget(coloana, valoare):
+    if coloana == 5:
+        if valoare == "Depasit":
+            return QColor(255, 182, 193)
+        if valoare == "Subutilizat":
+            return QColor(255, 255, 141)
+    return None
+
+
+def tabel_virtual(antet, culoare=None, sarcini=None):
+    """QTableView + ModelTabel, configurat ca tabelele aplicatiei."""
+    view = QTableView()
+    model = ModelTabel(antet, culoare, parent=view, sarcini=sarcini)
+    view.setModel(model)
+    view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+    # inaltime fixa: view-ul nu mai masoara fiecare rand
+    view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+    view.verticalHeader().setDefaultSectionSize(26)
+    return view, model
+
+
+# ===== TRANZACTII: FILTRE SI PAGINARE ===============================
+PAGINA_TRANZACTII = 100
+ESTIMARE_PLAFON = 10_000   # peste atatea randuri filtrate afisam doar "peste N"
+
+COLOANE_TRANZACTII = [
+    "ID_Transactie", "Tip_Operatiune", "Suma",
+    "Data_Operatiune", "Descriere", "ID_CentruResponsabil",
+]
+
+
+def conditie_tranzactii(de_la=None, pana_la=None, tip=None, centru=None,
+                        suma_min=None, suma_max=None):
+    """Filtrele tab-ului Tranzactii, ca WHERE parametrizat (None = fara filtru)."""
+    termeni, params = [], []
+    if de_la is not None:
+        termeni.append("Data_Operatiune >= ?")
+        params.append(de_la)
+    if pana_la is not None:
+        termeni.append("Data_Operatiune <= ?")
+        params.append(pana_la)
+    if tip:
+        termeni.append("Tip_Operatiune = ?")
+        params.append(tip)
+    if centru:
+        termeni.append("ID_CentruResponsabil = ?")
+        params.append(centru)
+    if suma_min is not None:
+        termeni.append("Suma >= ?")
+        params.append(suma_min)
+    if suma_max is not None:
+        termeni.append("Suma <= ?")
+        params.append(suma_max)
+    return (" AND ".join(termeni) or "1=1"), tuple(params)
+
+
+def sursa_tranzactii(**filtre):
+    conditie, params = conditie_tranzactii(**filtre)
+    return SursaKeyset(
+        "Tranzactii", COLOANE_TRANZACTII,
+        chei=["Data_Operatiune", "ID_Transactie"], desc=True,
+        conditie=conditie, params=params
+    )
+
+
+def pagina_keyset(sursa, dupa, n):
+    """O pagina de n randuri dupa cheia `dupa` + daca mai exista o pagina dupa ea."""
+    randuri = sursa.pagina(dupa, n + 1)
+    return randuri[:n], len(randuri) > n
+
+
+def estimeaza_randuri(tabel, conditie="1=1", params=(), plafon=ESTIMARE_PLAFON):
+    """
+    (numar, fel) fara a numara tot tabelul:
+     - fara filtre, numarul de randuri din metadatele tabelului ("aprox");
+     - cu filtre, COUNT limitat la `plafon` + 1 randuri ("exact" sau "peste").
+    """
+    if conditie == "1=1":
+        return BACKEND.numar_randuri_aprox(tabel), "aprox"
+    rows = exec_query(
+        f"SELECT COUNT(*) FROM (SELECT TOP (?) 1 AS x FROM {tabel} WHERE {conditie}) t",
+        (plafon + 1,) + tuple(params),
+        fetch=True
+    ) or []
+    n = int(rows[0][0]) if rows else 0
+    return (n, "exact") if n <= plafon else (plafon, "peste")
+
+
+def text_estimare(estimare, unitate):
+    n, fel = estimare
+    prefix = {"exact": "", "aprox": "~", "peste": "peste "}[fel]
+    return f"{prefix}{n:,} {unitate}".replace(",", " ")
+
+
+# ===== AUDIT: FILTRE SI EXPORT ======================================
+COLOANE_AUDIT = ["ID_Log", "ID_Utilizator", "Tip_Actiune", "Data_Ora", "Descriere"]
+TIPURI_ACTIUNE = ["Login", "Adaugare", "Modificare", "Stergere", "Import", "Repartizare", "Export", "Calcul", "Raport"]
+
+
+def conditie_audit(utilizator=None, tip=None, de_la=None, pana_la=None, text=None):
+    """
+    Filtrele jurnalului ca WHERE parametrizat. `pana_la` e o zi inclusa,
+    deci devine Data_Ora < ziua urmatoare; textul se cauta in Descriere.
+    """
+    termeni, params = [], []
+    if utilizator:
+        termeni.append("ID_Utilizator = ?")
+        params.append(utilizator)
+    if tip:
+        termeni.append("Tip_Actiune = ?")
+        params.append(tip)
+    if de_la is not None:
+        termeni.append("Data_Ora >= ?")
+        params.append(datetime.combine(de_la, datetime.min.time()))
+    if pana_la is not None:
+        termeni.append("Data_Ora < ?")
+        params.append(datetime.combine(_zi_urmatoare(pana_la), datetime.min.time()))
+    if text:
+        escapat = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("[", "\\[")
+        termeni.append("Descriere LIKE ? ESCAPE '\\'")
+        params.append(f"%{escapat}%")
+    return (" AND ".join(termeni) or "1=1"), tuple(params)
+
+
+def _zi_urmatoare(zi):
+    return date.fromordinal(zi.toordinal() + 1)
+
+
+def sursa_audit(arhiva=False, **filtre):
+    """Cu `arhiva`, se citeste vederea LogAuditComplet (jurnal curent + arhiva)."""
+    conditie, params = conditie_audit(**filtre)
+    return SursaKeyset(
+        "LogAuditComplet" if arhiva else "LogAudit", COLOANE_AUDIT,
+        chei=["Data_Ora", "ID_Log"], desc=True,
+        conditie=conditie, params=params
+    )
+
+
+def exporta_audit(lot=EXPORT_LOT, progres=None, arhiva=False, **filtre):
+    """
+    Scrie in CSV intrarile jurnalului care corespund filtrelor, cele mai noi
+    intai, citind in loturi (memoria nu creste cu numarul de randuri).
+    Intoarce (numar randuri, cale fisier).
+    """
+    conditie, params = conditie_audit(**filtre)
+    cale = _cale_libera(EXPORT_DIR, f"audit_{datetime.now():%Y%m%d_%H%M%S}", "csv")
+    temporar = cale + ".partial"
+    cnt = 0
+    try:
+        with open(temporar, "w", encoding="utf-8-sig", newline="") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(COLOANE_AUDIT)
+            for randuri in iter_query(
+                f"SELECT {', '.join(COLOANE_AUDIT)} FROM {'LogAuditComplet' if arhiva else 'LogAudit'} "
+                f"WHERE {conditie} ORDER BY Data_Ora DESC, ID_Log DESC",
+                params, lot
+            ):
+                w.writerows(
+                    (id_log, id_u or "", tip, data_ora.isoformat(sep=" ") if data_ora else "", desc or "")
+                    for id_log, id_u, tip, data_ora, desc in randuri
+                )
+                cnt += len(randuri)
+                if progres:
+                    progres(-1, f"Export jurnal: {cnt} înregistrări")
+    except Exception:
+        os.remove(temporar)
+        raise
+    os.replace(temporar, cale)
+    return cnt, cale
+
+
+# ===== RETENTIE AUDIT ===============================================
+# Intrarile mai vechi decat perioada de retentie (in luni intregi) se mut zi
+# cu zi din LogAudit in ArhivaLogAudit si/sau in fisiere CSV comprimate
+# (ARHIVA_AUDIT_DIR/AAAA-LL/LogAudit_AAAA-LL-ZZ.csv.gz). Vederea
+# LogAuditComplet le reuneste pe cele din tabele pentru vizualizare.
+AUDIT_RETENTIE_LUNI = 12
+PARAM_RETENTIE_AUDIT = "audit.retentie_luni"
+ARHIVA_AUDIT_DIR = "arhiva_audit"
+
+
+def limita_retentie_audit(luni, azi=None):
+    """Prima zi a lunii care ramane in LogAudit (tot ce e inainte se arhiveaza)."""
+    azi = azi or date.today()
+    return _luna_plus(azi.year, azi.month, -luni)
+
+
+def _prima_zi_audit(pana_la, de_la=None):
+    if de_la is None:
+        rows = exec_query("SELECT MIN(Data_Ora) FROM LogAudit WHERE Data_Ora < ?", (pana_la,), fetch=True)
+    else:
+        rows = exec_query(
+            "SELECT MIN(Data_Ora) FROM LogAudit WHERE Data_Ora >= ? AND Data_Ora < ?",
+            (de_la, pana_la),
+            fetch=True
+        )
+    rows = rows or []
+    prima = rows[0][0] if rows else None
+    if isinstance(prima, str):
+        prima = datetime.fromisoformat(prima)
+    return prima.date() if prima else None
+
+
+def _scrie_arhiva_zi(zi, de_la, pana_la):
+    """Fisierul zilei e rescris complet la fiecare rulare, deci reluarea e sigura."""
+    director = os.path.join(ARHIVA_AUDIT_DIR, f"{zi:%Y-%m}")
+    os.makedirs(director, exist_ok=True)
+    cale = os.path.join(director, f"LogAudit_{zi:%Y-%m-%d}.csv.gz")
+    temporar = cale + ".partial"
+    try:
+        with gzip.open(temporar, "wt", encoding="utf-8", newline="") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(COLOANE_AUDIT)
+            for randuri in iter_query(
+                f"SELECT {', '.join(COLOANE_AUDIT)} FROM LogAudit "
+                "WHERE Data_Ora >= ? AND Data_Ora < ? ORDER BY Data_Ora, ID_Log",
+                (de_la, pana_la)
+            ):
+                w.writerows(
+                    (id_log, id_u or "", tip, data_ora.isoformat(sep=" "), desc or "")
+                    for id_log, id_u, tip, data_ora, desc in randuri
+                )
+    except Exception:
+        os.remove(temporar)
+        raise
+    os.replace(temporar, cale)
+
+
+def _arhiveaza_zi(zi, in_tabel, in_fisiere):
+    de_la = datetime.combine(zi, datetime.min.time())
+    pana_la = datetime.combine(_zi_urmatoare(zi), datetime.min.time())
+    interval = "WHERE Data_Ora >= ? AND Data_Ora < ?"
+    if in_fisiere:
+        _scrie_arhiva_zi(zi, de_la, pana_la)
+    coloane = ", ".join(COLOANE_AUDIT)
+    with tranzactie():
+        cnt = exec_query(f"SELECT COUNT(*) FROM LogAudit {interval}", (de_la, pana_la), fetch=True)[0][0]
+        if in_tabel:
+            exec_query(
+                f"INSERT INTO ArhivaLogAudit ({coloane}) SELECT {coloane} FROM LogAudit {interval}",
+                (de_la, pana_la)
+            )
+        exec_query(f"DELETE FROM LogAudit {interval}", (de_la, pana_la))
+    return cnt
+
+
+def arhiveaza_audit(luni=None, in_tabel=True, in_fisiere=False, progres=None):
+    """
+    Muta din LogAudit intrarile mai vechi de `luni` luni (implicit parametrul
+    audit.retentie_luni sau AUDIT_RETENTIE_LUNI), cate o zi pe tranzactie SQL.
+    Intoarce numarul de intrari mutate.
+    """
+    if not (in_tabel or in_fisiere):
+        raise ValueError("Arhivarea are nevoie de cel puțin o destinație (tabel sau fișiere).")
+    if luni is None:
+        luni = int(citeste_parametru(PARAM_RETENTIE_AUDIT, AUDIT_RETENTIE_LUNI))
+    limita = datetime.combine(limita_retentie_audit(luni), datetime.min.time())
+
+    total = 0
+    zi = _prima_zi_audit(limita)
+    while zi is not None:
+        total += _arhiveaza_zi(zi, in_tabel, in_fisiere)
+        if progres:
+            progres(-1, f"Arhivare jurnal: {zi:%Y-%m-%d}, {total} înregistrări")
+        urmatoarea = datetime.combine(_zi_urmatoare(zi), datetime.min.time())
+        zi = _prima_zi_audit(limita, urmatoarea)
+    return total
 
-QLabel {
-    color: #f5f5f5;
-    font-size: 13px;
-}
-"""
 
 # ===== FEREASTRA PRINCIPALA =========================================
 class MoldelectricaApp(QMainWindow):
@@ -181,6 +4373,7 @@ class MoldelectricaApp(QMainWindow):
         self.tab_programari = QWidget()
         self.tab_rapoarte = QWidget()
         self.tab_audit = QWidget()
+        self.tab_diagnostic = QWidget()
 
         self.tabs.addTab(self.tab_tranzactii, "Tranzacții")
         self.tabs.addTab(self.tab_reguli, "Reguli")
@@ -191,6 +4384,26 @@ class MoldelectricaApp(QMainWindow):
         self.tabs.addTab(self.tab_programari, "Programări")
         self.tabs.addTab(self.tab_rapoarte, "Rapoarte")
         self.tabs.addTab(self.tab_audit, "Audit")
+        self.tabs.addTab(self.tab_diagnostic, "Diagnostic")
+        # ascuns pentru toti; adminul il deschide cu Ctrl+Shift+D
+        self.tabs.setTabVisible(self.tabs.indexOf(self.tab_diagnostic), False)
+
+        # operatiile lungi ruleaza in fundal; progresul apare in bara de stare
+        self.sarcini = ManagerSarcini(parent=self)
+        self.sarcini.progres.connect(self._progres_sarcina)
+        self.sarcini.active_schimbate.connect(self._sarcini_active)
+        self.lbl_sarcina = QLabel()
+        self.bar_sarcina = QProgressBar()
+        self.bar_sarcina.setMaximumWidth(220)
+        self.btn_anuleaza = QPushButton("Anulează")
+        self.btn_anuleaza.clicked.connect(lambda: self.sarcini.anuleaza())
+        for w in (self.lbl_sarcina, self.bar_sarcina, self.btn_anuleaza):
+            self.statusBar().addPermanentWidget(w)
+            w.hide()
+
+        # sugestii pentru campurile de ID, din cache-ul de referinte
+        self.sugestii_centre = QStringListModel(self)
+        self.sugestii_utilizatori = QStringListModel(self)
 
         # construim fiecare tab
         self.build_tab_tranzactii()
@@ -202,8 +4415,10 @@ class MoldelectricaApp(QMainWindow):
         self.build_tab_programari()
         self.build_tab_rapoarte()
         self.build_tab_audit()
+        self.build_tab_diagnostic()
 
         self.apply_permissions()
+        self.incarca_referinte()
 
         self.statusBar().showMessage(
             f"Autentificat ca: {user_info['login']} ({user_info['tip_cont']})"
@@ -224,9 +4439,11 @@ class MoldelectricaApp(QMainWindow):
             # Lista butoanelor administrative — se ascund complet
             admin_buttons = [
                 getattr(self, 'btn_add_tranzactie', None),
+                getattr(self, 'btn_import_tranzactii', None),
                 getattr(self, 'btn_add_regula', None),
                 getattr(self, 'btn_save_buget', None),
                 getattr(self, 'btn_repartizeaza', None),
+                getattr(self, 'btn_repartizeaza_tot', None),
                 getattr(self, 'btn_gen_export', None),
                 getattr(self, 'btn_add_angajat', None),
                 getattr(self, 'btn_calc_salariu', None),
@@ -262,23 +4479,79 @@ class MoldelectricaApp(QMainWindow):
             self.tabs.setTabVisible(self.tabs.indexOf(self.tab_programari), True)
             self.tabs.setTabVisible(self.tabs.indexOf(self.tab_rapoarte), True)
             self.tabs.setTabVisible(self.tabs.indexOf(self.tab_audit), True)
+            QShortcut(QKeySequence("Ctrl+Shift+D"), self, activated=self.comuta_diagnostic)
 
 
+    def arata_eroare_sql(self, mesaj):
+        QMessageBox.critical(self, "Eroare SQL", mesaj)
+
+    # ===== SARCINI IN FUNDAL =========================================
+    def ruleaza_in_fundal(self, cheie, descriere, fn, la_rezultat):
+        """Porneste `fn(progres)` in fundal; a doua apasare cat ruleaza e ignorata."""
+        pornita = self.sarcini.porneste(
+            cheie, fn, la_rezultat,
+            lambda mesaj: QMessageBox.critical(self, "Eroare", mesaj),
+            descriere
+        )
+        if not pornita:
+            self.statusBar().showMessage(f"{descriere}: rulează deja.", 5000)
+        return pornita
+
+    def _progres_sarcina(self, cheie, procent, mesaj):
+        self.lbl_sarcina.setText(mesaj)
+        if procent < 0:
+            self.bar_sarcina.setRange(0, 0)
+        else:
+            self.bar_sarcina.setRange(0, 100)
+            self.bar_sarcina.setValue(procent)
+
+    def _sarcini_active(self, n):
+        for w in (self.lbl_sarcina, self.bar_sarcina, self.btn_anuleaza):
+            w.setVisible(n > 0)
+
+    def closeEvent(self, event):
+        self.sarcini.anuleaza()
+        self.sarcini.asteapta(10_000)
+        super().closeEvent(event)
+
+    # ===== DATE DE REFERINTA =========================================
+    def completer(self, model):
+        c = QCompleter(model, self)
+        c.setCaseSensitivity(Qt.CaseInsensitive)
+        c.setFilterMode(Qt.MatchContains)
+        return c
+
+    def incarca_referinte(self):
+        """Umple cache-ul (o singura interogare, in fundal) si listele de sugestii."""
+        def incarca(progres):
+            CACHE_REF.incarca_tot()
+            return list(CACHE_REF.tabel("centre")), list(CACHE_REF.tabel("utilizatori"))
+
+        def gata(rezultat):
+            centre, utilizatori = rezultat
+            self.sugestii_centre.setStringList(sorted(centre))
+            self.sugestii_utilizatori.setStringList(sorted(utilizatori))
+
+        self.sarcini.porneste(
+            "referinte", incarca, gata,
+            lambda mesaj: self.statusBar().showMessage(f"Date de referință indisponibile: {mesaj}", 10_000),
+            "Încărcare date de referință"
+        )
+
+    def centru_valid(self, centru):
+        # la cache expirat se citeste din baza, chiar pe firul interfetei
+        try:
+            if CACHE_REF.get("centre", centru) is not None:
+                return True
+        except BACKEND.Error as e:
+            self.arata_eroare_sql(str(e))
+            return False
+        QMessageBox.warning(self, "Eroare", f"Centrul de responsabilitate „{centru}” nu există.")
+        return False
+
     # ===== AUDIT UTIL ================================================
     def log_actiune(self, tip_actiune, descriere):
-        id_log = ("LG" + datetime.now().strftime("%Y%m%d%H%M%S"))[-13:]
-        try:
-            exec_query(
-                """
-                INSERT INTO LogAudit
-                (ID_Log, ID_Utilizator, Tip_Actiune, Data_Ora, Descriere)
-                VALUES (?,?,?,?,?)
-                """,
-                (id_log, self.user_info["id"], tip_actiune, datetime.now(), descriere),
-                fetch=False
-            )
-        except Exception:
-            pass  # nu blocam aplicatia daca log-ul esueaza
+        AUDIT.scrie(self.user_info["id"], tip_actiune, descriere)
 
     # ===== TAB TRANZACTII ============================================
     def build_tab_tranzactii(self):
@@ -297,6 +4570,7 @@ class MoldelectricaApp(QMainWindow):
         self.tr_data.setDate(QDate.currentDate())
         self.tr_descriere = QLineEdit()
         self.tr_centru = QLineEdit()
+        self.tr_centru.setCompleter(self.completer(self.sugestii_centre))
 
         def add_row(lbl, widget):
             left.addWidget(QLabel(lbl))
@@ -313,20 +4587,79 @@ class MoldelectricaApp(QMainWindow):
         btn_reload = QPushButton("Reîncarcă tranzacții")
         btn_reload.clicked.connect(self.incarca_tranzactii)
 
+        self.btn_import_tranzactii = QPushButton("Import CSV/XLSX")
+        self.btn_import_tranzactii.clicked.connect(self.importa_fisier_tranzactii)
+
         right.addWidget(self.btn_add_tranzactie)
+        right.addWidget(self.btn_import_tranzactii)
         right.addWidget(btn_reload)
         right.addStretch()
 
         form.addLayout(left, 3)
         form.addLayout(right, 1)
 
-        self.table_tranzactii = QTableWidget()
+        # filtre (aplicate in WHERE, pe server)
+        filtre = QHBoxLayout()
+        self.flt_de_la_activ = QCheckBox("De la:")
+        self.flt_de_la = QDateEdit()
+        self.flt_de_la.setCalendarPopup(True)
+        self.flt_de_la.setDate(QDate.currentDate().addMonths(-1))
+        self.flt_pana_la_activ = QCheckBox("Până la:")
+        self.flt_pana_la = QDateEdit()
+        self.flt_pana_la.setCalendarPopup(True)
+        self.flt_pana_la.setDate(QDate.currentDate())
+        self.flt_tip = QComboBox()
+        self.flt_tip.addItems(["Toate", "Venit", "Cheltuiala"])
+        self.flt_centru = QLineEdit()
+        self.flt_centru.setPlaceholderText("Centru")
+        self.flt_centru.setCompleter(self.completer(self.sugestii_centre))
+        self.flt_suma_min = QDoubleSpinBox()
+        self.flt_suma_max = QDoubleSpinBox()
+        for w in (self.flt_suma_min, self.flt_suma_max):
+            w.setRange(0, 10_000_000)
+            w.setDecimals(2)
+            w.setSpecialValueText("—")  # 0 = fara limita
+        btn_filtreaza = QPushButton("Aplică filtre")
+        btn_filtreaza.clicked.connect(self.incarca_tranzactii)
+        btn_reset = QPushButton("Resetează")
+        btn_reset.clicked.connect(self.reseteaza_filtre_tranzactii)
+
+        for w in (self.flt_de_la_activ, self.flt_de_la, self.flt_pana_la_activ, self.flt_pana_la,
+                  QLabel("Tip:"), self.flt_tip, self.flt_centru,
+                  QLabel("Sumă min:"), self.flt_suma_min, QLabel("max:"), self.flt_suma_max,
+                  btn_filtreaza, btn_reset):
+            filtre.addWidget(w)
+        filtre.addStretch()
+
+        self.table_tranzactii, self.model_tranzactii = tabel_virtual(
+            ["ID", "Tip", "Sumă", "Data", "Descriere", "Centru"], sarcini=self.sarcini
+        )
         self.table_tranzactii.setAlternatingRowColors(True)
-        self.table_tranzactii.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.model_tranzactii.eroare.connect(self.arata_eroare_sql)
+
+        # navigare pe pagini (keyset dupa Data_Operatiune, ID_Transactie)
+        nav = QHBoxLayout()
+        self.btn_tr_anterior = QPushButton("◀ Pagina anterioară")
+        self.btn_tr_anterior.clicked.connect(self.pagina_anterioara_tranzactii)
+        self.btn_tr_urmator = QPushButton("Pagina următoare ▶")
+        self.btn_tr_urmator.clicked.connect(self.pagina_urmatoare_tranzactii)
+        self.lbl_tr_pagina = QLabel()
+        nav.addWidget(self.btn_tr_anterior)
+        nav.addWidget(self.lbl_tr_pagina)
+        nav.addStretch()
+        nav.addWidget(self.btn_tr_urmator)
+
+        self._sursa_tr = None
+        self._pagini_tr = [None]   # cheia dupa care incepe fiecare pagina vizitata
+        self._are_urmatoare_tr = False
+        self._ultima_cheie_tr = None
+        self._estimare_tr = None
 
         layout.addLayout(form)
+        layout.addLayout(filtre)
         layout.addWidget(QLabel("Lista tranzacțiilor:"))
         layout.addWidget(self.table_tranzactii)
+        layout.addLayout(nav)
 
         self.tab_tranzactii.setLayout(layout)
         self.incarca_tranzactii()
@@ -341,21 +4674,11 @@ class MoldelectricaApp(QMainWindow):
         if suma <= 0:
             QMessageBox.warning(self, "Eroare", "Suma trebuie să fie > 0.")
             return
-
-        now_str = datetime.now().strftime("%Y%m%d%H%M%S")
-        id_tr = f"TR{now_str}"[-13:]
+        if centru and not self.centru_valid(centru):
+            return
 
         try:
-            exec_query(
-                """
-                INSERT INTO Tranzactii
-                (ID_Transactie, Tip_Operatiune, Suma, Data_Operatiune,
-                 Descriere, ID_CentruResponsabil)
-                VALUES (?,?,?,?,?,?)
-                """,
-                (id_tr, tip, suma, data, desc, centru),
-                fetch=False
-            )
+            id_tr, = insereaza_tranzactii([(tip, suma, data, desc, centru)])
             self.log_actiune("Adaugare", f"Tranzacție {id_tr} adăugată")
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
@@ -363,32 +4686,104 @@ class MoldelectricaApp(QMainWindow):
 
         QMessageBox.information(self, "OK", "Tranzacție adăugată.")
         self.incarca_tranzactii()
+        self.incarca_bugete()
 
-    def incarca_tranzactii(self):
-        try:
-            rows = exec_query(
-                """
-                SELECT ID_Transactie, Tip_Operatiune, Suma,
-                       Data_Operatiune, Descriere, ID_CentruResponsabil
-                FROM Tranzactii
-                ORDER BY Data_Operatiune DESC
-                """,
-                fetch=True
-            ) or []
-        except Exception as e:
-            QMessageBox.critical(self, "Eroare SQL", str(e))
+    def importa_fisier_tranzactii(self):
+        cale, _ = QFileDialog.getOpenFileName(
+            self, "Import tranzacții", "", "Extrase (*.csv *.xlsx);;Toate fișierele (*)"
+        )
+        if not cale:
             return
 
-        header = ["ID", "Tip", "Sumă", "Data", "Descriere", "Centru"]
-        self.table_tranzactii.setRowCount(len(rows))
-        self.table_tranzactii.setColumnCount(len(header))
-        self.table_tranzactii.setHorizontalHeaderLabels(header)
+        def gata(rezultat):
+            importate, respinse, cale_respinse = rezultat
+            self.log_actiune("Import", f"Import {os.path.basename(cale)}: {importate} tranzacții, {respinse} respinse")
+            mesaj = f"Tranzacții importate: {importate}."
+            if respinse:
+                mesaj += f"\nRânduri respinse: {respinse}, detalii în:\n{cale_respinse}"
+            QMessageBox.information(self, "Import", mesaj)
+            self.incarca_tranzactii()
+            self.incarca_bugete()
+
+        self.ruleaza_in_fundal(
+            "import", f"Import {os.path.basename(cale)}",
+            lambda progres: importa_tranzactii(cale, progres=progres),
+            gata
+        )
 
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                self.table_tranzactii.setItem(
-                    r, c, QTableWidgetItem("" if val is None else str(val))
-                )
+    def filtre_tranzactii(self):
+        def data(activ, edit):
+            return edit.date().toPyDate() if activ.isChecked() else None
+
+        return dict(
+            de_la=data(self.flt_de_la_activ, self.flt_de_la),
+            pana_la=data(self.flt_pana_la_activ, self.flt_pana_la),
+            tip=None if self.flt_tip.currentIndex() == 0 else self.flt_tip.currentText(),
+            centru=self.flt_centru.text().strip() or None,
+            suma_min=self.flt_suma_min.value() or None,
+            suma_max=self.flt_suma_max.value() or None,
+        )
+
+    def reseteaza_filtre_tranzactii(self):
+        self.flt_de_la_activ.setChecked(False)
+        self.flt_pana_la_activ.setChecked(False)
+        self.flt_tip.setCurrentIndex(0)
+        self.flt_centru.clear()
+        self.flt_suma_min.setValue(0)
+        self.flt_suma_max.setValue(0)
+        self.incarca_tranzactii()
+
+    def incarca_tranzactii(self):
+        """Prima pagina pentru filtrele curente (o interogare TOP n + o estimare)."""
+        self._sursa_tr = sursa_tranzactii(**self.filtre_tranzactii())
+        self._pagini_tr = [None]
+        self._estimare_tr = None
+        self._arata_pagina_tranzactii()
+
+    def pagina_urmatoare_tranzactii(self):
+        if self._are_urmatoare_tr and self._ultima_cheie_tr is not None:
+            self._pagini_tr.append(self._ultima_cheie_tr)
+            self._arata_pagina_tranzactii()
+
+    def pagina_anterioara_tranzactii(self):
+        if len(self._pagini_tr) > 1:
+            self._pagini_tr.pop()
+            self._arata_pagina_tranzactii()
+
+    def _arata_pagina_tranzactii(self):
+        if self.sarcini.ruleaza("pagina_tranzactii"):
+            return  # la sosire, pagina veche se vede ca depasita si se cere cea curenta
+        sursa, dupa, pagina = self._sursa_tr, self._pagini_tr[-1], len(self._pagini_tr)
+        cu_estimare = self._estimare_tr is None
+
+        def incarca(progres):
+            randuri, are_urmatoare = pagina_keyset(sursa, dupa, PAGINA_TRANZACTII)
+            estimare = None
+            if cu_estimare:
+                estimare = estimeaza_randuri("Tranzactii", sursa.conditie, sursa.params)
+            return randuri, are_urmatoare, estimare
+
+        def gata(rezultat):
+            randuri, are_urmatoare, estimare = rezultat
+            if estimare is not None and sursa is self._sursa_tr:
+                self._estimare_tr = estimare
+            if sursa is not self._sursa_tr or len(self._pagini_tr) != pagina \
+                    or self._pagini_tr[-1] != dupa:
+                self._arata_pagina_tranzactii()
+                return
+            self._are_urmatoare_tr = are_urmatoare
+            self._ultima_cheie_tr = sursa.cheie(randuri[-1]) if randuri else None
+            self.model_tranzactii.seteaza_randuri(randuri, (pagina - 1) * PAGINA_TRANZACTII)
+            self.btn_tr_anterior.setEnabled(pagina > 1)
+            self.btn_tr_urmator.setEnabled(are_urmatoare)
+            text = f"Pagina {pagina}"
+            if self._estimare_tr is not None:
+                text += " · " + text_estimare(self._estimare_tr, "tranzacții")
+            self.lbl_tr_pagina.setText(text)
+
+        self.sarcini.porneste(
+            "pagina_tranzactii", incarca, gata, self.arata_eroare_sql, "Încărcare tranzacții"
+        )
 
     # ===== TAB REGULI ================================================
     def build_tab_reguli(self):
@@ -399,7 +4794,12 @@ class MoldelectricaApp(QMainWindow):
 
         self.reg_descriere = QLineEdit()
         self.reg_tip_criteriu = QLineEdit()
+        self.reg_tip_criteriu.setPlaceholderText(" / ".join(CRITERII_REPARTIZARE))
         self.reg_valoare = QLineEdit()
+        self.reg_valoare.setPlaceholderText(
+            "ex: Cheltuială · CR002 · 1000..5000 · 2025-01..2025-03 · transport · "
+            "Tip_Operatiune=Cheltuială & Suma=1000.."
+        )
         self.reg_procent = QDoubleSpinBox()
         self.reg_procent.setRange(0, 100)
         self.reg_procent.setDecimals(2)
@@ -412,6 +4812,9 @@ class MoldelectricaApp(QMainWindow):
         add_row("Tip criteriu:", self.reg_tip_criteriu)
         add_row("Valoare criteriu:", self.reg_valoare)
         add_row("Procent repartizare:", self.reg_procent)
+        self.reg_centre_tinta = QLineEdit()
+        self.reg_centre_tinta.setPlaceholderText("ex: CR002:60, CR003:40 (gol = centrul tranzacției)")
+        add_row("Centre țintă (pondere):", self.reg_centre_tinta)
 
         self.btn_add_regula = QPushButton("Adaugă regulă")
         self.btn_add_regula.clicked.connect(self.adauga_regula)
@@ -425,8 +4828,10 @@ class MoldelectricaApp(QMainWindow):
         form.addLayout(left, 3)
         form.addLayout(right, 1)
 
-        self.table_reguli = QTableWidget()
-        self.table_reguli.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table_reguli, self.model_reguli = tabel_virtual(
+            ["ID", "Descriere", "Tip criteriu", "Valoare", "Procent"], sarcini=self.sarcini
+        )
+        self.model_reguli.eroare.connect(self.arata_eroare_sql)
 
         layout.addLayout(form)
         layout.addWidget(QLabel("Reguli definite:"))
@@ -444,19 +4849,30 @@ class MoldelectricaApp(QMainWindow):
         if not descr or not tipc:
             QMessageBox.warning(self, "Eroare", "Descriere și tip criteriu sunt obligatorii.")
             return
-
-        id_reg = ("RG" + datetime.now().strftime("%Y%m%d%H%M%S"))[-13:]
+        try:
+            parseaza_criteriu(tipc, valc)
+            tinte = parseaza_centre_tinta(self.reg_centre_tinta.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Eroare", str(e))
+            return
+        if not all(self.centru_valid(centru) for centru, _ in tinte):
+            return
 
         try:
-            exec_query(
-                """
-                INSERT INTO ReguliRepartizare
-                (ID_Regula, Descriere_Regula, Tip_Criteriu, Valoare_Criteriu, Procent_Repartizare)
-                VALUES (?,?,?,?,?)
-                """,
-                (id_reg, descr, tipc, valc or None, proc),
-                fetch=False
-            )
+            id_reg = ID_GEN.next("RG")
+            with tranzactie():
+                exec_query(
+                    """
+                    INSERT INTO ReguliRepartizare
+                    (ID_Regula, Descriere_Regula, Tip_Criteriu, Valoare_Criteriu, Procent_Repartizare)
+                    VALUES (?,?,?,?,?)
+                    """,
+                    (id_reg, descr, tipc, valc or None, proc),
+                    fetch=False
+                )
+                if tinte:
+                    seteaza_centre_tinta(id_reg, tinte)
+            CACHE_REF.invalideaza("reguli")
             self.log_actiune("Adaugare", f"Regulă {id_reg} adăugată")
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
@@ -467,28 +4883,16 @@ class MoldelectricaApp(QMainWindow):
 
     def incarca_reguli(self):
         try:
-            rows = exec_query(
-                """
-                SELECT ID_Regula, Descriere_Regula, Tip_Criteriu,
-                       Valoare_Criteriu, Procent_Repartizare
-                FROM ReguliRepartizare
-                """,
-                fetch=True
-            ) or []
+            self.model_reguli.seteaza_sursa(SursaKeyset(
+                "ReguliRepartizare",
+                ["ID_Regula", "Descriere_Regula", "Tip_Criteriu",
+                 "Valoare_Criteriu", "Procent_Repartizare"],
+                chei=["ID_Regula"]
+            ))
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
             return
 
-        header = ["ID", "Descriere", "Tip criteriu", "Valoare", "Procent"]
-        self.table_reguli.setRowCount(len(rows))
-        self.table_reguli.setColumnCount(len(header))
-        self.table_reguli.setHorizontalHeaderLabels(header)
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                self.table_reguli.setItem(
-                    r, c, QTableWidgetItem("" if val is None else str(val))
-                )
-
     # ===== TAB BUGETE ================================================
     def build_tab_bugete(self):
         layout = QVBoxLayout()
@@ -497,13 +4901,11 @@ class MoldelectricaApp(QMainWindow):
         right = QVBoxLayout()
 
         self.buget_centru = QLineEdit()
+        self.buget_centru.setCompleter(self.completer(self.sugestii_centre))
         self.buget_an = QLineEdit()
         self.buget_suma_aloc = QDoubleSpinBox()
         self.buget_suma_aloc.setRange(0, 1_000_000_000)
         self.buget_suma_aloc.setDecimals(2)
-        self.buget_suma_eff = QDoubleSpinBox()
-        self.buget_suma_eff.setRange(0, 1_000_000_000)
-        self.buget_suma_eff.setDecimals(2)
 
         def add_row(lbl, w):
             left.addWidget(QLabel(lbl))
@@ -512,7 +4914,7 @@ class MoldelectricaApp(QMainWindow):
         add_row("ID centru responsabil:", self.buget_centru)
         add_row("An buget:", self.buget_an)
         add_row("Sumă alocată:", self.buget_suma_aloc)
-        add_row("Sumă efectiv cheltuită:", self.buget_suma_eff)
+        left.addWidget(QLabel("Suma efectiv cheltuită: din cheltuielile centrului în anul bugetului."))
 
         self.btn_save_buget = QPushButton("Salvează buget")
         self.btn_save_buget.clicked.connect(self.salveaza_buget)
@@ -526,8 +4928,10 @@ class MoldelectricaApp(QMainWindow):
         form.addLayout(left, 3)
         form.addLayout(right, 1)
 
-        self.table_bugete = QTableWidget()
-        self.table_bugete.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table_bugete, self.model_bugete = tabel_virtual(
+            ["ID", "Centru", "An", "Alocată", "Efectiv", "Status"], culoare_status_buget, sarcini=self.sarcini
+        )
+        self.model_bugete.eroare.connect(self.arata_eroare_sql)
 
         layout.addLayout(form)
         layout.addWidget(QLabel("Situație bugete:"))
@@ -540,32 +4944,19 @@ class MoldelectricaApp(QMainWindow):
         centru = self.buget_centru.text().strip()
         an = self.buget_an.text().strip()
         suma_aloc = self.buget_suma_aloc.value()
-        suma_eff = self.buget_suma_eff.value()
 
         if not centru or not an:
             QMessageBox.warning(self, "Eroare", "Centru și an sunt obligatorii.")
             return
-
-        status = "In limita"
-        if suma_eff > suma_aloc:
-            status = "Depasit"
-        elif suma_eff < suma_aloc * 0.5:
-            status = "Subutilizat"
-
-        id_b = ("BG" + datetime.now().strftime("%Y%m%d%H%M%S"))[-13:]
+        if not self.centru_valid(centru):
+            return
 
         try:
-            exec_query(
-                """
-                INSERT INTO Bugete
-                (ID_Buget, ID_CentruResponsabil, An_Buget,
-                 Suma_Alocata, Suma_EfectivaCheltuita, Status_Executie)
-                VALUES (?,?,?,?,?,?)
-                """,
-                (id_b, centru, an, suma_aloc, suma_eff, status),
-                fetch=False
-            )
+            id_b = adauga_buget(centru, an, suma_aloc)
             self.log_actiune("Adaugare", f"Buget {id_b} adăugat")
+        except ValueError as e:
+            QMessageBox.warning(self, "Eroare", str(e))
+            return
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
             return
@@ -575,139 +4966,163 @@ class MoldelectricaApp(QMainWindow):
 
     def incarca_bugete(self):
         try:
-            rows = exec_query(
-                """
-                SELECT ID_Buget, ID_CentruResponsabil, An_Buget,
-                       Suma_Alocata, Suma_EfectivaCheltuita, Status_Executie
-                FROM Bugete
-                """,
-                fetch=True
-            ) or []
+            self.model_bugete.seteaza_sursa(SursaKeyset(
+                "Bugete",
+                ["ID_Buget", "ID_CentruResponsabil", "An_Buget",
+                 "Suma_Alocata", "Suma_EfectivaCheltuita", "Status_Executie"],
+                chei=["ID_Buget"]
+            ))
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
             return
 
-        header = ["ID", "Centru", "An", "Alocată", "Efectiv", "Status"]
-        self.table_bugete.setRowCount(len(rows))
-        self.table_bugete.setColumnCount(len(header))
-        self.table_bugete.setHorizontalHeaderLabels(header)
-
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                item = QTableWidgetItem("" if val is None else str(val))
-                if c == 5:
-                    if val == "Depasit":
-                        item.setBackground(QColor(255, 182, 193))
-                    elif val == "Subutilizat":
-                        item.setBackground(QColor(255, 255, 141))
-                self.table_bugete.setItem(r, c, item)
-
     # ===== TAB REPARTIZARE AUTOMATA ==================================
     def build_tab_repartizare(self):
         layout = QVBoxLayout()
         top = QHBoxLayout()
 
-        self.btn_repartizeaza = QPushButton("Repartizează toate tranzacțiile")
+        self.btn_repartizeaza = QPushButton("Repartizează tranzacțiile noi")
         self.btn_repartizeaza.clicked.connect(self.ruleaza_repartizare)
+        self.btn_repartizeaza_tot = QPushButton("Repartizează toate tranzacțiile")
+        self.btn_repartizeaza_tot.clicked.connect(
+            lambda: self.ruleaza_repartizare(completa=True)
+        )
         btn_reload = QPushButton("Reîncarcă repartizări")
         btn_reload.clicked.connect(self.incarca_repartizari)
 
         top.addWidget(self.btn_repartizeaza)
+        top.addWidget(self.btn_repartizeaza_tot)
         top.addWidget(btn_reload)
         top.addStretch()
 
-        self.table_repartizari = QTableWidget()
-        self.table_repartizari.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table_repartizari, self.model_repartizari = tabel_virtual(
+            ["ID Repartizare", "ID Tranzacție", "Centru", "Procent", "Coeficient", "Sumă"],
+            sarcini=self.sarcini
+        )
+        self.model_repartizari.eroare.connect(self.arata_eroare_sql)
+
+        # simulare: reguli candidate evaluate in memorie, fara scriere in baza
+        sim = QHBoxLayout()
+        self.sim_perioada = QLineEdit(str(QDate.currentDate().year()))
+        self.sim_perioada.setPlaceholderText("AAAA, AAAA-LL sau AAAAQn")
+        self.sim_perioada.setMaximumWidth(140)
+        btn_preia = QPushButton("Preia regulile curente")
+        btn_preia.clicked.connect(self.preia_reguli_simulare)
+        btn_simuleaza = QPushButton("Simulează")
+        btn_simuleaza.clicked.connect(self.simuleaza_reguli)
+        self.lbl_simulare = QLabel()
+        for w in (QLabel("Perioada:"), self.sim_perioada, btn_preia, btn_simuleaza, self.lbl_simulare):
+            sim.addWidget(w)
+        sim.addStretch()
+
+        zona_sim = QHBoxLayout()
+        self.sim_reguli = QTextEdit()
+        self.sim_reguli.setPlaceholderText(
+            "O regulă pe linie: Tip_Criteriu; Valoare; Procent; Descriere; Centre țintă\n"
+            "ex: Centru; CR002; 40; Cheltuieli transport\n"
+            "    Compus; Descriere=motorină & Suma=..5000; 25; Combustibil; CR002:2, CR003:1"
+        )
+        self.table_simulare, self.model_simulare = tabel_virtual(
+            ["Centru", "Simulat", "Repartizări simulate", "Actual", "Repartizări actuale", "Diferență"]
+        )
+        zona_sim.addWidget(self.sim_reguli, 2)
+        zona_sim.addWidget(self.table_simulare, 3)
+        self._date_simulare = None
 
         layout.addLayout(top)
         layout.addWidget(QLabel("Repartizări generate (ID tranzacție -> centre):"))
-        layout.addWidget(self.table_repartizari)
+        layout.addWidget(self.table_repartizari, 3)
+        layout.addWidget(QLabel("Simulare reguli (nu modifică repartizările):"))
+        layout.addLayout(sim)
+        layout.addLayout(zona_sim, 2)
 
         self.tab_repartizare.setLayout(layout)
         self.incarca_repartizari()
 
-    def ruleaza_repartizare(self):
-        """
-        Algoritm simplificat:
-         - pentru fiecare tranzactie,
-         - cautam reguli care se potrivesc
-           Tip_Criteriu = 'Tip_Operatiune'  si Valoare_Criteriu = Tip_Operatiune
-           sau
-           Tip_Criteriu = 'Centru'          si Valoare_Criteriu = ID_CentruResponsabil
-         - pentru fiecare regula potrivita inseram in Repartizari
-        """
+    def preia_reguli_simulare(self):
         try:
-            tranzactii = exec_query(
-                "SELECT ID_Transactie, Tip_Operatiune, ID_CentruResponsabil FROM Tranzactii",
-                fetch=True
-            ) or []
-            reguli = exec_query(
-                "SELECT ID_Regula, Descriere_Regula, Tip_Criteriu, Valoare_Criteriu, Procent_Repartizare FROM ReguliRepartizare",
-                fetch=True
-            ) or []
+            reguli = citeste_reguli()
+            tinte = citeste_centre_tinta()
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
             return
+        self.sim_reguli.setPlainText("\n".join(
+            f"{tip_c}; {val_c or ''}; {procent}; {descriere}"
+            + (f"; {text_centre_tinta(tinte[id_reg.strip()])}" if id_reg.strip() in tinte else "")
+            for id_reg, descriere, tip_c, val_c, procent in reguli
+        ))
+
+    def simuleaza_reguli(self):
+        perioada = self.sim_perioada.text().strip()
+        try:
+            interval_perioada(perioada)
+            reguli, tinte = reguli_din_text(self.sim_reguli.toPlainText())
+        except ValueError as e:
+            QMessageBox.warning(self, "Simulare", str(e))
+            return
 
-        cnt = 0
-        for tr in tranzactii:
-            id_tr, tip_op, centru_tr = tr
-            for reg in reguli:
-                _, _, tip_c, val_c, procent = reg
-                aplica = False
-                if tip_c == "Tip_Operatiune" and val_c == tip_op:
-                    aplica = True
-                elif tip_c == "Centru" and centru_tr is not None and val_c == centru_tr:
-                    aplica = True
-
-                if aplica:
-                    id_rep = ("RP" + datetime.now().strftime("%Y%m%d%H%M%S") + f"{cnt:02d}")[-13:]
-                    try:
-                        exec_query(
-                            """
-                            INSERT INTO Repartizari
-                            (ID_Repartizare, ID_Transactie, ID_CentruResponsabil,
-                             Procent_Repartizare, Coeficient)
-                            VALUES (?,?,?,?,?)
-                            """,
-                            (id_rep, id_tr, centru_tr or "CR001", procent, 1.00),
-                            fetch=False
-                        )
-                        cnt += 1
-                    except Exception:
-                        # daca exista deja o repartizare similara, ignoram
-                        pass
-
-        self.log_actiune("Repartizare", f"Repartizare automată rulată; {cnt} înregistrări.")
-        QMessageBox.information(self, "OK", f"Repartizare finalizată. Înregistrări noi: {cnt}")
-        self.incarca_repartizari()
+        # datele perioadei se refolosesc pentru seturi succesive de reguli
+        date_sim = self._date_simulare
+        if date_sim is not None and (date_sim.perioada != perioada
+                                     or time.monotonic() - date_sim.incarcat > CACHE_TTL):
+            date_sim = None
+
+        def ruleaza(progres):
+            incarcate = date_sim or DateSimulare.incarca(perioada, progres=progres)
+            start = time.perf_counter()
+            rezultat = simuleaza_repartizare(incarcate, reguli, tinte)
+            return incarcate, rezultat, time.perf_counter() - start
+
+        def gata(rezultat):
+            incarcate, randuri, durata = rezultat
+            self._date_simulare = incarcate
+            self.model_simulare.seteaza_randuri(randuri)
+            simulat = sum(r[1] for r in randuri)
+            actual = sum(r[3] for r in randuri)
+            self.lbl_simulare.setText(
+                f"{len(incarcate)} tranzacții · simulat {simulat:,.2f} · actual {actual:,.2f} · "
+                f"diferență {simulat - actual:,.2f} · evaluare {durata * 1000:.0f} ms"
+            )
+
+        self.ruleaza_in_fundal("simulare", "Simulare repartizare", ruleaza, gata)
+
+    def ruleaza_repartizare(self, completa=False):
+        """
+        Repartizeaza tranzactiile dupa regulile definite (criteriile sunt
+        descrise la CRITERII_REPARTIZARE: tip operatiune, centru, interval de
+        suma sau de data, cuvant/expresie in descriere, combinatii cu &).
+        Partea fiecarei reguli merge la centrul tranzactiei sau se imparte
+        intre centrele tinta ale regulii.
+        Implicit doar tranzactiile noi si regulile modificate de la ultima rulare
+        (repartizeaza_incremental); `completa` reia toate tranzactiile.
+        """
+        mod = "completă" if completa else "incrementală"
+
+        def ruleaza(progres):
+            if completa:
+                return repartizeaza_tranzactii(progres=progres)
+            return repartizeaza_incremental(progres=progres)
+
+        def gata(cnt):
+            self.log_actiune("Repartizare", f"Repartizare {mod} rulată; {cnt} înregistrări.")
+            QMessageBox.information(self, "OK", f"Repartizare finalizată. Înregistrări noi: {cnt}")
+            self.incarca_repartizari()
+
+        # o singura cheie: repartizarea completa si cea incrementala nu ruleaza simultan
+        self.ruleaza_in_fundal("repartizare", f"Repartizare {mod}", ruleaza, gata)
 
     def incarca_repartizari(self):
         try:
-            rows = exec_query(
-                """
-                SELECT R.ID_Repartizare, R.ID_Transactie, R.ID_CentruResponsabil,
-                       R.Procent_Repartizare, R.Coeficient
-                FROM Repartizari R
-                ORDER BY R.ID_Transactie
-                """,
-                fetch=True
-            ) or []
+            self.model_repartizari.seteaza_sursa(SursaKeyset(
+                "Repartizari",
+                ["ID_Repartizare", "ID_Transactie", "ID_CentruResponsabil",
+                 "Procent_Repartizare", "Coeficient", "Suma_Repartizata"],
+                chei=["ID_Transactie", "ID_Repartizare"]
+            ))
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
             return
 
-        header = ["ID Repartizare", "ID Tranzacție", "Centru", "Procent", "Coeficient"]
-        self.table_repartizari.setRowCount(len(rows))
-        self.table_repartizari.setColumnCount(len(header))
-        self.table_repartizari.setHorizontalHeaderLabels(header)
-
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                self.table_repartizari.setItem(
-                    r, c, QTableWidgetItem("" if val is None else str(val))
-                )
-
     # ===== TAB EXPORT =================================================
     def build_tab_export(self):
         layout = QVBoxLayout()
@@ -716,16 +5131,22 @@ class MoldelectricaApp(QMainWindow):
         self.export_sistem = QComboBox()
         self.export_sistem.addItems(["1C Contabilitate", "SAP Financials", "M-EnergoSoft"])
 
-        self.btn_gen_export = QPushButton("Generează export pentru toate tranzacțiile")
+        self.export_doar_noi = QCheckBox("Doar tranzacțiile neexportate")
+        self.export_doar_noi.setChecked(True)
+
+        self.btn_gen_export = QPushButton("Generează export")
         self.btn_gen_export.clicked.connect(self.genereaza_export)
 
         top.addWidget(QLabel("Sistem contabil:"))
         top.addWidget(self.export_sistem)
+        top.addWidget(self.export_doar_noi)
         top.addWidget(self.btn_gen_export)
         top.addStretch()
 
-        self.table_export = QTableWidget()
-        self.table_export.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table_export, self.model_export = tabel_virtual(
+            ["ID Export", "ID Tranzacție", "Sistem", "Data", "Sumă"], sarcini=self.sarcini
+        )
+        self.model_export.eroare.connect(self.arata_eroare_sql)
 
         layout.addLayout(top)
         layout.addWidget(QLabel("Istoric exporturi:"))
@@ -736,64 +5157,35 @@ class MoldelectricaApp(QMainWindow):
 
     def genereaza_export(self):
         sistem = self.export_sistem.currentText()
-        today = datetime.now().strftime("%Y-%m-%d")
-
-        try:
-            tranzactii = exec_query(
-                "SELECT ID_Transactie, Suma FROM Tranzactii",
-                fetch=True
-            ) or []
-        except Exception as e:
-            QMessageBox.critical(self, "Eroare SQL", str(e))
-            return
-
-        cnt = 0
-        for tr in tranzactii:
-            id_tr, suma = tr
-            id_ex = ("EX" + datetime.now().strftime("%Y%m%d%H%M%S") + f"{cnt:02d}")[-13:]
-            try:
-                exec_query(
-                    """
-                    INSERT INTO Exporturi
-                    (ID_Export, ID_Transactie, Sistem_Export, Data_Exportata, Suma_Exportata)
-                    VALUES (?,?,?,?,?)
-                    """,
-                    (id_ex, id_tr, sistem, today, suma),
-                    fetch=False
-                )
-                cnt += 1
-            except Exception:
-                pass
+        doar_noi = self.export_doar_noi.isChecked()
 
-        self.log_actiune("Export", f"Export {sistem} generat; {cnt} înregistrări.")
-        QMessageBox.information(self, "OK", f"Export generat ({cnt} rânduri).")
-        self.incarca_exporturi()
+        def gata(rezultat):
+            cnt, cale = rezultat
+            if not cnt:
+                QMessageBox.information(self, "OK", "Nu există tranzacții noi de exportat.")
+                return
+            self.log_actiune("Export", f"Export {sistem} generat; {cnt} înregistrări.")
+            QMessageBox.information(self, "OK", f"Export generat ({cnt} rânduri):\n{os.path.abspath(cale)}")
+            self.incarca_exporturi()
+
+        self.ruleaza_in_fundal(
+            "export", f"Export {sistem}",
+            lambda progres: exporta_tranzactii(sistem, doar_neexportate=doar_noi, progres=progres),
+            gata
+        )
 
     def incarca_exporturi(self):
         try:
-            rows = exec_query(
-                """
-                SELECT ID_Export, ID_Transactie, Sistem_Export, Data_Exportata, Suma_Exportata
-                FROM Exporturi
-                ORDER BY Data_Exportata DESC
-                """,
-                fetch=True
-            ) or []
+            self.model_export.seteaza_sursa(SursaKeyset(
+                "Exporturi",
+                ["ID_Export", "ID_Transactie", "Sistem_Export",
+                 "Data_Exportata", "Suma_Exportata"],
+                chei=["Data_Exportata", "ID_Export"], desc=True
+            ))
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
             return
 
-        header = ["ID Export", "ID Tranzacție", "Sistem", "Data", "Sumă"]
-        self.table_export.setRowCount(len(rows))
-        self.table_export.setColumnCount(len(header))
-        self.table_export.setHorizontalHeaderLabels(header)
-
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                self.table_export.setItem(
-                    r, c, QTableWidgetItem("" if val is None else str(val))
-                )
-
     # ===== TAB ANGAJATI & SALARII ====================================
     def build_tab_angajati(self):
         layout = QVBoxLayout()
@@ -854,8 +5246,10 @@ class MoldelectricaApp(QMainWindow):
         form.addLayout(left, 3)
         form.addLayout(right, 2)
 
-        self.table_angajati = QTableWidget()
-        self.table_angajati.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table_angajati, self.model_angajati = tabel_virtual(
+            ["IDNP", "Nume", "Prenume", "Funcție", "Data angajării", "Salariu bază"], sarcini=self.sarcini
+        )
+        self.model_angajati.eroare.connect(self.arata_eroare_sql)
 
         layout.addLayout(form)
         layout.addWidget(QLabel("Lista angajaților:"))
@@ -898,25 +5292,16 @@ class MoldelectricaApp(QMainWindow):
 
     def incarca_angajati(self):
         try:
-            rows = exec_query(
-                "SELECT IDNP, Nume, Prenume, Functie, Data_Angajarii, Salariu_Baza FROM Angajati",
-                fetch=True
-            ) or []
+            self.model_angajati.seteaza_sursa(SursaKeyset(
+                "Angajati",
+                ["IDNP", "Nume", "Prenume", "Functie",
+                 "Data_Angajarii", "Salariu_Baza"],
+                chei=["IDNP"]
+            ))
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
             return
 
-        header = ["IDNP", "Nume", "Prenume", "Funcție", "Data angajării", "Salariu bază"]
-        self.table_angajati.setRowCount(len(rows))
-        self.table_angajati.setColumnCount(len(header))
-        self.table_angajati.setHorizontalHeaderLabels(header)
-
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                self.table_angajati.setItem(
-                    r, c, QTableWidgetItem("" if val is None else str(val))
-                )
-
     def calculeaza_salariu(self):
         idnp = self.calc_idnp.text().strip()
         luna = self.calc_luna.text().strip()
@@ -944,8 +5329,8 @@ class MoldelectricaApp(QMainWindow):
         # calcul simplu: salariu_baza / 168 * ore_lucrate
         salariu_calc = round(float(salariu_baza) / 168 * ore, 2)
 
-        id_calc = ("CS" + datetime.now().strftime("%Y%m%d%H%M%S"))[-13:]
         try:
+            id_calc = ID_GEN.next("CS")
             exec_query(
                 """
                 INSERT INTO CalculSalarii
@@ -1001,8 +5386,10 @@ class MoldelectricaApp(QMainWindow):
         form.addLayout(left, 3)
         form.addLayout(right, 1)
 
-        self.table_programari = QTableWidget()
-        self.table_programari.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table_programari, self.model_programari = tabel_virtual(
+            ["ID Programare", "ID Client", "Data", "Ora", "Serviciu", "Responsabil"], sarcini=self.sarcini
+        )
+        self.model_programari.eroare.connect(self.arata_eroare_sql)
 
         layout.addLayout(form)
         layout.addWidget(QLabel("Lista programărilor:"))
@@ -1022,9 +5409,8 @@ class MoldelectricaApp(QMainWindow):
             QMessageBox.warning(self, "Eroare", "Toate câmpurile sunt obligatorii.")
             return
 
-        id_prog = ("PG" + datetime.now().strftime("%Y%m%d%H%M%S"))[-13:]
-
         try:
+            id_prog = ID_GEN.next("PG")
             exec_query(
                 """
                 INSERT INTO Programari
@@ -1044,147 +5430,304 @@ class MoldelectricaApp(QMainWindow):
 
     def incarca_programari(self):
         try:
-            rows = exec_query(
-                """
-                SELECT ID_Programare, ID_Client, Data_Programarii,
-                       Ora_Programarii, Serviciu, Responsabil
-                FROM Programari
-                ORDER BY Data_Programarii DESC
-                """,
-                fetch=True
-            ) or []
+            self.model_programari.seteaza_sursa(SursaKeyset(
+                "Programari",
+                ["ID_Programare", "ID_Client", "Data_Programarii",
+                 "Ora_Programarii", "Serviciu", "Responsabil"],
+                chei=["Data_Programarii", "ID_Programare"], desc=True
+            ))
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
             return
 
-        header = ["ID Programare", "ID Client", "Data", "Ora", "Serviciu", "Responsabil"]
-        self.table_programari.setRowCount(len(rows))
-        self.table_programari.setColumnCount(len(header))
-        self.table_programari.setHorizontalHeaderLabels(header)
-
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                self.table_programari.setItem(
-                    r, c, QTableWidgetItem("" if val is None else str(val))
-                )
-
     # ===== TAB RAPOARTE ==============================================
     def build_tab_rapoarte(self):
         layout = QVBoxLayout()
         top = QHBoxLayout()
 
         self.rap_tip = QComboBox()
-        self.rap_tip.addItems([
-            "Venituri/Cheltuieli pe perioadă",
-            "Bugete pe centre",
-        ])
+        self.rap_tip.addItems(list(TIPURI_RAPORT))
         self.rap_perioada = QLineEdit()
-        self.rap_perioada.setPlaceholderText("ex: 2025-01 sau 2025")
+        self.rap_perioada.setPlaceholderText("ex: 2025, 2025-01 sau 2025Q1")
+        self.rap_centru = QLineEdit()
+        self.rap_centru.setPlaceholderText("Centru (opțional)")
+        self.rap_centru.setCompleter(self.completer(self.sugestii_centre))
+        self.rap_format = QComboBox()
+        self.rap_format.addItems(list(FORMATE_RAPORT))
 
         btn_gen = QPushButton("Generează raport")
         btn_gen.clicked.connect(self.genereaza_raport)
+        btn_fisier = QPushButton("Salvează fișier")
+        btn_fisier.clicked.connect(self.salveaza_raport)
 
-        top.addWidget(QLabel("Tip raport:"))
-        top.addWidget(self.rap_tip)
-        top.addWidget(QLabel("Perioadă:"))
-        top.addWidget(self.rap_perioada)
-        top.addWidget(btn_gen)
+        for w in (QLabel("Tip raport:"), self.rap_tip, QLabel("Perioadă:"), self.rap_perioada,
+                  self.rap_centru, btn_gen, QLabel("Format:"), self.rap_format, btn_fisier):
+            top.addWidget(w)
         top.addStretch()
 
-        self.rap_view = QTextEdit()
-        self.rap_view.setReadOnly(True)
+        # previzualizare pe pagini; raportul complet merge doar in fisier
+        self.rap_table, self.model_raport = tabel_virtual([])
+        nav = QHBoxLayout()
+        self.btn_rap_anterior = QPushButton("◀ Pagina anterioară")
+        self.btn_rap_anterior.clicked.connect(lambda: self._arata_pagina_raport(self._rap_pagina - 1))
+        self.btn_rap_urmator = QPushButton("Pagina următoare ▶")
+        self.btn_rap_urmator.clicked.connect(lambda: self._arata_pagina_raport(self._rap_pagina + 1))
+        self.lbl_rap_pagina = QLabel()
+        nav.addWidget(self.btn_rap_anterior)
+        nav.addWidget(self.lbl_rap_pagina)
+        nav.addStretch()
+        nav.addWidget(self.btn_rap_urmator)
+        self.btn_rap_anterior.setEnabled(False)
+        self.btn_rap_urmator.setEnabled(False)
+
+        self._rap_cerere = None   # (tip, perioada, centru) previzualizat
+        self._rap_pagina = 1
 
         layout.addLayout(top)
-        layout.addWidget(self.rap_view)
+        layout.addWidget(self.rap_table)
+        layout.addLayout(nav)
         self.tab_rapoarte.setLayout(layout)
 
-    def genereaza_raport(self):
-        tip = self.rap_tip.currentText()
+    def cerere_raport(self):
+        """(tip, perioada, centru) din formular sau None, cu mesaj, daca nu e valid."""
         perioada = self.rap_perioada.text().strip()
+        centru = self.rap_centru.text().strip() or None
+        try:
+            interval_perioada(perioada)
+        except ValueError as e:
+            QMessageBox.warning(self, "Eroare", str(e))
+            return None
+        if centru and not self.centru_valid(centru):
+            return None
+        return self.rap_tip.currentText(), perioada, centru
 
-        if "Venituri/Cheltuieli" in tip:
-            cond = ""
-            params = ()
-            if len(perioada) == 4:
-                cond = "WHERE YEAR(Data_Operatiune) = ?"
-                params = (int(perioada),)
-            elif len(perioada) == 7 and "-" in perioada:
-                an, luna = perioada.split("-")
-                cond = "WHERE YEAR(Data_Operatiune)=? AND MONTH(Data_Operatiune)=?"
-                params = (int(an), int(luna))
-
-            query = f"""
-                SELECT Tip_Operatiune, SUM(Suma)
-                FROM Tranzactii
-                {cond}
-                GROUP BY Tip_Operatiune
-            """
-            try:
-                rows = exec_query(query, params, fetch=True) or []
-            except Exception as e:
-                QMessageBox.critical(self, "Eroare SQL", str(e))
-                return
-            lines = [f"{r[0]}: {r[1]:.2f} MDL" for r in rows]
-            if not lines:
-                lines = ["Nu există tranzacții pentru perioada selectată."]
-            self.rap_view.setPlainText("\n".join(lines))
+    def genereaza_raport(self):
+        cerere = self.cerere_raport()
+        if cerere is None:
+            return
+        self._rap_cerere = cerere
+        self._arata_pagina_raport(1)
 
-        elif "Bugete" in tip:
-            try:
-                rows = exec_query(
-                    "SELECT ID_CentruResponsabil, An_Buget, Suma_Alocata, Suma_EfectivaCheltuita, Status_Executie FROM Bugete",
-                    fetch=True
-                ) or []
-            except Exception as e:
-                QMessageBox.critical(self, "Eroare SQL", str(e))
+    def _arata_pagina_raport(self, pagina):
+        if self._rap_cerere is None or pagina < 1:
+            return
+        cerere = self._rap_cerere
+        _, antet, _, fara_date = tip_raport(cerere[0])
+
+        def gata(rezultat):
+            randuri, are_urmatoare = rezultat
+            if cerere != self._rap_cerere:
                 return
-            lines = []
-            for r in rows:
-                lines.append(
-                    f"Centru {r[0]} | An {r[1]} | Alocat {r[2]:.2f} | Efectiv {r[3]:.2f} | Status {r[4]}"
-                )
-            if not lines:
-                lines = ["Nu există bugete introduse."]
-            self.rap_view.setPlainText("\n".join(lines))
+            self._rap_pagina = pagina
+            self.model_raport.seteaza_randuri(
+                [tuple(_valoare_raport(v) for v in r) for r in randuri],
+                (pagina - 1) * RAPORT_PAGINA, antet
+            )
+            self.btn_rap_anterior.setEnabled(pagina > 1)
+            self.btn_rap_urmator.setEnabled(are_urmatoare)
+            self.lbl_rap_pagina.setText(
+                f"Pagina {pagina}" if randuri or pagina > 1 else fara_date
+            )
+
+        self.ruleaza_in_fundal(
+            "raport", "Generare raport",
+            lambda progres: pagina_raport(*cerere, pagina=pagina),
+            gata
+        )
+
+    def salveaza_raport(self):
+        cerere = self.cerere_raport()
+        if cerere is None:
+            return
+        tip, perioada, centru = cerere
+        format_fisier = self.rap_format.currentText()
+        id_utilizator = self.user_info["id"]
+
+        def gata(rezultat):
+            cnt, cale = rezultat
+            self.log_actiune("Raport", f"Raport {tip_raport(tip)[0]} {perioada or 'toate'} "
+                                       f"{format_fisier}; {cnt} rânduri.")
+            QMessageBox.information(self, "OK", f"Raport salvat ({cnt} rânduri):\n{os.path.abspath(cale)}")
+
+        self.ruleaza_in_fundal(
+            "raport_fisier", "Salvare raport",
+            lambda progres: genereaza_fisier_raport(
+                tip, perioada, format_fisier, centru, id_utilizator, progres=progres
+            ),
+            gata
+        )
 
     # ===== TAB AUDIT =================================================
     def build_tab_audit(self):
         layout = QVBoxLayout()
-        self.audit_table = QTableWidget()
-        self.audit_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
 
-        btn_reload = QPushButton("Reîncarcă jurnal")
+        filtre = QHBoxLayout()
+        self.aud_utilizator = QLineEdit()
+        self.aud_utilizator.setPlaceholderText("ID utilizator")
+        self.aud_utilizator.setCompleter(self.completer(self.sugestii_utilizatori))
+        self.aud_tip = QComboBox()
+        self.aud_tip.addItems(["Toate"] + TIPURI_ACTIUNE)
+        self.aud_de_la_activ = QCheckBox("De la:")
+        self.aud_de_la = QDateEdit()
+        self.aud_de_la.setCalendarPopup(True)
+        self.aud_de_la.setDate(QDate.currentDate().addDays(-7))
+        self.aud_pana_la_activ = QCheckBox("Până la:")
+        self.aud_pana_la = QDateEdit()
+        self.aud_pana_la.setCalendarPopup(True)
+        self.aud_pana_la.setDate(QDate.currentDate())
+        self.aud_text = QLineEdit()
+        self.aud_text.setPlaceholderText("Text în descriere")
+        self.aud_arhiva = QCheckBox("Include arhiva")
+
+        btn_reload = QPushButton("Aplică filtre")
         btn_reload.clicked.connect(self.incarca_audit)
+        btn_reset = QPushButton("Resetează")
+        btn_reset.clicked.connect(self.reseteaza_filtre_audit)
+        btn_export = QPushButton("Export CSV")
+        btn_export.clicked.connect(self.exporta_audit_csv)
+
+        for w in (self.aud_utilizator, QLabel("Acțiune:"), self.aud_tip,
+                  self.aud_de_la_activ, self.aud_de_la, self.aud_pana_la_activ, self.aud_pana_la,
+                  self.aud_text, self.aud_arhiva, btn_reload, btn_reset, btn_export):
+            filtre.addWidget(w)
+        filtre.addStretch()
+
+        self.audit_table, self.model_audit = tabel_virtual(
+            ["ID Log", "Utilizator", "Acțiune", "Data/Ora", "Descriere"], sarcini=self.sarcini
+        )
+        self.model_audit.eroare.connect(self.arata_eroare_sql)
 
-        layout.addWidget(btn_reload)
+        layout.addLayout(filtre)
         layout.addWidget(self.audit_table)
         self.tab_audit.setLayout(layout)
         self.incarca_audit()
 
+    def filtre_audit(self):
+        def data(activ, edit):
+            return edit.date().toPyDate() if activ.isChecked() else None
+
+        return dict(
+            utilizator=self.aud_utilizator.text().strip() or None,
+            tip=None if self.aud_tip.currentIndex() == 0 else self.aud_tip.currentText(),
+            de_la=data(self.aud_de_la_activ, self.aud_de_la),
+            pana_la=data(self.aud_pana_la_activ, self.aud_pana_la),
+            text=self.aud_text.text().strip() or None,
+            arhiva=self.aud_arhiva.isChecked(),
+        )
+
+    def reseteaza_filtre_audit(self):
+        self.aud_utilizator.clear()
+        self.aud_tip.setCurrentIndex(0)
+        self.aud_de_la_activ.setChecked(False)
+        self.aud_pana_la_activ.setChecked(False)
+        self.aud_text.clear()
+        self.aud_arhiva.setChecked(False)
+        self.incarca_audit()
+
     def incarca_audit(self):
         try:
-            rows = exec_query(
-                """
-                SELECT TOP 200 ID_Log, ID_Utilizator, Tip_Actiune, Data_Ora, Descriere
-                FROM LogAudit
-                ORDER BY Data_Ora DESC
-                """,
-                fetch=True
-            ) or []
+            self.model_audit.seteaza_sursa(sursa_audit(**self.filtre_audit()))
         except Exception as e:
             QMessageBox.critical(self, "Eroare SQL", str(e))
             return
 
-        header = ["ID Log", "Utilizator", "Acțiune", "Data/Ora", "Descriere"]
-        self.audit_table.setRowCount(len(rows))
-        self.audit_table.setColumnCount(len(header))
-        self.audit_table.setHorizontalHeaderLabels(header)
+    def exporta_audit_csv(self):
+        filtre = self.filtre_audit()
 
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                self.audit_table.setItem(
-                    r, c, QTableWidgetItem("" if val is None else str(val))
-                )
+        def gata(rezultat):
+            cnt, cale = rezultat
+            self.log_actiune("Export", f"Export jurnal audit; {cnt} înregistrări.")
+            QMessageBox.information(self, "OK", f"Jurnal exportat ({cnt} rânduri):\n{os.path.abspath(cale)}")
+
+        self.ruleaza_in_fundal(
+            "export_audit", "Export jurnal audit",
+            lambda progres: exporta_audit(progres=progres, **filtre),
+            gata
+        )
+
+    # ===== TAB DIAGNOSTIC (ascuns, doar admin) =======================
+    def build_tab_diagnostic(self):
+        layout = QVBoxLayout()
+
+        sus = QHBoxLayout()
+        self.chk_instrumentare = QCheckBox("Instrumentare interogări")
+        self.chk_instrumentare.setChecked(INSTRUMENTARE.activa)
+        self.chk_instrumentare.toggled.connect(
+            lambda activ: INSTRUMENTARE.porneste() if activ else INSTRUMENTARE.opreste()
+        )
+        self.spin_prag_lent = QSpinBox()
+        self.spin_prag_lent.setRange(1, 600_000)
+        self.spin_prag_lent.setSuffix(" ms")
+        self.spin_prag_lent.setValue(int(INSTRUMENTARE.prag_lent * 1000))
+        self.spin_prag_lent.valueChanged.connect(lambda ms: setattr(INSTRUMENTARE, "prag_lent", ms / 1000))
+
+        btn_reload = QPushButton("Reîmprospătează")
+        btn_reload.clicked.connect(self.incarca_diagnostic)
+        btn_reset = QPushButton("Resetează")
+        btn_reset.clicked.connect(self.reseteaza_diagnostic)
+        btn_json = QPushButton("Salvează JSON")
+        btn_json.clicked.connect(self.salveaza_diagnostic)
+
+        for w in (self.chk_instrumentare, QLabel("Prag interogare lentă:"), self.spin_prag_lent,
+                  btn_reload, btn_reset, btn_json):
+            sus.addWidget(w)
+        sus.addStretch()
+
+        self.lbl_diagnostic = QLabel()
+        self.diagnostic_table, self.model_diagnostic = tabel_virtual(
+            ["Interogare", "Apeluri", "Erori", "Total (ms)", "Medie (ms)", "p95 (ms)",
+             "Max (ms)", "Rânduri", "Așteptare conexiune (ms)"]
+        )
+        self.diagnostic_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.diagnostic_table.setColumnWidth(0, 600)
+
+        layout.addLayout(sus)
+        layout.addWidget(self.lbl_diagnostic)
+        layout.addWidget(self.diagnostic_table)
+        self.tab_diagnostic.setLayout(layout)
+
+    def comuta_diagnostic(self):
+        index = self.tabs.indexOf(self.tab_diagnostic)
+        vizibil = not self.tabs.isTabVisible(index)
+        self.tabs.setTabVisible(index, vizibil)
+        if vizibil:
+            self.incarca_diagnostic()
+            self.tabs.setCurrentIndex(index)
+
+    def incarca_diagnostic(self):
+        def ms(secunde):
+            return f"{secunde * 1000:.1f}"
+
+        stare = INSTRUMENTARE.instantaneu()
+        self.model_diagnostic.seteaza_randuri([
+            (i["sql"], i["apeluri"], i["erori"], ms(i["timp_total"]), ms(i["timp_mediu"]),
+             ms(i["p95"]), ms(i["timp_max"]), i["randuri"], ms(i["asteptare_total"] / i["apeluri"]))
+            for i in stare["interogari"]
+        ])
+        pool = stare["pool"]
+        self.lbl_diagnostic.setText(
+            f"Din {stare['de_la']} · {BACKEND.nume} · conexiuni ocupate {pool['ocupate']}/{pool['deschise']} "
+            f"(max {pool['max_size']}) · așteptări {pool['asteptari']}, "
+            f"medie {pool['timp_asteptare_mediu'] * 1000:.1f} ms · "
+            f"interogări lente în {os.path.abspath(INSTRUMENTARE.fisier_lente)}"
+        )
+
+    def reseteaza_diagnostic(self):
+        INSTRUMENTARE.reseteaza()
+        self.incarca_diagnostic()
+
+    def salveaza_diagnostic(self):
+        cale, _ = QFileDialog.getSaveFileName(
+            self, "Salvează diagnosticul", f"diagnostic_{datetime.now():%Y%m%d_%H%M%S}.json", "JSON (*.json)"
+        )
+        if not cale:
+            return
+        try:
+            INSTRUMENTARE.salveaza(cale)
+        except OSError as e:
+            QMessageBox.critical(self, "Eroare", str(e))
+            return
+        self.statusBar().showMessage(f"Diagnostic salvat: {cale}", 5000)
 
 # ===== FEREASTRA LOGIN ==============================================
 class LoginWindow(QWidget):
@@ -1288,19 +5831,7 @@ class LoginWindow(QWidget):
         }
 
         # logam login-ul
-        id_log = ("LG" + datetime.now().strftime("%Y%m%d%H%M%S"))[-13:]
-        try:
-            exec_query(
-                """
-                INSERT INTO LogAudit
-                (ID_Log, ID_Utilizator, Tip_Actiune, Data_Ora, Descriere)
-                VALUES (?,?,?,?,?)
-                """,
-                (id_log, user_info["id"], "Login", datetime.now(), "Autentificare reușită"),
-                fetch=False
-            )
-        except Exception:
-            pass
+        AUDIT.scrie(user_info["id"], "Login", "Autentificare reușită")
 
         self.main = MoldelectricaApp(user_info)
         self.main.show()
@@ -1308,8 +5839,166 @@ class LoginWindow(QWidget):
 
 # ===== MAIN =========================================================
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Moldelectrica - subsistem financiar")
+    parser.add_argument(
+        "--baza", metavar="URL", default=None,
+        help="baza de date: mssql (implicit), odbc:<sir conectare> sau sqlite:<cale> "
+             "(implicit din URSU_BAZA)"
+    )
+    parser.add_argument(
+        "--initializeaza-baza", metavar="SCRIPT", nargs="?", const=SCRIPT_SCHEMA,
+        help=f"(re)creeaza schema din scriptul SQL (implicit {SCRIPT_SCHEMA}); sterge datele existente!"
+    )
+    parser.add_argument(
+        "--instrumentare", metavar="FISIER_JSON", nargs="?", const="diagnostic.json",
+        help="masoara interogarile si scrie statisticile in FISIER_JSON la iesire"
+    )
+    parser.add_argument(
+        "--repartizeaza", action="store_true",
+        help="ruleaza repartizarea incrementala fara interfata (ex. sarcina de noapte)"
+    )
+    parser.add_argument(
+        "--repartizeaza-paralel", action="store_true",
+        help="repartizarea completa pe partitii, in mai multe procese; "
+             "o rulare intrerupta se reia de la partitiile neterminate"
+    )
+    parser.add_argument(
+        "--procese", type=int, default=None,
+        help="numarul de procese pentru --repartizeaza-paralel (implicit numarul de nuclee)"
+    )
+    parser.add_argument(
+        "--partitii", type=int, default=None,
+        help=f"numarul de partitii (implicit {PARTITII_PE_PROCES} pe proces)"
+    )
+    parser.add_argument(
+        "--reconstruieste-totaluri", action="store_true",
+        help="recalculeaza TotaluriPerioada si executia bugetelor din Tranzactii (dupa migrare)"
+    )
+    parser.add_argument(
+        "--completeaza-repartizari", action="store_true",
+        help="scrie suma si data pe repartizarile create inainte de migrarea 11"
+    )
+    parser.add_argument(
+        "--inchide-perioade", metavar="PERIOADA",
+        help="inchide toate perioadele pana la sfarsitul PERIOADEI (ex. 2025-06, 2025Q2, 2025): "
+             "rapoartele lor se servesc din cache, cu versiunea reverificata doar o data la "
+             f"{CACHE_TTL} s"
+    )
+    parser.add_argument(
+        "--verifica-totaluri", action="store_true",
+        help="compara TotaluriPerioada cu Tranzactii si afiseaza diferentele"
+    )
+    parser.add_argument(
+        "--importa", metavar="FISIER",
+        help="importa tranzactii dintr-un extras .csv sau .xlsx"
+    )
+    parser.add_argument(
+        "--arhiveaza-audit", action="store_true",
+        help="muta jurnalul de audit mai vechi decat perioada de retentie in arhiva"
+    )
+    parser.add_argument(
+        "--luni", type=int, default=None,
+        help=f"retentia jurnalului in luni (implicit {PARAM_RETENTIE_AUDIT} sau {AUDIT_RETENTIE_LUNI})"
+    )
+    parser.add_argument(
+        "--fisiere", action="store_true",
+        help=f"arhiveaza si in fisiere .csv.gz in {ARHIVA_AUDIT_DIR}/"
+    )
+    parser.add_argument(
+        "--doar-fisiere", action="store_true",
+        help="arhiveaza doar in fisiere (intrarile nu mai apar in LogAuditComplet)"
+    )
+    args, qt_args = parser.parse_known_args()
+
+    if args.baza:
+        seteaza_backend(backend_din_url(args.baza))
+
+    if args.instrumentare:
+        INSTRUMENTARE.porneste()
+        atexit.register(INSTRUMENTARE.salveaza, args.instrumentare)
+
+    if args.initializeaza_baza:
+        with open(args.initializeaza_baza, encoding="utf-8") as f:
+            BACKEND.initializeaza(f.read())
+        print(f"Schema creată ({BACKEND.nume}) din {args.initializeaza_baza}")
+        return
+
+    if args.importa:
+        start = time.monotonic()
+        importate, respinse, cale_respinse = importa_tranzactii(
+            args.importa, progres=lambda _p, mesaj: print(mesaj, end="\r", flush=True)
+        )
+        POOL.close_all()
+        print(f"\nImport: {importate} tranzacții în {time.monotonic() - start:.1f} s")
+        if respinse:
+            print(f"Respinse: {respinse} (vezi {cale_respinse})")
+        return
+
+    if args.arhiveaza_audit:
+        start = time.monotonic()
+        cnt = arhiveaza_audit(
+            args.luni,
+            in_tabel=not args.doar_fisiere,
+            in_fisiere=args.fisiere or args.doar_fisiere,
+            progres=lambda _p, mesaj: print(mesaj, end="\r", flush=True)
+        )
+        POOL.close_all()
+        print(f"\nJurnal arhivat: {cnt} înregistrări în {time.monotonic() - start:.1f} s")
+        return
+
+    if args.reconstruieste_totaluri:
+        start = time.monotonic()
+        cnt = reconstruieste_totaluri()
+        POOL.close_all()
+        print(f"TotaluriPerioada reconstruit: {cnt} rânduri în {time.monotonic() - start:.1f} s")
+        return
+
+    if args.completeaza_repartizari:
+        start = time.monotonic()
+        cnt = completeaza_repartizari()
+        POOL.close_all()
+        print(f"Repartizări completate: {cnt} în {time.monotonic() - start:.1f} s")
+        return
+
+    if args.inchide_perioade:
+        interval = interval_perioada(args.inchide_perioade)
+        if interval is None:
+            parser.error("--inchide-perioade are nevoie de o perioadă")
+        inchide_perioade(interval[1])
+        POOL.close_all()
+        print(f"Perioade închise până la {interval[1].isoformat()} (exclusiv)")
+        return
+
+    if args.verifica_totaluri:
+        diferente = verifica_totaluri()
+        POOL.close_all()
+        for (an, luna, centru, tip), stocat, calculat in diferente:
+            print(f"{an}-{luna:02d} {centru or '-'} {tip}: stocat {stocat[0]} ({stocat[1]}), "
+                  f"calculat {calculat[0]} ({calculat[1]})")
+        print("TotaluriPerioada: " + (f"{len(diferente)} diferențe" if diferente else "consistent"))
+        sys.exit(1 if diferente else 0)
+
+    if args.repartizeaza:
+        start = time.monotonic()
+        cnt = repartizeaza_incremental()
+        POOL.close_all()
+        print(f"Repartizare incrementală: {cnt} înregistrări noi în {time.monotonic() - start:.1f} s")
+        return
+
+    if args.repartizeaza_paralel:
+        start = time.monotonic()
+        cnt = repartizeaza_paralel(
+            args.procese, args.partitii,
+            progres=lambda _p, mesaj: print(mesaj, end="\r", flush=True)
+        )
+        POOL.close_all()
+        print(f"\nRepartizare paralelă: {cnt} înregistrări noi în {time.monotonic() - start:.1f} s")
+        return
+
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setFont(QFont("Segoe UI", 10))
+    app.aboutToQuit.connect(AUDIT.inchide)   # inainte de inchiderea conexiunilor
+    app.aboutToQuit.connect(POOL.close_all)
     win = LoginWindow()
     win.show()
     sys.exit(app.exec_())
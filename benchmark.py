@@ -0,0 +1,672 @@
+"""
+Masuratori de performanta pentru UrsuCode, rulate fara interfata grafica.
+
+    python benchmark.py --baza sqlite:bench.db suita --scala 100k --iesire rezultate.json
+    python benchmark.py compara vechi.json nou.json --prag 0.2
+    python benchmark.py repartizare --tranzactii 200000 --reguli 300
+    python benchmark.py perioada 2025 2025-03 2025Q1
+    python benchmark.py arhivare --randuri 100000000 --confirm   (doar pe o baza de test!)
+    python benchmark.py --baza sqlite:bench.db repartizare
+    python benchmark.py --baza sqlite:bench.db paralel --procese 1 2 4 8 --confirm
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import UrsuCode as app
+
+
+# ===== DATE SINTETICE ===============================================
+PARTENERI = ["Termoelectrica", "Energocom", "Moldtelecom", "Orange", "Petrom", "Lukoil",
+             "Apa-Canal", "Premier Energy", "Red Nord", "Furnizor Local"]
+
+
+def centre_sintetice(n):
+    return [f"CR{i:03d}" for i in range(1, n + 1)]
+
+
+def tranzactii_sintetice(n, centre, seed=1):
+    """Tupluri cu coloanele app.COLOANE_REPARTIZARE."""
+    rnd = random.Random(seed)
+    azi = date.today()
+    rezultat = []
+    for i in range(1, n + 1):
+        centru = rnd.choice(centre) if rnd.random() > 0.1 else None
+        rezultat.append((
+            f"TR{i:011d}", rnd.choice(["Venit", "Cheltuiala"]), centru,
+            Decimal(rnd.randint(100, 9_999_999)) / 100, azi - timedelta(days=rnd.randrange(365)),
+            f"Factura {rnd.choice(PARTENERI)} nr {i}",
+        ))
+    return rezultat
+
+
+def criteriu_sintetic(rnd, centre, mixte=True):
+    """Un (Tip_Criteriu, Valoare_Criteriu); `mixte` adauga intervale, text si criterii compuse."""
+    x = rnd.random()
+    if x < 0.2:
+        return "Tip_Operatiune", rnd.choice(["Venit", "Cheltuiala"])
+    if x < 0.6 or not mixte:
+        return "Centru", rnd.choice(centre)
+    if x < 0.7:
+        lo = rnd.randint(0, 90_000)
+        return "Suma", f"{lo}..{lo + rnd.randint(100, 10_000)}"
+    if x < 0.8:
+        inceput = date.today() - timedelta(days=rnd.randrange(365))
+        return "Data", f"{inceput}..{inceput + timedelta(days=rnd.randint(0, 60))}"
+    if x < 0.9:
+        return "Descriere", rnd.choice(PARTENERI)
+    if x < 0.95:
+        return "Regex", rf"nr \d*{rnd.randint(0, 99):02d}$"
+    return "Compus", (f"Tip_Operatiune={rnd.choice(['Venit', 'Cheltuiala'])} & "
+                      f"Suma={rnd.randint(0, 50_000)}.. & Descriere={rnd.choice(PARTENERI)}")
+
+
+def reguli_sintetice(n, centre, seed=2, mixte=True):
+    rnd = random.Random(seed)
+    return [
+        (f"RG{i:011d}", f"Regula {i}", *criteriu_sintetic(rnd, centre, mixte), round(rnd.uniform(1, 100), 2))
+        for i in range(1, n + 1)
+    ]
+
+
+def tinte_sintetice(reguli, centre, proportie=0.2, seed=4):
+    """Centre tinta (2-3, ponderi intregi) pentru o `proportie` din reguli, ca citeste_centre_tinta."""
+    rnd = random.Random(seed)
+    return {
+        reg[0]: [(c, Decimal(rnd.randint(1, 5))) for c in rnd.sample(centre, min(len(centre), rnd.randint(2, 3)))]
+        for reg in reguli if rnd.random() < proportie
+    }
+
+
+# ===== GENERATOR DE DATE ============================================
+# Umple schema BazaDeDate (proaspat creata) la o scara data. Totul trece
+# prin functiile aplicatiei (ID_GEN, insereaza_tranzactii, exec_many), deci
+# merge pe orice backend si tine TotaluriPerioada consistent.
+SCARI = {
+    "10k":  dict(tranzactii=10_000, reguli=100, centre=20, utilizatori=20, audit=50_000),
+    "100k": dict(tranzactii=100_000, reguli=500, centre=100, utilizatori=50, audit=500_000),
+    "1M":   dict(tranzactii=1_000_000, reguli=2_000, centre=400, utilizatori=200, audit=3_000_000),
+    "10M":  dict(tranzactii=10_000_000, reguli=5_000, centre=1_000, utilizatori=500, audit=20_000_000),
+}
+LOT_GENERARE = 50_000
+TIPURI_AUDIT = ["Login", "Adaugare", "Modificare", "Export", "Raport", "Repartizare", "Import"]
+
+
+def genereaza_date(scala, seed=1, luni=24, lot=LOT_GENERARE):
+    """
+    Datele sintetice pentru `scala` (dict ca in SCARI), reproductibile pentru
+    acelasi `seed`: centre, utilizatori, reguli (doua pe tip de operatiune,
+    restul pe centru, o zecime cu centre tinta), bugete pe centru si an, tranzactii si jurnal de audit
+    intinse pe ultimele `luni` luni.
+    """
+    rnd = random.Random(seed)
+    azi = date.today()
+    zile = luni * 30
+    acum = datetime.now()
+
+    centre = [f"CB{i:06d}" for i in range(1, scala["centre"] + 1)]
+    app.exec_many(
+        "INSERT INTO CentreResponsabilitate (ID_CentruResponsabil, Nume_Centru, Tip_Centru) VALUES (?,?,?)",
+        [(c, f"Centru sintetic {i}", rnd.choice(["Productie", "Transport", "Administrativ"]))
+         for i, c in enumerate(centre, 1)]
+    )
+
+    utilizatori = [f"UB{i:011d}" for i in range(1, scala["utilizatori"] + 1)]
+    app.exec_many(
+        "INSERT INTO Utilizatori (ID_Utilizator, IDNP, Nume, Prenume, Email, Telefon, Login, Parola, Tip_Cont) "
+        "VALUES (?,?,?,?,?,?,?,?,?)",
+        [(u, f"{2000000000000 + i}", f"Nume{i}", f"Prenume{i}", f"bench{i}@exemplu.md", None,
+          f"bench{i}", "bench", rnd.choice(["financiar", "client"]))
+         for i, u in enumerate(utilizatori, 1)]
+    )
+
+    n_reguli = scala["reguli"]
+    reguli = [("Tip_Operatiune", "Venit"), ("Tip_Operatiune", "Cheltuiala")][:n_reguli]
+    reguli += [("Centru", rnd.choice(centre)) for _ in range(n_reguli - len(reguli))]
+    reguli = [(id_r, f"Regula sintetica {i}", tip_c, val_c, Decimal(rnd.randint(100, 10000)) / 100)
+              for i, (id_r, (tip_c, val_c)) in enumerate(zip(app.ID_GEN.block("RG", n_reguli), reguli), 1)]
+    app.exec_many(
+        "INSERT INTO ReguliRepartizare (ID_Regula, Descriere_Regula, Tip_Criteriu, Valoare_Criteriu, "
+        "Procent_Repartizare) VALUES (?,?,?,?,?)", reguli
+    )
+    # generator separat: restul datelor raman aceleasi pentru acelasi seed
+    tinte = tinte_sintetice(reguli, centre, 0.1, seed + 1)
+    app.exec_many(
+        "INSERT INTO ReguliCentreTinta (ID_Regula, ID_CentruResponsabil, Pondere) VALUES (?,?,?)",
+        [(id_r, c, p) for id_r, lista in tinte.items() for c, p in lista]
+    )
+
+    ani = sorted({(azi - timedelta(days=z)).year for z in (0, zile)} | {azi.year})
+    bugete = [(c, str(an)) for c in centre for an in range(ani[0], ani[-1] + 1)]
+    app.exec_many(
+        "INSERT INTO Bugete (ID_Buget, ID_CentruResponsabil, An_Buget, Suma_Alocata, Status_Executie) "
+        "VALUES (?,?,?,?,?)",
+        # efectiv 0 (Subutilizat): il aduna insereaza_tranzactii mai jos
+        [(id_b, c, an, Decimal(rnd.randint(100_000, 10_000_000)), "Subutilizat")
+         for id_b, (c, an) in zip(app.ID_GEN.block("BG", len(bugete)), bugete)]
+    )
+
+    generat = 0
+    while generat < scala["tranzactii"]:
+        n = min(lot, scala["tranzactii"] - generat)
+        app.insereaza_tranzactii([
+            (rnd.choice(("Venit", "Cheltuiala")),
+             Decimal(rnd.randint(100, 10_000_000)) / 100,
+             azi - timedelta(days=rnd.randrange(zile)),
+             f"Factura {rnd.choice(PARTENERI)} nr {generat + i}",
+             rnd.choice(centre) if rnd.random() > 0.1 else None)
+            for i in range(n)
+        ])
+        generat += n
+        print(f"  tranzactii {generat:,} / {scala['tranzactii']:,}", end="\r", flush=True)
+    print()
+
+    generat = 0
+    while generat < scala["audit"]:
+        n = min(lot, scala["audit"] - generat)
+        app.exec_many(app.INSERT_AUDIT, [
+            (id_l, rnd.choice(utilizatori) if rnd.random() > 0.05 else None,
+             rnd.choice(TIPURI_AUDIT),
+             acum - timedelta(seconds=rnd.randrange(zile * 86400)),
+             f"Operatie sintetica {generat + i}")
+            for i, id_l in enumerate(app.ID_GEN.block("LG", n))
+        ])
+        generat += n
+        print(f"  audit {generat:,} / {scala['audit']:,}", end="\r", flush=True)
+    print()
+    app.reconstruieste_totaluri()   # include si tranzactiile initiale din script
+    app.CACHE_REF.invalideaza()
+
+
+def extras_sintetic(cale, n, centre, seed=3):
+    """Un extras CSV de `n` randuri (format bancar: ';', virgula zecimala)."""
+    rnd = random.Random(seed)
+    azi = date.today()
+    with open(cale, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["Data", "Tip", "Sumă", "Descriere", "Centru"])
+        for i in range(n):
+            w.writerow([
+                f"{azi - timedelta(days=rnd.randrange(365)):%d.%m.%Y}",
+                rnd.choice(["Venit", "Cheltuială"]),
+                f"{rnd.randint(1, 99999)},{rnd.randint(0, 99):02d}",
+                f"Extras {rnd.choice(PARTENERI)} {i}",
+                rnd.choice(centre) if rnd.random() > 0.1 else "",
+            ])
+
+
+# ===== UTILITARE ====================================================
+def cronometreaza(fn, *args):
+    start = time.perf_counter()
+    rezultat = fn(*args)
+    return rezultat, time.perf_counter() - start
+
+
+def operatori_plan(sql):
+    """Operatorii fizici din planul estimat (SHOWPLAN_ALL) al unei interogari."""
+    with app.POOL.connection(dedicata=True) as conn:
+        cur = conn.cursor()
+        cur.execute("SET SHOWPLAN_ALL ON")
+        try:
+            cur.execute(sql)
+            return [(r.PhysicalOp, r.Argument or "") for r in cur.fetchall() if r.PhysicalOp]
+        finally:
+            cur.execute("SET SHOWPLAN_ALL OFF")
+
+
+# ===== SCENARII =====================================================
+def bench_repartizare(args):
+    """Bucla initiala tranzactii x reguli vs. motorul indexat (fara scriere in DB)."""
+    centre = centre_sintetice(args.centre)
+    tranzactii = tranzactii_sintetice(args.tranzactii, centre)
+    reguli = reguli_sintetice(args.reguli, centre, mixte=args.criterii == "mixte")
+    tinte = tinte_sintetice(reguli, centre, args.tinte)
+
+    clasic, t_clasic = cronometreaza(app.repartizare_clasica, tranzactii, reguli, tinte)
+    indexat, t_indexat = cronometreaza(app.calculeaza_repartizari, tranzactii, reguli, None, tinte)
+
+    if clasic != indexat:
+        raise SystemExit("EROARE: motorul indexat nu produce acelasi rezultat ca bucla initiala")
+    # fiecare regula isi imparte exact partea (rotunjita la bani) intre centrele tinta
+    parti = {}
+    for id_tr, _, procent, _, id_reg, suma, _ in indexat:
+        parti[id_tr, id_reg] = parti.get((id_tr, id_reg), 0) + suma
+    sume = {tr[0]: tr[3] for tr in tranzactii}
+    procente = {reg[0]: Decimal(str(reg[4])) for reg in reguli}
+    if any(s != (sume[t] * procente[r] / 100).quantize(app.BAN, app.ROUND_HALF_UP)
+           for (t, r), s in parti.items()):
+        raise SystemExit("EROARE: partile unei reguli nu dau suma repartizata de regula")
+
+    print(f"tranzactii={len(tranzactii)} reguli={len(reguli)} repartizari={len(indexat)}")
+    print(f"  bucla initiala : {t_clasic:8.3f} s")
+    print(f"  motor indexat  : {t_indexat:8.3f} s  (x{t_clasic / max(t_indexat, 1e-9):.1f})")
+
+
+def conditie_perioada_initiala(perioada):
+    """Filtrul folosit inainte de interval_perioada (functii peste coloana)."""
+    if len(perioada) == 4:
+        return "WHERE YEAR(Data_Operatiune) = ?", (int(perioada),)
+    an, luna = perioada.split("-")
+    return "WHERE YEAR(Data_Operatiune)=? AND MONTH(Data_Operatiune)=?", (int(an), int(luna))
+
+
+def bench_perioada(args):
+    """Raportul Venituri/Cheltuieli: YEAR()/MONTH() vs. interval pe Data_Operatiune (DB real)."""
+    sablon = "SELECT Tip_Operatiune, SUM(Suma) FROM Tranzactii {} GROUP BY Tip_Operatiune"
+
+    def ruleaza(cond, params):
+        for _ in range(args.repetari):
+            rezultat = app.exec_query(sablon.format(cond), params, fetch=True)
+        return sorted(tuple(r) for r in rezultat or [])
+
+    for perioada in args.perioade:
+        nou_cond, nou_params = app.conditie_perioada(perioada)
+        nou, t_nou = cronometreaza(ruleaza, nou_cond, nou_params)
+        print(f"perioada={perioada}")
+        if "Q" not in perioada.upper():
+            vechi_cond, vechi_params = conditie_perioada_initiala(perioada)
+            vechi, t_vechi = cronometreaza(ruleaza, vechi_cond, vechi_params)
+            if vechi != nou:
+                raise SystemExit("EROARE: filtrul pe interval nu produce aceleasi totaluri")
+            print(f"  YEAR()/MONTH() : {t_vechi / args.repetari * 1000:8.2f} ms")
+        print(f"  interval       : {t_nou / args.repetari * 1000:8.2f} ms")
+
+        # planul estimat: cu parametri inlocuiti (datele vin din interval_perioada)
+        inceput, sfarsit = nou_params
+        sql = sablon.format(
+            f"WHERE Data_Operatiune >= '{inceput.isoformat()}' AND Data_Operatiune < '{sfarsit.isoformat()}'"
+        )
+        operatori = operatori_plan(sql)
+        for op, arg in operatori:
+            if "Scan" in op or "Seek" in op:
+                print(f"    {op:<22} {arg[:90]}")
+        if any(op in ("Table Scan", "Clustered Index Scan", "Index Scan") for op, _ in operatori):
+            print("  ATENTIE: planul inca scaneaza Tranzactii (migrarea 06 a fost aplicata?)")
+
+
+def genereaza_jurnal(randuri, luni, lot=1_000_000):
+    """
+    Umple LogAudit cu `randuri` intrari sintetice (prefix LZ, in afara
+    generatorului de ID-uri), repartizate uniform pe ultimele `luni` luni.
+    Generarea e facuta de server (INSERT ... SELECT), lot cu lot.
+    """
+    secunde = luni * 30 * 86400
+    pas = max(secunde / randuri, 0.001)
+    generat = 0
+    while generat < randuri:
+        n = min(lot, randuri - generat)
+        app.exec_query(
+            """
+            WITH N AS (
+                SELECT TOP (?) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) + ? AS nr
+                FROM sys.all_objects a CROSS JOIN sys.all_objects b CROSS JOIN sys.all_objects c
+            )
+            INSERT INTO LogAudit (ID_Log, ID_Utilizator, Tip_Actiune, Data_Ora, Descriere)
+            SELECT CONCAT('LZ', RIGHT(CONCAT('00000000000', nr), 11)),
+                   NULL,
+                   CASE nr % 4 WHEN 0 THEN 'Login' WHEN 1 THEN 'Adaugare'
+                               WHEN 2 THEN 'Export' ELSE 'Repartizare' END,
+                   DATEADD(SECOND, -CAST(nr * ? AS INT), SYSDATETIME()),
+                   CONCAT('Intrare sintetica ', nr)
+            FROM N
+            """,
+            (n, generat, pas)
+        )
+        generat += n
+        print(f"  generat {generat:,} / {randuri:,}", end="\r", flush=True)
+    print()
+
+
+def bench_arhivare(args):
+    """Prima pagina a jurnalului si arhivarea, pe un LogAudit de `randuri` intrari (DB real)."""
+    if not args.confirm:
+        raise SystemExit("Scenariul scrie milioane de randuri in baza configurata; adaugati --confirm.")
+
+    def prima_pagina(tabel):
+        sursa = app.SursaKeyset(tabel, app.COLOANE_AUDIT, chei=["Data_Ora", "ID_Log"], desc=True)
+        return sursa.pagina(None, app.MARIME_PAGINA)
+
+    def pagina_veche(tabel, zile):
+        # pagina care incepe acum `zile` zile: seek pe index, nu parcurgere
+        sursa = app.SursaKeyset(tabel, app.COLOANE_AUDIT, chei=["Data_Ora", "ID_Log"], desc=True)
+        return sursa.pagina((datetime.now() - timedelta(days=zile), "LZ99999999999"), app.MARIME_PAGINA)
+
+    if args.randuri:
+        _, t = cronometreaza(genereaza_jurnal, args.randuri, args.luni_date)
+        print(f"generare {args.randuri:,} intrari: {t:.1f} s")
+
+    def masoara(eticheta):
+        for tabel in ("LogAudit", "LogAuditComplet"):
+            _, t1 = cronometreaza(prima_pagina, tabel)
+            _, t2 = cronometreaza(pagina_veche, tabel, args.luni_date * 30 - 10)
+            print(f"  {eticheta:<16} {tabel:<16} prima pagina {t1 * 1000:8.1f} ms, "
+                  f"pagina veche {t2 * 1000:8.1f} ms")
+
+    masoara("inainte")
+    cnt, t = cronometreaza(app.arhiveaza_audit, args.retentie, True, args.fisiere)
+    print(f"arhivare: {cnt:,} intrari in {t:.1f} s ({cnt / max(t, 1e-9):,.0f} intrari/s)")
+    masoara("dupa")
+
+
+def bench_paralel(args):
+    """Repartizarea completa pe 1, 2, 4... procese, pe datele deja din baza (sterge Repartizari!)."""
+    if not args.confirm:
+        raise SystemExit("Scenariul sterge si rescrie Repartizari in baza configurata; adaugati --confirm.")
+    n_tr = app.exec_query("SELECT COUNT(*) FROM Tranzactii", fetch=True)[0][0]
+    if not n_tr:
+        raise SystemExit("Baza nu are tranzactii; generati date cu `suita` mai intai.")
+
+    referinta = None
+    for procese in args.procese:
+        app.exec_query("DELETE FROM Repartizari")
+        app.exec_query("DELETE FROM PartitiiRepartizare")
+        cnt, t = cronometreaza(app.repartizeaza_paralel, procese, args.partitii)
+        if referinta is None:
+            referinta = (cnt, t)
+        elif cnt != referinta[0]:
+            raise SystemExit(f"{procese} procese: {cnt} repartizari, diferit de {referinta[0]}")
+        print(f"{procese:>3} procese: {t:7.1f} s, {n_tr / max(t, 1e-9):>10,.0f} tranzactii/s, "
+              f"accelerare {referinta[1] / max(t, 1e-9):4.2f}x ({cnt:,} repartizari)")
+
+
+# ===== SUITA COMPLETA ===============================================
+# Genereaza datele la scara aleasa, cronometreaza fiecare operatie
+# frecventa (citirile de mai multe ori, scrierile o data, in ordinea in
+# care le face un utilizator) si scrie rezultatele intr-un fisier JSON,
+# care se compara apoi intre versiuni cu `compara`.
+FORMAT_REZULTATE = 1
+
+
+def _numar_randuri(rezultat):
+    """Cate randuri a produs operatia, dupa forma rezultatului (sau None)."""
+    if isinstance(rezultat, bool):
+        return None
+    if isinstance(rezultat, int):
+        return rezultat
+    if isinstance(rezultat, tuple) and rezultat:
+        return _numar_randuri(rezultat[0]) if not isinstance(rezultat[0], list) else len(rezultat[0])
+    if isinstance(rezultat, list):
+        return len(rezultat)
+    return None
+
+
+class Masuratori:
+    """Timpii operatiilor (secunde pe repetare), cu mediana si minimul."""
+
+    def __init__(self):
+        self.operatii = {}
+
+    def masoara(self, nume, fn, *args, repetari=1, dupa=None):
+        timpi, rezultat = [], None
+        for _ in range(repetari):
+            start = time.perf_counter()
+            rezultat = fn(*args)
+            if dupa is not None:
+                dupa()
+            timpi.append(time.perf_counter() - start)
+        randuri = _numar_randuri(rezultat)
+        self.operatii[nume] = {
+            "secunde": [round(t, 6) for t in timpi],
+            "mediana": round(statistics.median(timpi), 6),
+            "min": round(min(timpi), 6),
+            "randuri": randuri,
+        }
+        extra = f"  ({randuri:,} randuri)" if randuri is not None else ""
+        print(f"  {nume:<34} {statistics.median(timpi) * 1000:10.1f} ms{extra}")
+        return rezultat
+
+
+def versiune_cod():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10, check=True
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def masoara_interfata(m, repetari):
+    """Login-ul si incarcarea fiecarui tab prin codul ferestrelor, pe platforma Qt offscreen."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtCore import QEventLoop
+    from PyQt5.QtWidgets import QApplication
+
+    qapp = QApplication.instance() or QApplication(sys.argv[:1])
+    ferestre = []
+
+    def asteapta():
+        # sarcinile din fundal (pagini, estimari) se termina pe firul grafic
+        while ferestre and ferestre[-1].sarcini._active:
+            qapp.processEvents(QEventLoop.AllEvents, 10)
+
+    def login():
+        for w in ferestre:
+            w.close()
+        ferestre.clear()
+        fereastra_login = app.LoginWindow()
+        fereastra_login.ed_login.setText("admin")
+        fereastra_login.ed_pass.setText("admin")
+        fereastra_login.do_login()
+        ferestre.append(fereastra_login.main)
+
+    m.masoara("login", login, repetari=repetari, dupa=asteapta)
+    principala = ferestre[-1]
+    for tab in ("tranzactii", "reguli", "bugete", "repartizari", "exporturi",
+                "angajati", "programari", "audit"):
+        m.masoara(f"incarca_{tab}", getattr(principala, f"incarca_{tab}"), repetari=repetari, dupa=asteapta)
+    principala.close()
+
+
+def bench_suita(args):
+    """Toate operatiile frecvente, pe date sintetice la scara aleasa; rezultatele in JSON."""
+    scala = dict(SCARI[args.scala])
+    for cheie in scala:
+        if getattr(args, cheie) is not None:
+            scala[cheie] = getattr(args, cheie)
+    r = args.repetari
+
+    lucru = tempfile.mkdtemp(prefix="ursu_bench_")
+    app.EXPORT_DIR = os.path.join(lucru, "exporturi")
+    app.ARHIVA_AUDIT_DIR = os.path.join(lucru, "arhiva_audit")
+    app.RAPOARTE_DIR = os.path.join(lucru, "rapoarte")
+    m = Masuratori()
+    if args.instrumentare:
+        app.INSTRUMENTARE.porneste()
+    try:
+        if not args.fara_generare:
+            if app.BACKEND.nume != "sqlite" and not args.confirm:
+                raise SystemExit("Generarea recreeaza schema in baza configurata; adaugati --confirm.")
+            print(f"generare {args.scala} ({app.BACKEND.nume}): {scala}")
+            with open(app.SCRIPT_SCHEMA, encoding="utf-8") as f:
+                m.masoara("initializare_schema", app.BACKEND.initializeaza, f.read())
+            m.masoara("generare_date", genereaza_date, scala, args.seed, args.luni)
+
+        azi = date.today()
+        perioade = [str(azi.year), f"{azi:%Y-%m}", f"{azi.year}Q{(azi.month - 1) // 3 + 1}"]
+        centru = "CB000001"
+        print("citiri:")
+        m.masoara("cache_referinte", app.CACHE_REF.incarca_tot, repetari=r)
+        for perioada in perioade:
+            m.masoara(f"raport_venituri_{perioada}", app.calculeaza_raport,
+                      "Venituri/Cheltuieli", perioada, repetari=r)
+        m.masoara("raport_bugete", app.calculeaza_raport, "Bugete", "", repetari=r)
+        m.masoara("pagina_tranzactii", app.pagina_keyset,
+                  app.sursa_tranzactii(), None, app.PAGINA_TRANZACTII, repetari=r)
+        m.masoara("pagina_tranzactii_veche", app.pagina_keyset, app.sursa_tranzactii(),
+                  (azi - timedelta(days=args.luni * 15), "TR99999999999"), app.PAGINA_TRANZACTII, repetari=r)
+        m.masoara("pagina_tranzactii_filtru", app.pagina_keyset,
+                  app.sursa_tranzactii(tip="Cheltuiala", centru=centru,
+                                       de_la=azi - timedelta(days=365), pana_la=azi),
+                  None, app.PAGINA_TRANZACTII, repetari=r)
+        m.masoara("estimare_tranzactii", app.estimeaza_randuri, "Tranzactii", repetari=r)
+        m.masoara("estimare_tranzactii_filtru", app.estimeaza_randuri,
+                  "Tranzactii", *app.conditie_tranzactii(tip="Venit"), repetari=r)
+        m.masoara("pagina_audit", lambda: app.sursa_audit().pagina(None, app.MARIME_PAGINA), repetari=r)
+        m.masoara("pagina_audit_text",
+                  lambda: app.sursa_audit(text="sintetica 12").pagina(None, app.MARIME_PAGINA), repetari=r)
+        m.masoara("verifica_totaluri", app.verifica_totaluri)
+        date_sim = m.masoara("simulare_incarcare_an", app.DateSimulare.incarca, str(azi.year))
+        m.masoara("simulare_evaluare_an", app.simuleaza_repartizare, date_sim, app.citeste_reguli(),
+                  app.citeste_centre_tinta(), repetari=r)
+
+        print("scrieri:")
+        m.masoara("repartizare_completa", app.repartizeaza_tranzactii)
+        m.masoara("insereaza_tranzactii_1000", app.insereaza_tranzactii, [
+            ("Cheltuiala", Decimal("125.50"), azi, f"Factura noua {i}", centru) for i in range(1000)
+        ])
+        m.masoara("repartizare_incrementala", app.repartizeaza_incremental)
+        # citire, dar are nevoie de repartizarile scrise mai sus
+        m.masoara(f"raport_repartizate_{azi.year}", app.calculeaza_raport,
+                  "Sume repartizate pe centre", str(azi.year), repetari=r)
+        for sistem, (cod, _) in app.FORMATE_EXPORT.items():
+            m.masoara(f"export_{cod}", app.exporta_tranzactii, sistem)
+        m.masoara("export_audit", app.exporta_audit)
+        for format_fisier in app.FORMATE_RAPORT:
+            m.masoara(f"raport_bugete_{format_fisier.lower()}", app.genereaza_fisier_raport,
+                      "Bugete", "", format_fisier)
+        extras = os.path.join(lucru, "extras.csv")
+        extras_sintetic(extras, args.import_randuri, ["CB000001", "CB000002", "CR001"])
+        m.masoara("import_csv", app.importa_tranzactii, extras)
+        m.masoara("arhivare_audit", app.arhiveaza_audit, args.retentie)
+
+        if not args.fara_interfata:
+            print("interfata:")
+            masoara_interfata(m, r)
+    finally:
+        app.AUDIT.inchide()
+        app.POOL.close_all()
+        shutil.rmtree(lucru, ignore_errors=True)
+
+    rezultat = {
+        "format": FORMAT_REZULTATE,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "versiune": versiune_cod(),
+        "backend": app.BACKEND.nume,
+        "python": platform.python_version(),
+        "platforma": platform.platform(),
+        "scala": args.scala,
+        "volum": scala,
+        "seed": args.seed,
+        "repetari": r,
+        "operatii": m.operatii,
+    }
+    if args.instrumentare:
+        rezultat["interogari"] = app.INSTRUMENTARE.instantaneu()["interogari"]
+    with open(args.iesire, "w", encoding="utf-8") as f:
+        json.dump(rezultat, f, indent=2, ensure_ascii=False)
+    print(f"rezultate: {args.iesire}")
+
+
+def bench_compara(args):
+    """Medianele a doua rulari ale suitei; iese cu 1 daca exista regresii."""
+    with open(args.vechi, encoding="utf-8") as f:
+        vechi = json.load(f)
+    with open(args.nou, encoding="utf-8") as f:
+        nou = json.load(f)
+    for cheie in ("backend", "volum", "repetari"):
+        if vechi.get(cheie) != nou.get(cheie):
+            print(f"ATENTIE: {cheie} difera ({vechi.get(cheie)} vs {nou.get(cheie)})")
+    print(f"{'operatie':<36} {vechi.get('versiune') or '?':>12} {nou.get('versiune') or '?':>12}")
+
+    regresii = 0
+    for nume in sorted(set(vechi["operatii"]) | set(nou["operatii"])):
+        a = vechi["operatii"].get(nume, {}).get("mediana")
+        b = nou["operatii"].get(nume, {}).get("mediana")
+        if a is None or b is None:
+            print(f"  {nume:<34} {'-' if a is None else f'{a * 1000:.1f}':>12} "
+                  f"{'-' if b is None else f'{b * 1000:.1f}':>12}")
+            continue
+        raport = b / max(a, 1e-9)
+        marcaj = ""
+        if raport > 1 + args.prag and b - a > args.minim:
+            marcaj = "REGRESIE"
+            regresii += 1
+        elif raport < 1 - args.prag and a - b > args.minim:
+            marcaj = "mai rapid"
+        print(f"  {nume:<34} {a * 1000:12.1f} {b * 1000:12.1f}  x{raport:5.2f} {marcaj}")
+    print(f"{regresii} regresii (prag {args.prag:.0%})")
+    sys.exit(1 if regresii else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baza", help="mssql, odbc:<sir conectare> sau sqlite:<cale> (implicit URSU_BAZA)")
+    sub = parser.add_subparsers(dest="scenariu", required=True)
+
+    p = sub.add_parser("suita", help="toate operatiile frecvente pe date sintetice, rezultate in JSON")
+    p.add_argument("--scala", choices=list(SCARI), default="10k")
+    p.add_argument("--tranzactii", type=int, help="suprascrie volumul scalei")
+    p.add_argument("--reguli", type=int)
+    p.add_argument("--centre", type=int)
+    p.add_argument("--utilizatori", type=int)
+    p.add_argument("--audit", type=int)
+    p.add_argument("--luni", type=int, default=24, help="pe cate luni se intind datele generate")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--repetari", type=int, default=5, help="repetari pentru fiecare citire")
+    p.add_argument("--import-randuri", type=int, default=20_000)
+    p.add_argument("--retentie", type=int, default=12, help="luni pastrate la arhivarea jurnalului")
+    p.add_argument("--fara-generare", action="store_true", help="foloseste datele deja generate")
+    p.add_argument("--fara-interfata", action="store_true", help="fara login si incarcarea tab-urilor")
+    p.add_argument("--iesire", default="benchmark.json")
+    p.add_argument("--instrumentare", action="store_true",
+                   help="adauga in rezultate statisticile pe interogare (cost propriu mic)")
+    p.add_argument("--confirm", action="store_true", help="necesar pentru generare pe SQL Server")
+    p.set_defaults(fn=bench_suita)
+
+    p = sub.add_parser("compara", help="compara doua fisiere de rezultate ale suitei")
+    p.add_argument("vechi")
+    p.add_argument("nou")
+    p.add_argument("--prag", type=float, default=0.2, help="variatia relativa tolerata (0.2 = 20%%)")
+    p.add_argument("--minim", type=float, default=0.005, help="diferenta absoluta minima, in secunde")
+    p.set_defaults(fn=bench_compara)
+
+    p = sub.add_parser("repartizare", help="potrivirea tranzactii-reguli")
+    p.add_argument("--tranzactii", type=int, default=200_000)
+    p.add_argument("--reguli", type=int, default=300)
+    p.add_argument("--centre", type=int, default=50)
+    p.add_argument("--criterii", choices=["egalitate", "mixte"], default="mixte",
+                   help="doar Tip_Operatiune/Centru sau si intervale, text, compuse")
+    p.add_argument("--tinte", type=float, default=0.2,
+                   help="proportia regulilor cu 2-3 centre tinta")
+    p.set_defaults(fn=bench_repartizare)
+
+    p = sub.add_parser("perioada", help="filtrul pe perioada al raportului (necesita baza de date)")
+    p.add_argument("perioade", nargs="+", help="ex: 2025 2025-03 2025Q1")
+    p.add_argument("--repetari", type=int, default=20)
+    p.set_defaults(fn=bench_perioada)
+
+    p = sub.add_parser("arhivare", help="retentia jurnalului de audit (scrie in baza de date!)")
+    p.add_argument("--randuri", type=int, default=100_000_000, help="intrari sintetice generate (0 = fara)")
+    p.add_argument("--luni-date", type=int, default=36, help="pe cate luni se intind intrarile generate")
+    p.add_argument("--retentie", type=int, default=12)
+    p.add_argument("--fisiere", action="store_true", help="arhiveaza si in fisiere .csv.gz")
+    p.add_argument("--confirm", action="store_true")
+    p.set_defaults(fn=bench_arhivare)
+
+    p = sub.add_parser("paralel", help="repartizarea pe mai multe procese (rescrie Repartizari!)")
+    p.add_argument("--procese", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    p.add_argument("--partitii", type=int, help=f"implicit {app.PARTITII_PE_PROCES} pe proces")
+    p.add_argument("--confirm", action="store_true")
+    p.set_defaults(fn=bench_paralel)
+
+    args = parser.parse_args()
+    if args.baza:
+        app.seteaza_backend(app.backend_din_url(args.baza))
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()